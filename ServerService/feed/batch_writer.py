@@ -0,0 +1,192 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("influx_consumer")
+
+
+class BatchWriter:
+    """Gabungkan payload line protocol dari banyak trace menjadi satu request.
+
+    Batch dikirim saat ukuran byte/point mencapai batas atau saat batch
+    tertua melewati `max_age` detik. Penulisan berjalan di thread pool
+    dengan maksimal `max_inflight` request; jika semua slot terpakai,
+    `add()` akan menunggu sehingga pengambilan dari queue ikut melambat
+    (backpressure) saat InfluxDB tertinggal.
+
+    Jika `spill` diberikan (mis. WriteAheadSpool.append), batch dialihkan
+    ke sana ketika slot tidak didapat dalam `spill_after` detik, atau
+    ketika sink ditandai down setelah error sampai `mark_sink_up()`.
+    """
+
+    def __init__(self, write_func, max_bytes=2 * 1024 * 1024, max_points=50000,
+                 max_age=1.0, max_inflight=4, on_error=None, spill=None, spill_after=5.0):
+        self.write_func = write_func
+        self.max_bytes = max_bytes
+        self.max_points = max_points
+        self.max_age = max_age
+        self.max_inflight = max_inflight
+        self.on_error = on_error
+        self.spill = spill
+        self.spill_after = spill_after
+        self.sink_down = False
+
+        self._lock = threading.Lock()
+        self._chunks = []
+        self._bytes = 0
+        self._points = 0
+        self._opened = None
+        self._slots = threading.BoundedSemaphore(max_inflight)
+        self._executor = ThreadPoolExecutor(max_workers=max_inflight,
+                                            thread_name_prefix="InfluxWriter")
+
+        # Statistik
+        self._stats_lock = threading.Lock()
+        self.inflight = 0
+        self.batches = 0
+        self.errors = 0
+        self.points_written = 0
+        self.bytes_written = 0
+        self.last_batch_points = 0
+        self.last_batch_bytes = 0
+        self.last_flush_latency = 0.
+        self.avg_flush_latency = 0.
+        self.max_flush_latency = 0.
+        self.backpressure_wait = 0.
+        self.spilled_batches = 0
+
+    def add(self, payload, points):
+        """Tambahkan payload ke batch; kirim jika batas terlampaui."""
+        if not payload:
+            return
+        with self._lock:
+            if self._opened is None:
+                self._opened = time.monotonic()
+            self._chunks.append(payload)
+            self._bytes += len(payload)
+            self._points += points
+            batch = None
+            if self._bytes >= self.max_bytes or self._points >= self.max_points:
+                batch = self._take()
+        if batch:
+            self._submit(*batch)
+
+    def flush_if_due(self):
+        """Kirim batch yang umurnya sudah melewati max_age."""
+        with self._lock:
+            batch = None
+            if self._opened is not None and time.monotonic() - self._opened >= self.max_age:
+                batch = self._take()
+        if batch:
+            self._submit(*batch)
+
+    def flush(self):
+        """Kirim sisa batch dan tunggu semua request selesai."""
+        with self._lock:
+            batch = self._take()
+        if batch:
+            self._submit(*batch)
+        for _ in range(self.max_inflight):
+            self._slots.acquire()
+        for _ in range(self.max_inflight):
+            self._slots.release()
+
+    def close(self):
+        self.flush()
+        self._executor.shutdown(wait=True)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "pending_points": self._points,
+                "pending_bytes": self._bytes,
+                "inflight": self.inflight,
+                "batches": self.batches,
+                "errors": self.errors,
+                "points_written": self.points_written,
+                "bytes_written": self.bytes_written,
+                "last_batch_points": self.last_batch_points,
+                "last_batch_bytes": self.last_batch_bytes,
+                "last_flush_latency": self.last_flush_latency,
+                "avg_flush_latency": self.avg_flush_latency,
+                "max_flush_latency": self.max_flush_latency,
+                "backpressure_wait": self.backpressure_wait,
+                "spilled_batches": self.spilled_batches,
+                "sink_down": self.sink_down,
+            }
+
+    def _take(self):
+        # Dipanggil dengan self._lock terkunci
+        if not self._chunks:
+            return None
+        batch = (b"".join(self._chunks), self._points)
+        self._chunks = []
+        self._bytes = 0
+        self._points = 0
+        self._opened = None
+        return batch
+
+    def mark_sink_up(self):
+        if self.sink_down:
+            logger.info("[BatchWriter] Sink recovered, resuming direct writes")
+        self.sink_down = False
+
+    def _spill(self, payload, points):
+        with self._stats_lock:
+            self.spilled_batches += 1
+        self.spill(payload, points)
+
+    def _submit(self, payload, points):
+        if self.spill and self.sink_down:
+            self._spill(payload, points)
+            return
+
+        t0 = time.monotonic()
+        if self.spill:
+            if not self._slots.acquire(timeout=self.spill_after):
+                logger.warning(f"[BatchWriter] InfluxDB lagging, spooling {points} points")
+                self._spill(payload, points)
+                return
+        else:
+            self._slots.acquire()
+        waited = time.monotonic() - t0
+        with self._stats_lock:
+            self.inflight += 1
+            self.backpressure_wait += waited
+        if waited > 1.:
+            logger.warning(f"[BatchWriter] InfluxDB lagging, waited {waited:.1f}s for a write slot")
+        self._executor.submit(self._write, payload, points)
+
+    def _write(self, payload, points):
+        t0 = time.monotonic()
+        try:
+            self.write_func(payload)
+        except Exception as e:
+            with self._stats_lock:
+                self.errors += 1
+            logger.error(f"[BatchWriter] Write error ({points} points): {e}")
+            if self.spill:
+                self.sink_down = True
+                self._spill(payload, points)
+            elif self.on_error:
+                self.on_error(payload, points, e)
+        else:
+            latency = time.monotonic() - t0
+            with self._stats_lock:
+                self.batches += 1
+                self.points_written += points
+                self.bytes_written += len(payload)
+                self.last_batch_points = points
+                self.last_batch_bytes = len(payload)
+                self.last_flush_latency = latency
+                self.max_flush_latency = max(self.max_flush_latency, latency)
+                # EWMA supaya tren latency terlihat tanpa menyimpan histori
+                if self.batches == 1:
+                    self.avg_flush_latency = latency
+                else:
+                    self.avg_flush_latency += 0.1 * (latency - self.avg_flush_latency)
+        finally:
+            with self._stats_lock:
+                self.inflight -= 1
+            self._slots.release()
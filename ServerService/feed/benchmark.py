@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+"""Benchmark hot path feed.
+
+Contoh:
+    python benchmark.py encoder --npts 3000 --repeat 20
+    python benchmark.py resample --rate 100 --out-rate 10 --seconds 600
+    python benchmark.py ondata --streams 2000 --packets 20000
+    python benchmark.py pipeline --stations 200 --duration 30 --speed 10
+"""
+import argparse
+import gzip
+import http.server
+import json
+import multiprocessing
+import os
+import resource
+import threading
+import time
+import urllib.request
+from datetime import timedelta
+
+import numpy as np
+from influxdb_client import Point, WritePrecision
+from obspy import Trace, UTCDateTime
+
+import threads
+from batch_writer import BatchWriter
+from decimator import StreamingResampler
+from influx_consumer import InfluxDBConsumer
+from line_protocol import encode_trace
+from myseedlink import MySeedlinkClient
+
+MEASUREMENT = "waveform"
+
+
+def synthetic_trace(npts, sampling_rate=100., net="AM", sta="R0000", loc="00", cha="SHZ",
+                    starttime=None, dtype=np.int32, seed=0):
+    """Trace sintetis dengan noise acak, mirip paket SeedLink."""
+    rng = np.random.default_rng(seed)
+    data = (rng.standard_normal(npts) * 1000).astype(dtype)
+    header = {
+        "network": net, "station": sta, "location": loc, "channel": cha,
+        "sampling_rate": sampling_rate,
+        "starttime": starttime or UTCDateTime(2025, 1, 1),
+    }
+    return Trace(data=data, header=header)
+
+
+def legacy_encode(trace):
+    """Encoder lama: satu Point per sampel, diserialisasi seperti write_api."""
+    net = trace.stats.network
+    sta = trace.stats.station
+    loc = trace.stats.location
+    cha = trace.stats.channel
+    starttime = trace.stats.starttime.datetime
+    delta = trace.stats.delta
+
+    points = []
+    for i, val in enumerate(trace.data):
+        if not np.isfinite(val):
+            continue
+        timestamp = starttime + timedelta(seconds=i * delta)
+        point = Point(MEASUREMENT) \
+            .tag("network", net) \
+            .tag("station", sta) \
+            .tag("location", loc) \
+            .tag("channel", cha) \
+            .field("value", float(val)) \
+            .time(timestamp, WritePrecision.NS)
+        points.append(point)
+    return "\n".join(p.to_line_protocol() for p in points).encode(), len(points)
+
+
+def _rate(func, traces):
+    samples = 0
+    t0 = time.perf_counter()
+    for tr in traces:
+        samples += func(tr)[1]
+    return samples / (time.perf_counter() - t0)
+
+
+def bench_encoder(args):
+    traces = [synthetic_trace(args.npts, sta=f"R{i:04d}", seed=i, dtype=np.dtype(args.dtype))
+              for i in range(args.repeat)]
+
+    before = _rate(legacy_encode, traces)
+    after = _rate(lambda tr: encode_trace(MEASUREMENT, tr), traces)
+
+    print(f"encoder: {args.repeat} traces x {args.npts} samples ({args.dtype})")
+    print(f"  legacy Point loop : {before:14,.0f} samples/s")
+    print(f"  vectorized        : {after:14,.0f} samples/s")
+    print(f"  speedup           : {after / before:14.1f}x")
+
+
+def _bandlimited(t, max_freq, seed=0):
+    """Sinyal analitik (jumlah sinus < max_freq) sebagai acuan kebenaran."""
+    rng = np.random.default_rng(seed)
+    freqs = rng.uniform(0.05, max_freq, 8)
+    phases = rng.uniform(0, 2 * np.pi, 8)
+    return np.sin(2 * np.pi * freqs[:, None] * t[None, :] + phases[:, None]).sum(axis=0) * 1000
+
+
+def _packets(args):
+    npts = int(args.seconds * args.rate)
+    t = np.arange(npts) / args.rate
+    data = _bandlimited(t, 0.4 * args.out_rate)
+    start = UTCDateTime(2025, 1, 1)
+    size = int(args.packet * args.rate)
+    packets = []
+    for i in range(0, npts, size):
+        tr = synthetic_trace(0, sampling_rate=args.rate, starttime=start + i / args.rate)
+        tr.data = data[i:i + size].copy()
+        packets.append(tr)
+    return start, packets
+
+
+def _error(traces, start, max_freq):
+    """RMS error terhadap sinyal analitik pada timestamp output."""
+    errors = []
+    for tr in traces:
+        t = (tr.stats.starttime - start) + np.arange(tr.stats.npts) * tr.stats.delta
+        errors.append(tr.data - _bandlimited(t, max_freq))
+    err = np.concatenate(errors)
+    return np.sqrt(np.mean(err ** 2)), np.abs(err).max()
+
+
+def bench_resample(args):
+    start, packets = _packets(args)
+    npts = sum(tr.stats.npts for tr in packets)
+    max_freq = 0.4 * args.out_rate
+
+    legacy = [tr.copy() for tr in packets]
+    t0 = time.perf_counter()
+    for tr in legacy:
+        tr.resample(args.out_rate)
+    t_legacy = time.perf_counter() - t0
+
+    streaming = [tr.copy() for tr in packets]
+    resampler = StreamingResampler(args.rate, args.out_rate)
+    t0 = time.perf_counter()
+    streaming = [tr for tr in streaming if resampler.resample_trace(tr)]
+    t_stream = time.perf_counter() - t0
+
+    print(f"resample: {len(packets)} packets x {args.packet}s, {args.rate} Hz -> {args.out_rate} Hz")
+    for name, elapsed, traces in (("trace.resample per packet", t_legacy, legacy),
+                                  ("streaming polyphase FIR", t_stream, streaming)):
+        rms, peak = _error(traces, start, max_freq)
+        print(f"  {name:26s}: {npts / elapsed:14,.0f} samples/s  "
+              f"rms err {rms:9.3f}  max err {peak:9.3f}")
+
+
+class NullQueue:
+    """Pengganti queue yang membuang semua trace."""
+
+    def put(self, item, block=True, timeout=None):
+        pass
+
+
+class SyntheticSeedlinkClient(MySeedlinkClient):
+    """MySeedlinkClient tanpa koneksi: daftar stream dibuat sintetis."""
+
+    def __init__(self, n_stations, channels=("SHZ",), net="AM", loc="00"):
+        self._stream_info = [
+            {"network": net, "name": f"R{i:04d}",
+             "channel": [{"seedname": cha, "location": loc} for cha in channels]}
+            for i in range(n_stations)
+        ]
+        super().__init__("localhost:18000", [[net, ".*", ".*", ".*"]], "statefile.sl", False)
+
+    def connect(self):
+        pass
+
+    def get_stream_info(self):
+        return self._stream_info
+
+    def select_stream(self, net, station, selector=None):
+        pass
+
+
+def bench_ondata(args):
+    client = SyntheticSeedlinkClient(args.streams)
+    client.queue = NullQueue()
+    if not args.resample:
+        client.resample_rate = None
+
+    keys = list(client.selected_streams)
+    now = UTCDateTime()
+    traces = []
+    for i in range(args.packets):
+        net, sta, loc, cha = keys[i % len(keys)]
+        # Paket bersambung per channel supaya state resampler tidak di-reset
+        start = now - 600 + (i // len(keys)) * args.npts / 100.
+        traces.append(synthetic_trace(args.npts, net=net, sta=sta, loc=loc, cha=cha,
+                                      starttime=start, seed=i % 16))
+
+    t0 = time.perf_counter()
+    for tr in traces:
+        client.on_data(tr)
+    elapsed = time.perf_counter() - t0
+
+    mode = "with resample" if args.resample else "no resample"
+    print(f"on_data: {len(keys)} selected streams, {args.packets} packets x {args.npts} samples ({mode})")
+    print(f"  {elapsed / args.packets * 1e6:10.1f} us/packet  "
+          f"{args.packets / elapsed:12,.0f} packets/s  {args.packets * args.npts / elapsed:14,.0f} samples/s")
+
+
+class _SinkHandler(http.server.BaseHTTPRequestHandler):
+    """Pengganti endpoint /api/v2/write: hitung line lalu balas 204."""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        lines = body.count(b"\n") + (1 if body and not body.endswith(b"\n") else 0)
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.lines += lines
+            self.server.bytes += len(body)
+        self.send_response(204)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        with self.server.lock:
+            body = json.dumps({"requests": self.server.requests, "lines": self.server.lines,
+                               "bytes": self.server.bytes}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _sink_main(conn, delay):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _SinkHandler)
+    server.daemon_threads = True
+    server.delay = delay
+    server.lock = threading.Lock()
+    server.requests = server.lines = server.bytes = 0
+    conn.send(server.server_address[1])
+    server.serve_forever()
+
+
+class FakeInfluxSink:
+    """Sink HTTP line protocol di proses terpisah supaya tidak berebut GIL
+    dengan pipeline yang diukur."""
+
+    def __init__(self, delay=0.):
+        ctx = multiprocessing.get_context("spawn")
+        parent, child = ctx.Pipe()
+        self.process = ctx.Process(target=_sink_main, args=(child, delay), daemon=True)
+        self.process.start()
+        self.url = f"http://127.0.0.1:{parent.recv()}"
+
+    def stats(self):
+        with urllib.request.urlopen(f"{self.url}/stats", timeout=5) as r:
+            return json.loads(r.read())
+
+    def close(self):
+        self.process.terminate()
+        self.process.join()
+
+
+class TracingBatchWriter(BatchWriter):
+    """BatchWriter yang mencatat waktu masuk trace per batch; saat batch
+    selesai ditulis, latency end-to-end dikirim ke `on_written`."""
+
+    def __init__(self, *args, on_written=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_written = on_written
+        self.pending_t_in = []
+        self._batch_t_in = {}
+
+    def _take(self):
+        batch = super()._take()
+        if batch:
+            self._batch_t_in[id(batch[0])] = self.pending_t_in
+            self.pending_t_in = []
+        return batch
+
+    def _write(self, payload, points):
+        super()._write(payload, points)
+        t_in = self._batch_t_in.pop(id(payload), ())
+        if self.on_written:
+            self.on_written(t_in)
+
+
+class BenchConsumer(InfluxDBConsumer):
+    """InfluxDBConsumer dengan timer per tahap (dequeue, encode, write)."""
+
+    def __init__(self, *args, stages=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stages = stages
+        old = self.writer
+        self.writer = TracingBatchWriter(
+            self.write_batch, max_bytes=old.max_bytes, max_points=old.max_points,
+            max_age=old.max_age, max_inflight=old.max_inflight,
+            on_error=self.on_write_error, on_written=self._on_written
+        )
+        old.close()
+
+    def process_trace(self, trace):
+        t0 = time.perf_counter()
+        t_in = trace.stats.get("bench_t_in")
+        if t_in is not None:
+            self.stages["queue"].append(t0 - t_in)
+            self.writer.pending_t_in.append(t_in)
+        super().process_trace(trace)
+        self.stages["encode"].append(time.perf_counter() - t0)
+
+    def write_batch(self, payload):
+        t0 = time.perf_counter()
+        super().write_batch(payload)
+        self.stages["write"].append(time.perf_counter() - t0)
+
+    def _on_written(self, t_in):
+        now = time.perf_counter()
+        self.stages["end_to_end"].extend(now - t for t in t_in)
+
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _sample_queue(samples, stop, interval, t0):
+    while not stop.wait(interval):
+        samples.append((time.perf_counter() - t0, threads.q.qsize(), threads.q.bytes, _rss_bytes()))
+
+
+def _percentiles(values):
+    if not values:
+        return "   (no samples)"
+    p50, p90, p99 = np.percentile(values, [50, 90, 99]) * 1e3
+    return (f"p50 {p50:9.3f}  p90 {p90:9.3f}  p99 {p99:9.3f}  "
+            f"max {max(values) * 1e3:9.3f} ms  (n={len(values)})")
+
+
+def bench_pipeline(args):
+    """Source sintetis -> on_data -> threads.q -> InfluxDBConsumer -> sink."""
+    sink = FakeInfluxSink(args.sink_delay)
+    channels = args.channels.split(",")
+    client = SyntheticSeedlinkClient(args.stations, channels=channels)
+    if args.no_resample:
+        client.resample_rate = None
+    keys = list(client.selected_streams)
+
+    stages = {name: [] for name in ("source_lag", "on_data", "queue", "encode", "write", "end_to_end")}
+    consumer = BenchConsumer(
+        sink.url, "bench", "bench-org", "bench", MEASUREMENT, None,
+        batch_max_bytes=args.batch_max_bytes, batch_max_points=args.batch_max_points,
+        batch_max_age=args.batch_max_age, max_inflight=args.max_inflight,
+        stop_event=threading.Event(), stages=stages
+    )
+    consumer_thread = threading.Thread(target=consumer.run, name="InfluxConsumer")
+
+    npts = int(round(args.packet * args.rate))
+    rng = np.random.default_rng(0)
+    pool = [(rng.standard_normal(npts) * 1000).astype(np.int32) for _ in range(16)]
+    gaps = rng.random((1 << 16,)) < args.gap_prob
+
+    depth = []
+    sampler_stop = threading.Event()
+    t0 = time.perf_counter()
+    sampler = threading.Thread(target=_sample_queue, args=(depth, sampler_stop, args.sample_interval, t0),
+                               daemon=True)
+    consumer_thread.start()
+    sampler.start()
+
+    # Waktu data: paket ke-k berakhir `latency` detik sebelum dikirim
+    start = UTCDateTime() - args.latency - args.packet
+    packets = samples_in = skipped = 0
+    k = 0
+    while time.perf_counter() - t0 < args.duration:
+        if args.speed:
+            due = t0 + (k + 1) * args.packet / args.speed
+            wait = due - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            stages["source_lag"].append(max(0., -wait))
+        starttime = start + k * args.packet
+        for i, (net, sta, loc, cha) in enumerate(keys):
+            if gaps[(k * len(keys) + i) & 0xFFFF]:
+                skipped += 1
+                continue
+            tr = Trace(data=pool[(k + i) & 15], header={
+                "network": net, "station": sta, "location": loc, "channel": cha,
+                "sampling_rate": args.rate, "starttime": starttime,
+            })
+            t_in = time.perf_counter()
+            tr.stats.bench_t_in = t_in
+            client.on_data(tr)
+            stages["on_data"].append(time.perf_counter() - t_in)
+            packets += 1
+            samples_in += npts
+        k += 1
+    t_source = time.perf_counter() - t0
+
+    consumer.stop_event.set()
+    consumer_thread.join()
+    elapsed = time.perf_counter() - t0
+    sampler_stop.set()
+    sampler.join()
+    sink_stats = sink.stats()
+    sink.close()
+    queue_stats = threads.q.stats(per_channel=False)
+
+    mode = f"{args.speed:g}x realtime" if args.speed else "as fast as possible"
+    print(f"pipeline: {len(keys)} channels @ {args.rate:g} Hz, {args.packet:g}s packets, "
+          f"{mode}, latency {args.latency:g}s, gap prob {args.gap_prob:g}, "
+          f"resample {'off' if args.no_resample else f'{client.resample_rate:g} Hz'}, "
+          f"queue policy {threads.q.policy}")
+    print(f"  source   : {packets:,} packets, {samples_in:,} samples in {t_source:.1f}s "
+          f"({samples_in / t_source:,.0f} samples/s, {skipped:,} gap packets)")
+    print(f"  sink     : {sink_stats['lines']:,} points, {sink_stats['requests']:,} requests, "
+          f"{sink_stats['bytes'] / 1e6:,.1f} MB in {elapsed:.1f}s")
+    print(f"  end-to-end throughput: {samples_in / elapsed:14,.0f} input samples/s"
+          f"  {sink_stats['lines'] / elapsed:14,.0f} points/s written")
+    print(f"  queue    : drops {queue_stats['drops']:,} ({queue_stats['dropped_samples']:,} samples), "
+          f"coalesced {queue_stats['coalesced']:,}, high water {queue_stats['high_water_bytes'] / 1e6:,.1f} MB")
+    print(f"  peak RSS : {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:,.1f} MB")
+    print("  latency per stage:")
+    for name, values in stages.items():
+        print(f"    {name:11s}: {_percentiles(values)}")
+
+    print("  queue depth over time:")
+    print(f"    {'t (s)':>8s} {'items':>8s} {'MB':>9s} {'RSS MB':>9s}")
+    step = max(1, len(depth) // args.depth_rows)
+    for t, items, nbytes, rss in depth[::step]:
+        rss = f"{rss / 1e6:9.1f}" if rss is not None else f"{'-':>9s}"
+        print(f"    {t:8.1f} {items:8d} {nbytes / 1e6:9.2f} {rss}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("encoder", help="legacy Point loop vs encoder line protocol")
+    p.add_argument("--npts", type=int, default=3000)
+    p.add_argument("--repeat", type=int, default=20)
+    p.add_argument("--dtype", default="int32", choices=["int32", "float64"])
+    p.set_defaults(func=bench_encoder)
+
+    p = sub.add_parser("resample", help="trace.resample per paket vs streaming FIR")
+    p.add_argument("--rate", type=float, default=100.)
+    p.add_argument("--out-rate", type=float, default=10.)
+    p.add_argument("--packet", type=float, default=1., help="panjang paket (detik)")
+    p.add_argument("--seconds", type=float, default=600.)
+    p.set_defaults(func=bench_resample)
+
+    p = sub.add_parser("ondata", help="microbenchmark MySeedlinkClient.on_data")
+    p.add_argument("--streams", type=int, default=2000)
+    p.add_argument("--packets", type=int, default=20000)
+    p.add_argument("--npts", type=int, default=100)
+    p.add_argument("--resample", action="store_true", help="aktifkan resampling 10 Hz")
+    p.set_defaults(func=bench_ondata)
+
+    p = sub.add_parser("pipeline", help="on_data -> threads.q -> InfluxDBConsumer -> sink HTTP lokal")
+    p.add_argument("--stations", type=int, default=200)
+    p.add_argument("--channels", default="SHZ", help="daftar channel per stasiun, pisah koma")
+    p.add_argument("--rate", type=float, default=100., help="sampling rate (Hz)")
+    p.add_argument("--packet", type=float, default=1., help="panjang paket (detik)")
+    p.add_argument("--duration", type=float, default=30., help="lama source berjalan (detik)")
+    p.add_argument("--speed", type=float, default=1.,
+                   help="kecepatan relatif realtime; 0 = secepat mungkin")
+    p.add_argument("--latency", type=float, default=2., help="latency data SeedLink (detik)")
+    p.add_argument("--gap-prob", type=float, default=0., help="peluang paket hilang (gap)")
+    p.add_argument("--no-resample", action="store_true", help="matikan resampling 10 Hz")
+    p.add_argument("--sink-delay", type=float, default=0., help="delay per request di sink (detik)")
+    p.add_argument("--batch-max-bytes", type=int, default=2 * 1024 * 1024)
+    p.add_argument("--batch-max-points", type=int, default=50000)
+    p.add_argument("--batch-max-age", type=float, default=1.)
+    p.add_argument("--max-inflight", type=int, default=4)
+    p.add_argument("--sample-interval", type=float, default=1., help="interval sampling queue (detik)")
+    p.add_argument("--depth-rows", type=int, default=20, help="maksimal baris tabel queue depth")
+    p.set_defaults(func=bench_pipeline)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,25 @@
-from influxdb_client import InfluxDBClient, Point, WritePrecision
+from influxdb_client import InfluxDBClient, WritePrecision
 from influxdb_client.client.write_api import SYNCHRONOUS
-from obspy import Stream
 import logging
 import queue
-from datetime import timedelta
+import time
 from threads import q, shutdown_event
-import numpy as np
+from line_protocol import encode_trace
+from batch_writer import BatchWriter
+from spool import WriteAheadSpool, SpoolReplayer
 
 logger = logging.getLogger("influx_consumer")
 
+STATS_INTERVAL = 60  # seconds
+
+
 class InfluxDBConsumer:
-    def __init__(self, url, token, org, bucket, measurement, net_filter, dryrun=False):
+    def __init__(self, url, token, org, bucket, measurement, net_filter, dryrun=False,
+                 batch_max_bytes=2 * 1024 * 1024, batch_max_points=50000,
+                 batch_max_age=1.0, max_inflight=4, inbox=None, stop_event=None,
+                 spool_dir=None, spool_max_bytes=1024 * 1024 * 1024,
+                 spool_segment_bytes=64 * 1024 * 1024, replay_batch_bytes=8 * 1024 * 1024,
+                 replay_max_bytes_per_sec=None):
         self.client = InfluxDBClient(url=url, token=token, org=org)
         self.write_api = self.client.write_api(write_options=SYNCHRONOUS)
         self.bucket = bucket
@@ -18,69 +27,105 @@ class InfluxDBConsumer:
         self.net_filter = net_filter
         self.dryrun = dryrun
         self.force_shutdown = None
+        # Default: queue global dan shutdown_event; ConsumerPool memberi
+        # inbox per shard dan event stop sendiri.
+        self.inbox = q if inbox is None else inbox
+        self.stop_event = shutdown_event if stop_event is None else stop_event
+
+        # Spool di disk: tanpa spool_dir, error tulis tetap force_shutdown
+        self.spool = None
+        self.replayer = None
+        if spool_dir:
+            self.spool = WriteAheadSpool(spool_dir, max_bytes=spool_max_bytes,
+                                         segment_bytes=spool_segment_bytes)
+
+        self.writer = BatchWriter(
+            self.write_batch,
+            max_bytes=batch_max_bytes,
+            max_points=batch_max_points,
+            max_age=batch_max_age,
+            max_inflight=max_inflight,
+            on_error=self.on_write_error,
+            spill=self.spool.append if self.spool else None
+        )
+
+        if self.spool:
+            self.replayer = SpoolReplayer(
+                self.spool, self.write_batch,
+                batch_bytes=replay_batch_bytes,
+                max_bytes_per_sec=replay_max_bytes_per_sec,
+                on_success=self.writer.mark_sink_up
+            )
 
     def run(self):
         logger.info("[InfluxConsumer] Running...")
-        while not shutdown_event.is_set():
+        if self.replayer:
+            self.replayer.start()
+        timeout = min(5, self.writer.max_age)
+        next_stats = time.monotonic() + STATS_INTERVAL
+        while True:
             try:
-                trace = q.get(timeout=5)
+                trace = self.inbox.get(timeout=timeout)
+                if trace is None:  # sentinel dari ConsumerPool
+                    break
                 self.process_trace(trace)
             except queue.Empty:
-                logger.debug("Rx: timeout: no data in queue")
+                # Berhenti setelah shutdown dan inbox sudah kosong (drain)
+                if self.stop_event.is_set():
+                    break
             except Exception as e:
                 logger.error(f"Consumer error: {e}", exc_info=True)
                 if self.force_shutdown:
                     self.force_shutdown(e)
+            self.writer.flush_if_due()
+
+            if time.monotonic() >= next_stats:
+                self.log_stats()
+                next_stats += STATS_INTERVAL
         self.close()
 
+    def log_stats(self):
+        logger.info(f"[InfluxConsumer] writer stats: {self.writer.stats()}")
+        if hasattr(self.inbox, "stats"):
+            logger.info(f"[InfluxConsumer] queue stats: {self.inbox.stats(per_channel=False)}")
+        if self.spool:
+            logger.info(f"[InfluxConsumer] spool stats: {self.spool.stats()}, "
+                        f"replay: {self.replayer.stats()}")
+
     def process_trace(self, trace):
         net = trace.stats.network
         sta = trace.stats.station
         loc = trace.stats.location
         cha = trace.stats.channel
-        starttime = trace.stats.starttime.datetime
-        delta = trace.stats.delta
 
         if self.net_filter and net not in self.net_filter:
             return
-        
-        print(f"[DEBUG] {sta}: type(trace.data[0]) =", type(trace.data[0]))
 
-        points = []
-        for i, val in enumerate(trace.data):
-            # Skip NaN or inf
-            if not np.isfinite(val):
-                continue
-
-            timestamp = starttime + timedelta(seconds=i * delta)
-            # safe_val = float(val.item() if hasattr(val, "item") else val)
-
-            point = Point(self.measurement) \
-                .tag("network", net) \
-                .tag("station", sta) \
-                .tag("location", loc) \
-                .tag("channel", cha) \
-                .field("value", float(val)) \
-                .time(timestamp, WritePrecision.NS)
-
-            points.append(point)
-
-        if not points:
+        payload, count = encode_trace(self.measurement, trace)
+        if not count:
             logger.warning(f"No valid data to write for: {net}.{sta}.{loc}.{cha}")
             return
 
-        try:
-            self.write_api.write(bucket=self.bucket, record=points)
-            logger.info(f"Wrote {len(points)} samples: {net}.{sta}.{loc}.{cha}")
-        except Exception as e:
-            logger.error(f"[{sta}] Write error: {e}")
-            if self.force_shutdown:
-                self.force_shutdown(e)
+        self.writer.add(payload, count)
+
+    def write_batch(self, payload):
+        self.write_api.write(bucket=self.bucket, record=payload,
+                             write_precision=WritePrecision.NS)
 
+    def on_write_error(self, payload, points, error):
+        if self.force_shutdown:
+            self.force_shutdown(error)
 
     def close(self):
         logger.info("Closing InfluxDB client...")
         try:
+            self.writer.close()
+            if self.replayer:
+                self.replayer.stop()
+                self.replayer.join()
+            self.log_stats()
+            if self.spool:
+                self.spool.close()
             self.write_api.flush()
             self.client.close()
         except Exception as e:
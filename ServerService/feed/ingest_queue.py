@@ -0,0 +1,251 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger("threads")
+
+POLICIES = ("drop_oldest", "coalesce", "block")
+
+
+class _Channel:
+    __slots__ = ("items", "bytes", "samples", "drops", "dropped_samples",
+                 "coalesced", "high_water", "stale")
+
+    def __init__(self):
+        self.items = deque()
+        self.bytes = 0
+        self.samples = 0
+        self.drops = 0
+        self.dropped_samples = 0
+        self.coalesced = 0
+        self.high_water = 0
+        # Jumlah entri di urutan global yang item-nya sudah dibuang
+        self.stale = 0
+
+
+class IngestQueue:
+    """Antrian trace yang dibatasi total byte/sampel, bukan jumlah item.
+
+    Policy saat penuh:
+      - "drop_oldest": buang paket tertua dari channel yang sama (atau
+        paket tertua secara global jika channel itu kosong); put() tidak
+        pernah memblok thread SeedLink.
+      - "coalesce": seperti drop_oldest, ditambah paket yang bersambung
+        dengan paket terakhir channel yang sama digabung menjadi satu trace.
+      - "block": tunggu sampai ada ruang atau timeout, lalu queue.Full.
+
+    API kompatibel dengan queue.Queue (put/get/qsize/empty), sehingga
+    producer dan consumer tidak perlu diubah.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, max_samples=None,
+                 policy="drop_oldest", coalesce_max_samples=6000):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy} (use one of {POLICIES})")
+        self.max_bytes = max_bytes
+        self.max_samples = max_samples
+        self.policy = policy
+        self.coalesce_max_samples = coalesce_max_samples
+
+        self._mutex = threading.Lock()
+        self._not_empty = threading.Condition(self._mutex)
+        self._not_full = threading.Condition(self._mutex)
+        self._channels = {}
+        self._order = deque()
+
+        self.items = 0
+        self.bytes = 0
+        self.samples = 0
+        self.high_water_bytes = 0
+        self.high_water_samples = 0
+        self.drops = 0
+        self.dropped_samples = 0
+        self.coalesced = 0
+
+    # --- API queue.Queue ---
+    def put(self, trace, block=True, timeout=None):
+        key = _channel_id(trace)
+        nbytes = trace.data.nbytes
+        npts = len(trace.data)
+
+        with self._not_full:
+            ch = self._channels.get(key)
+            if ch is None:
+                ch = self._channels[key] = _Channel()
+
+            if self._too_big(nbytes, npts):
+                self._count_drop(key, ch, npts)
+                return
+
+            if self.policy == "block":
+                self._wait_for_room(nbytes, npts, block, timeout)
+            else:
+                while self._over_budget(nbytes, npts):
+                    self._evict(key, ch)
+
+            if self.policy == "coalesce" and self._coalesce(ch, trace):
+                ch.coalesced += 1
+                self.coalesced += 1
+            else:
+                ch.items.append(trace)
+                self._order.append(key)
+                self.items += 1
+                self._not_empty.notify()
+
+            ch.bytes += nbytes
+            ch.samples += npts
+            ch.high_water = max(ch.high_water, len(ch.items))
+            self.bytes += nbytes
+            self.samples += npts
+            self.high_water_bytes = max(self.high_water_bytes, self.bytes)
+            self.high_water_samples = max(self.high_water_samples, self.samples)
+
+    def put_nowait(self, trace):
+        return self.put(trace, block=False)
+
+    def get(self, block=True, timeout=None):
+        with self._not_empty:
+            if not block:
+                if not self.items:
+                    raise queue.Empty
+            elif timeout is None:
+                while not self.items:
+                    self._not_empty.wait()
+            else:
+                deadline = time.monotonic() + timeout
+                while not self.items:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise queue.Empty
+                    self._not_empty.wait(remaining)
+
+            while True:
+                key = self._order.popleft()
+                ch = self._channels[key]
+                if ch.stale:
+                    ch.stale -= 1
+                    continue
+                trace = ch.items.popleft()
+                self._release(ch, trace)
+                self._not_full.notify()
+                return trace
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def qsize(self):
+        return self.items
+
+    def empty(self):
+        return not self.items
+
+    def full(self):
+        return self._over_budget(0, 0)
+
+    def stats(self, per_channel=True):
+        with self._mutex:
+            stats = {
+                "policy": self.policy,
+                "items": self.items,
+                "bytes": self.bytes,
+                "samples": self.samples,
+                "high_water_bytes": self.high_water_bytes,
+                "high_water_samples": self.high_water_samples,
+                "drops": self.drops,
+                "dropped_samples": self.dropped_samples,
+                "coalesced": self.coalesced,
+            }
+            if per_channel:
+                stats["channels"] = {
+                    key: {
+                        "depth": len(ch.items),
+                        "bytes": ch.bytes,
+                        "drops": ch.drops,
+                        "coalesced": ch.coalesced,
+                        "high_water": ch.high_water,
+                    }
+                    for key, ch in self._channels.items()
+                }
+            return stats
+
+    # --- Internal (dipanggil dengan mutex terkunci) ---
+    def _too_big(self, nbytes, npts):
+        return ((self.max_bytes is not None and nbytes > self.max_bytes) or
+                (self.max_samples is not None and npts > self.max_samples))
+
+    def _over_budget(self, nbytes, npts):
+        return ((self.max_bytes is not None and self.bytes + nbytes > self.max_bytes) or
+                (self.max_samples is not None and self.samples + npts > self.max_samples))
+
+    def _wait_for_room(self, nbytes, npts, block, timeout):
+        if not block:
+            if self._over_budget(nbytes, npts):
+                raise queue.Full
+            return
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._over_budget(nbytes, npts):
+            if deadline is None:
+                self._not_full.wait()
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise queue.Full
+            self._not_full.wait(remaining)
+
+    def _evict(self, key, ch):
+        victim_key, victim = key, ch
+        if not ch.items:
+            # Channel ini kosong: buang paket tertua secara global
+            while True:
+                victim_key = self._order.popleft()
+                victim = self._channels[victim_key]
+                if victim.stale:
+                    victim.stale -= 1
+                    continue
+                break
+        else:
+            victim.stale += 1
+        trace = victim.items.popleft()
+        self._release(victim, trace)
+        self._count_drop(victim_key, victim, len(trace.data))
+
+    def _release(self, ch, trace):
+        nbytes = trace.data.nbytes
+        npts = len(trace.data)
+        ch.bytes -= nbytes
+        ch.samples -= npts
+        self.items -= 1
+        self.bytes -= nbytes
+        self.samples -= npts
+
+    def _count_drop(self, key, ch, npts):
+        ch.drops += 1
+        ch.dropped_samples += npts
+        self.drops += 1
+        self.dropped_samples += npts
+        if ch.drops == 1 or ch.drops % 1000 == 0:
+            logger.warning(f"[IngestQueue] {key}: dropped {ch.drops} packets "
+                           f"({ch.dropped_samples} samples), queue {self.bytes} bytes")
+
+    def _coalesce(self, ch, trace):
+        if not ch.items:
+            return False
+        last = ch.items[-1]
+        a, b = last.stats, trace.stats
+        if (a.sampling_rate != b.sampling_rate or last.data.dtype != trace.data.dtype
+                or a.npts + b.npts > self.coalesce_max_samples):
+            return False
+        # Paket harus bersambung tepat setelah sampel terakhir
+        if abs(b.starttime - (a.endtime + a.delta)) > 0.5 * a.delta:
+            return False
+        last.data = np.concatenate([last.data, trace.data])
+        return True
+
+
+def _channel_id(trace):
+    stats = trace.stats
+    return f"{stats.network}.{stats.station}.{stats.location}.{stats.channel}"
@@ -1,24 +1,33 @@
 import logging
-from threads import ProducerThread, ConsumerThread
+from threads import ProducerThread, ConsumerThread, ConsumerPool, ring_store
+from ringstore import RingStoreServer
 from myseedlink import MySeedlinkClient
 from influx_consumer import InfluxDBConsumer
 import os
+import sys
 
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s [%(levelname)s] %(name)s: %(message)s',
-    handlers=[
-        logging.FileHandler("app.log", mode='w'),
-        logging.StreamHandler()
-    ]
-)
+def setup_logging():
+    # Dipanggil hanya dari __main__: worker proses (spawn) meng-import ulang
+    # modul ini dan tidak boleh menimpa app.log.
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format='%(asctime)s [%(levelname)s] %(name)s: %(message)s',
+        handlers=[
+            logging.FileHandler("app.log", mode='w'),
+            logging.StreamHandler()
+        ]
+    )
+
+    logging.getLogger("obspy.seedlink").setLevel(logging.DEBUG)
+    logging.getLogger("threads").setLevel(logging.DEBUG)
+    logging.getLogger("influx_consumer").setLevel(logging.DEBUG)
+    logging.getLogger("ringstore").setLevel(logging.DEBUG)
 
-logging.getLogger("obspy.seedlink").setLevel(logging.DEBUG)
-logging.getLogger("threads").setLevel(logging.DEBUG)
-logging.getLogger("influx_consumer").setLevel(logging.DEBUG)
 
 if __name__ == "__main__":
+    setup_logging()
+
     # CONFIG
     SEEDLINK_SERVER = os.getenv("SEEDLINK_SERVER", "localhost:18000")
     STREAM_PATTERNS = [["AM", ".*", "SHZ", ".*"]]  # semua stream
@@ -33,21 +42,92 @@ if __name__ == "__main__":
     INFLUXDB_MEASUREMENT = "waveform"
     NETWORK_FILTER = ["AM"]  # None untuk semua
 
+    # BATCH WRITE
+    BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_BYTES", 2 * 1024 * 1024))
+    BATCH_MAX_POINTS = int(os.getenv("BATCH_MAX_POINTS", 50000))
+    BATCH_MAX_AGE = float(os.getenv("BATCH_MAX_AGE", 1.0))  # seconds
+    WRITE_MAX_INFLIGHT = int(os.getenv("WRITE_MAX_INFLIGHT", 4))
+
+    # SPOOL (kosong = nonaktif, error tulis menghentikan feed)
+    SPOOL_DIR = os.getenv("SPOOL_DIR", "")
+    SPOOL_MAX_BYTES = int(os.getenv("SPOOL_MAX_BYTES", 1024 * 1024 * 1024))
+    SPOOL_SEGMENT_BYTES = int(os.getenv("SPOOL_SEGMENT_BYTES", 64 * 1024 * 1024))
+    REPLAY_BATCH_BYTES = int(os.getenv("REPLAY_BATCH_BYTES", 8 * 1024 * 1024))
+    REPLAY_MAX_BYTES_PER_SEC = int(os.getenv("REPLAY_MAX_BYTES_PER_SEC", 0)) or None
+
+    # CONSUMER POOL
+    CONSUMER_WORKERS = int(os.getenv("CONSUMER_WORKERS", 1))
+    CONSUMER_PROCESSES = os.getenv("CONSUMER_PROCESSES", "0") == "1"  # 1 = worker proses
+
+    # RING STORE (waveform terbaru untuk services API)
+    RING_HOST = os.getenv("RING_HOST", "127.0.0.1")
+    RING_PORT = int(os.getenv("RING_PORT", 8765))
+
+    # FEED MODE: "threads" (default) atau "multiprocess" (producer dan
+    # consumer di proses terpisah, sampel lewat shared memory)
+    FEED_MODE = os.getenv("FEED_MODE", "threads")
+    SHM_RING_SLOTS = int(os.getenv("SHM_RING_SLOTS", 4096))
+    SHM_SLOT_BYTES = int(os.getenv("SHM_SLOT_BYTES", 16384))
+
+    seedlink_args = (SEEDLINK_SERVER, STREAM_PATTERNS, STATEFILE, RECOVER)
+    consumer_args = (INFLUXDB_URL, INFLUXDB_TOKEN, INFLUXDB_ORG,
+                     INFLUXDB_BUCKET, INFLUXDB_MEASUREMENT,
+                     NETWORK_FILTER, False)
+    consumer_kwargs = {
+        "batch_max_bytes": BATCH_MAX_BYTES,
+        "batch_max_points": BATCH_MAX_POINTS,
+        "batch_max_age": BATCH_MAX_AGE,
+        "max_inflight": WRITE_MAX_INFLIGHT,
+        "spool_dir": SPOOL_DIR,
+        "spool_max_bytes": SPOOL_MAX_BYTES,
+        "spool_segment_bytes": SPOOL_SEGMENT_BYTES,
+        "replay_batch_bytes": REPLAY_BATCH_BYTES,
+        "replay_max_bytes_per_sec": REPLAY_MAX_BYTES_PER_SEC,
+    }
+
+    if FEED_MODE == "multiprocess":
+        from pipeline import SharedMemoryPipeline
+        pipeline = SharedMemoryPipeline(
+            slclient=MySeedlinkClient,
+            sl_args=seedlink_args,
+            dbclient=InfluxDBConsumer,
+            db_args=consumer_args,
+            db_kwargs=consumer_kwargs,
+            workers=CONSUMER_WORKERS,
+            slots=SHM_RING_SLOTS,
+            slot_bytes=SHM_SLOT_BYTES,
+            ring_host=RING_HOST,
+            ring_port=RING_PORT
+        )
+        sys.exit(pipeline.run())
+
     # SEEDLINK
     producer = ProducerThread(
         name="SeedLinkProducer",
         slclient=MySeedlinkClient,
-        args=(SEEDLINK_SERVER, STREAM_PATTERNS, STATEFILE, RECOVER)
+        args=seedlink_args
     )
 
     # CONSUME
-    consumer = ConsumerThread(
-        name="InfluxConsumer",
-        dbclient=InfluxDBConsumer,
-        args=(INFLUXDB_URL, INFLUXDB_TOKEN, INFLUXDB_ORG,
-              INFLUXDB_BUCKET, INFLUXDB_MEASUREMENT,
-              NETWORK_FILTER, False)
-    )
+    if CONSUMER_WORKERS > 1 or CONSUMER_PROCESSES:
+        consumer = ConsumerPool(
+            name="InfluxConsumer",
+            dbclient=InfluxDBConsumer,
+            args=consumer_args,
+            kwargs=consumer_kwargs,
+            workers=CONSUMER_WORKERS,
+            use_processes=CONSUMER_PROCESSES
+        )
+    else:
+        consumer = ConsumerThread(
+            name="InfluxConsumer",
+            dbclient=InfluxDBConsumer,
+            args=consumer_args,
+            kwargs=consumer_kwargs
+        )
+
+    if ring_store is not None:
+        RingStoreServer(ring_store, RING_HOST, RING_PORT).start()
 
     producer.start()
     consumer.start()
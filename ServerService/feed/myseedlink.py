@@ -2,31 +2,44 @@
 
 import sys
 import re
+import time
 import queue
 import logging
 from datetime import datetime
 from io import StringIO
 
-from obspy import UTCDateTime
 from obspy.clients.seedlink import EasySeedLinkClient
 from obspy.clients.seedlink.seedlinkexception import SeedLinkException
 from lxml import etree
 
-from threads import q, shutdown_event
+from threads import q, shutdown_event, ring_store
+from decimator import StreamingResampler
 
 logger = logging.getLogger('obspy.seedlink')
 
 
+class StreamState:
+    """State per channel yang dipilih, diambil sekali per paket di on_data."""
+    __slots__ = ("id", "latency_ok", "resampler")
+
+    def __init__(self, stream_id):
+        self.id = stream_id
+        self.latency_ok = None
+        self.resampler = None
+
+
 class MySeedlinkClient(EasySeedLinkClient):
     def __init__(self, server, streams, statefile, recover):
         super().__init__(server)
-        self.selected_streams = []
+        # (net, sta, loc, cha) -> StreamState, lookup O(1) di on_data
+        self.selected_streams = {}
         self.statefile = statefile
         self.recover = recover
+        self.queue = q
+        self.ring_store = ring_store
         self.queue_timeout = 15  # seconds
         self.SL_PACKET_TIME_MAX = 60. * 30.  # 30 minutes
         self.resample_rate = 10.  # Hz
-        self.show_too_old_packet_msg = {}
 
         # Ambil stream dari server dan seleksi
         for patterns in streams:
@@ -91,47 +104,53 @@ class MySeedlinkClient(EasySeedLinkClient):
     def add_stream(self, net, sta, cha, loc):
         """Tambahkan stream ke daftar untuk diproses."""
         self.select_stream(net, sta, cha)
-        stream = ".".join([net, sta, loc or "", cha])
-        self.selected_streams.append(stream)
-        # logger.info(f"[SeedLink] stream added: {stream}")
+        key = (net, sta, loc or "", cha)
+        if key not in self.selected_streams:
+            self.selected_streams[key] = StreamState(sys.intern(".".join(key)))
+        # logger.info(f"[SeedLink] stream added: {key}")
 
     def on_data(self, trace):
         """Callback saat data diterima dari SeedLink."""
-        channel = ".".join([
-            trace.stats.network,
-            trace.stats.station,
-            trace.stats.location or "",
-            trace.stats.channel
-        ])
-
-        if channel not in self.selected_streams:
-            logger.warning(f"[on_data] Skipping unselected stream: {channel}")
+        stats = trace.stats
+        state = self.selected_streams.get(
+            (stats.network, stats.station, stats.location or "", stats.channel))
+
+        if state is None:
+            logger.warning("[on_data] Skipping unselected stream: %s.%s.%s.%s",
+                           stats.network, stats.station, stats.location, stats.channel)
             return
 
-        now = datetime.utcnow()
-        latency = UTCDateTime(now) - trace.stats.endtime
+        channel = state.id
+        latency = time.time() - stats.endtime.timestamp
 
         if self.SL_PACKET_TIME_MAX and latency > self.SL_PACKET_TIME_MAX:
-            if self.show_too_old_packet_msg.get(channel, True):
+            if state.latency_ok is not False:
                 logger.info(f"[{channel}] Latency too high: {latency:.1f}s — ignoring")
-                self.show_too_old_packet_msg[channel] = False
+                state.latency_ok = False
             return
-        else:
-            if self.show_too_old_packet_msg.get(channel, False) is False:
+        elif not state.latency_ok:
+            if state.latency_ok is False:
                 logger.info(f"[{channel}] Latency OK again: {latency:.1f}s")
-                self.show_too_old_packet_msg[channel] = True
+            state.latency_ok = True
 
-        # Resampling
-        if self.resample_rate:
+        # Resampling (streaming FIR, state dibawa antar paket)
+        if self.resample_rate and stats.sampling_rate != self.resample_rate:
             try:
-                trace.resample(self.resample_rate)
+                rs = state.resampler
+                if rs is None or rs.in_rate != stats.sampling_rate:
+                    rs = state.resampler = StreamingResampler(stats.sampling_rate, self.resample_rate)
+                if not rs.resample_trace(trace):
+                    return
             except Exception as e:
                 logger.warning(f"Can't resample {channel}: {e}")
 
+        if self.ring_store is not None:
+            self.ring_store.append(channel, trace)
+
         # Masukkan ke antrian
         try:
-            q.put(trace, block=True, timeout=self.queue_timeout)
-            logger.debug(f"[on_data] Trace put to queue: {channel}")
+            self.queue.put(trace, block=True, timeout=self.queue_timeout)
+            logger.debug("[on_data] Trace put to queue: %s", channel)
         except queue.Full:
             logger.error("Queue is full, dropping data!")
 
@@ -0,0 +1,163 @@
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+
+from obspy.clients.seedlink.seedlinkexception import SeedLinkException
+
+import threads
+from shm_ring import SampleRing, ShardedRingWriter, RingReader
+
+logger = logging.getLogger("threads")
+
+
+def _setup_child_logging():
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s [%(levelname)s] %(processName)s %(name)s: %(message)s'
+    )
+
+
+def _producer_main(slclient, args, kwargs, specs, stop_event, failed_event,
+                   ring_host=None, ring_port=None):
+    """Proses SeedLink: decode + resample, tulis blok sampel ke ring."""
+    _setup_child_logging()
+    writer = ShardedRingWriter(specs)
+
+    def watch_stop():
+        stop_event.wait()
+        threads.shutdown_event.set()
+        client.conn.terminate()
+
+    try:
+        client = slclient(*args, **kwargs)
+    except SeedLinkException as e:
+        logger.error(f"SeedLink init error: {e}")
+        failed_event.set()
+        writer.close()
+        sys.exit(1)
+
+    client.queue = writer
+    if threads.ring_store is not None and ring_port:
+        from ringstore import RingStoreServer
+        RingStoreServer(threads.ring_store, ring_host, ring_port).start()
+    threading.Thread(target=watch_stop, name="StopWatcher", daemon=True).start()
+
+    try:
+        client.run()
+        # run() selesai karena terminate(): simpan state lewat jalur normal
+        client.stop_seedlink()
+    except SystemExit:
+        # on_data sudah memanggil stop_seedlink() (state tersimpan)
+        pass
+    except Exception as e:
+        logger.error(f"SeedLink runtime error: {e}")
+        failed_event.set()
+    finally:
+        writer.close()
+
+
+def _consumer_main(dbclient, args, kwargs, spec, drained_event, failed_event):
+    """Proses consumer: baca blok dari ring (zero-copy), encode, tulis."""
+    _setup_child_logging()
+    reader = RingReader(spec)
+
+    def force_shutdown(msg):
+        logger.error(msg)
+        failed_event.set()
+        sys.exit(1)
+
+    try:
+        client = dbclient(*args, inbox=reader, stop_event=drained_event, **kwargs)
+        client.force_shutdown = force_shutdown
+        client.run()
+    except Exception as e:
+        force_shutdown(f"Consumer error: {e}")
+    finally:
+        reader.close()
+
+
+class SharedMemoryPipeline:
+    """Mode multi-proses: producer SeedLink dan N consumer di proses terpisah.
+
+    Producer menulis blok sampel ke satu SampleRing per consumer (di-shard
+    per channel) sehingga tidak ada pickle trace dan consumer membaca data
+    langsung dari shared memory. SIGINT/SIGTERM atau kegagalan salah satu
+    proses memicu shutdown: producer menyimpan statefile lewat
+    `stop_seedlink`, mengirim sentinel ke setiap ring, lalu consumer
+    menghabiskan ring dan menutup client.
+    """
+
+    def __init__(self, slclient, sl_args, dbclient, db_args, db_kwargs=None, workers=1,
+                 slots=4096, slot_bytes=16384, ring_host=None, ring_port=None,
+                 drain_timeout=60):
+        self.ctx = multiprocessing.get_context("spawn")
+        self.stop_event = self.ctx.Event()
+        self.failed_event = self.ctx.Event()
+        self.drained_event = self.ctx.Event()
+        self.drain_timeout = drain_timeout
+        self.rings = [SampleRing(self.ctx, slots, slot_bytes) for _ in range(workers)]
+
+        self.producer = self.ctx.Process(
+            name="SeedLinkProducer",
+            target=_producer_main,
+            args=(slclient, sl_args, {}, [r.spec() for r in self.rings],
+                  self.stop_event, self.failed_event, ring_host, ring_port)
+        )
+        self.consumers = [
+            self.ctx.Process(
+                name=f"InfluxConsumer-{i}",
+                target=_consumer_main,
+                args=(dbclient, db_args, self._worker_kwargs(db_kwargs or {}, i),
+                      ring.spec(), self.drained_event, self.failed_event)
+            )
+            for i, ring in enumerate(self.rings)
+        ]
+
+    @staticmethod
+    def _worker_kwargs(kwargs, i):
+        kwargs = dict(kwargs)
+        # Sama seperti ConsumerPool: setiap worker memakai spool sendiri
+        if kwargs.get("spool_dir"):
+            kwargs["spool_dir"] = os.path.join(kwargs["spool_dir"], f"worker-{i}")
+        return kwargs
+
+    def _request_stop(self, signum=None, frame=None):
+        if not self.stop_event.is_set():
+            logger.info("[Pipeline] Shutdown requested")
+        self.stop_event.set()
+
+    def run(self):
+        signal.signal(signal.SIGINT, self._request_stop)
+        signal.signal(signal.SIGTERM, self._request_stop)
+        logger.info(f"[Pipeline] Starting producer + {len(self.consumers)} consumer processes")
+
+        for p in self.consumers:
+            p.start()
+        self.producer.start()
+
+        try:
+            while self.producer.is_alive():
+                self.producer.join(1)
+                if self.stop_event.is_set():
+                    continue
+                if self.failed_event.is_set() or not all(p.is_alive() for p in self.consumers):
+                    logger.error("[Pipeline] A process failed, shutting down")
+                    self._request_stop()
+
+            # Producer sudah mengirim sentinel; beri waktu consumer menghabiskan ring
+            for p in self.consumers:
+                p.join(self.drain_timeout)
+            self.drained_event.set()
+            for p in self.consumers:
+                p.join(5)
+                if p.is_alive():
+                    logger.error(f"[Pipeline] {p.name} did not exit, terminating")
+                    p.terminate()
+        finally:
+            for ring in self.rings:
+                ring.unlink()
+        return 1 if self.failed_event.is_set() else 0
@@ -0,0 +1,255 @@
+import fnmatch
+import json
+import logging
+import math
+import socketserver
+import threading
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger("ringstore")
+
+
+class ChannelRing:
+    """Ring buffer float32 untuk satu channel dengan sampling rate tetap.
+
+    Sampel ke-i (sejak reset) berada pada waktu `t0 + i / sampling_rate`
+    dan disimpan di posisi `i % capacity`. Gap diisi NaN; overlap mundur
+    atau perubahan sampling rate me-reset ring.
+    """
+    __slots__ = ("sampling_rate", "capacity", "data", "t0", "head", "lock")
+
+    def __init__(self, sampling_rate, seconds):
+        self.sampling_rate = sampling_rate
+        self.capacity = max(1, int(math.ceil(seconds * sampling_rate)))
+        self.data = np.full(self.capacity, np.nan, dtype=np.float32)
+        self.t0 = None
+        self.head = 0
+        self.lock = threading.Lock()
+
+    def append(self, start, samples):
+        n = len(samples)
+        if not n:
+            return
+        with self.lock:
+            if self.t0 is None:
+                self.t0, self.head = start, 0
+            index = int(round((start - self.t0) * self.sampling_rate))
+            if index < self.head - 1 or index - self.head >= self.capacity:
+                # Overlap mundur atau gap lebih panjang dari ring: mulai baru
+                self.t0, self.head, index = start, 0, 0
+                self.data.fill(np.nan)
+            elif index > self.head:
+                self._write(self.head, np.full(index - self.head, np.nan, dtype=np.float32))
+            if n > self.capacity:
+                samples = samples[-self.capacity:]
+                index += n - self.capacity
+            self._write(index, samples)
+            self.head = max(self.head, index + len(samples))
+
+    def _write(self, index, samples):
+        pos = index % self.capacity
+        first = min(len(samples), self.capacity - pos)
+        self.data[pos:pos + first] = samples[:first]
+        if first < len(samples):
+            self.data[:len(samples) - first] = samples[first:]
+
+    def window(self, seconds):
+        """Return (start, array) untuk `seconds` detik terakhir yang tersedia."""
+        with self.lock:
+            n = min(int(math.ceil(seconds * self.sampling_rate)), self.head, self.capacity)
+            if not n:
+                return None, np.empty(0, dtype=np.float32)
+            first = self.head - n
+            pos = first % self.capacity
+            if pos + n <= self.capacity:
+                out = self.data[pos:pos + n].copy()
+            else:
+                out = np.concatenate([self.data[pos:], self.data[:pos + n - self.capacity]])
+            return self.t0 + first / self.sampling_rate, out
+
+    def end_time(self):
+        if self.t0 is None:
+            return None
+        return self.t0 + self.head / self.sampling_rate
+
+
+class StreamSubscriber:
+    """Antrian frame chunk baru untuk satu koneksi op "stream".
+
+    Antrian dibatasi `maxlen` frame; jika client lambat, frame tertua
+    dibuang (dihitung di `dropped`) supaya on_data tidak pernah menunggu.
+    """
+
+    def __init__(self, patterns=None, maxlen=256):
+        self.patterns = patterns or None
+        self.frames = deque(maxlen=maxlen)
+        self.dropped = 0
+        self._matches = {}
+        self._cond = threading.Condition()
+
+    def matches(self, channel):
+        match = self._matches.get(channel)
+        if match is None:
+            match = self._matches[channel] = self.patterns is None or any(
+                fnmatch.fnmatchcase(channel, p) for p in self.patterns)
+        return match
+
+    def put(self, frame):
+        with self._cond:
+            if len(self.frames) == self.frames.maxlen:
+                self.dropped += 1
+            self.frames.append(frame)
+            self._cond.notify()
+
+    def take(self, timeout):
+        """Ambil semua frame yang antri (list kosong jika timeout)."""
+        with self._cond:
+            if not self.frames:
+                self._cond.wait(timeout)
+            frames = list(self.frames)
+            self.frames.clear()
+        return frames
+
+
+class RingBufferStore:
+    """Data waveform terbaru per channel (N menit terakhir) di memori feed."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.rings = {}
+        self.streams = []
+        self._lock = threading.Lock()
+
+    def append(self, channel, trace):
+        stats = trace.stats
+        ring = self.rings.get(channel)
+        if ring is None or ring.sampling_rate != stats.sampling_rate:
+            with self._lock:
+                ring = self.rings[channel] = ChannelRing(stats.sampling_rate, self.seconds)
+        data = np.asarray(trace.data, dtype=np.float32)
+        ring.append(stats.starttime.timestamp, data)
+        if self.streams:
+            self._publish(channel, stats.starttime.timestamp, stats.sampling_rate, data)
+
+    def _publish(self, channel, start, sampling_rate, data):
+        # Frame di-encode sekali per chunk lalu dibagikan ke semua stream
+        frame = None
+        for subscriber in self.streams:
+            if not subscriber.matches(channel):
+                continue
+            if frame is None:
+                header = {"id": channel, "start": start, "sample_rate": sampling_rate, "npts": len(data)}
+                frame = json.dumps(header).encode() + b"\n" + data.astype("<f4").tobytes()
+            subscriber.put(frame)
+
+    def subscribe(self, patterns=None, maxlen=256):
+        subscriber = StreamSubscriber(patterns, maxlen)
+        with self._lock:
+            self.streams = self.streams + [subscriber]
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self.streams = [s for s in self.streams if s is not subscriber]
+
+    def select(self, patterns=None):
+        ids = list(self.rings)
+        if not patterns:
+            return ids
+        return [i for i in ids if any(fnmatch.fnmatchcase(i, p) for p in patterns)]
+
+    def window(self, patterns, seconds):
+        """Return list (header, array) untuk channel yang cocok dengan pattern."""
+        result = []
+        for channel in self.select(patterns):
+            ring = self.rings[channel]
+            start, data = ring.window(seconds)
+            if start is None:
+                continue
+            result.append(({
+                "id": channel,
+                "start": start,
+                "sample_rate": ring.sampling_rate,
+                "npts": len(data),
+            }, data))
+        return result
+
+
+class _RingRequestHandler(socketserver.StreamRequestHandler):
+    """Protokol: satu baris JSON request, balasan satu baris JSON header
+    diikuti array float32 little-endian semua channel secara berurutan.
+
+    Op "stream" mengubah koneksi menjadi aliran chunk baru: setelah header
+    {"seconds", "stream": true}, setiap chunk dikirim sebagai satu baris
+    JSON {id, start, sample_rate, npts} diikuti npts float32. Baris kosong
+    dikirim sebagai keepalive saat tidak ada data.
+    """
+
+    def handle(self):
+        store = self.server.store
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                op = request.get("op", "window")
+                if op == "stream":
+                    self.stream(store, request.get("ids"))
+                    return
+                if op == "window":
+                    seconds = min(float(request.get("seconds", 30)), store.seconds)
+                    channels = store.window(request.get("ids"), seconds)
+                    header = {"seconds": store.seconds, "channels": [h for h, _ in channels]}
+                    body = b"".join(d.astype("<f4").tobytes() for _, d in channels)
+                elif op == "list":
+                    header = {"seconds": store.seconds, "channels": store.select(request.get("ids"))}
+                    body = b""
+                else:
+                    header, body = {"error": f"unknown op {op}"}, b""
+            except Exception as e:
+                header, body = {"error": str(e)}, b""
+            self.wfile.write(json.dumps(header).encode() + b"\n" + body)
+            self.wfile.flush()
+
+    def stream(self, store, patterns):
+        subscriber = store.subscribe(patterns, self.server.stream_buffer)
+        peer = "%s:%s" % self.client_address[:2]
+        logger.info(f"[RingStoreServer] Stream opened for {peer} ({patterns or 'all channels'})")
+        try:
+            self.wfile.write(json.dumps({"seconds": store.seconds, "stream": True}).encode() + b"\n")
+            self.wfile.flush()
+            while not self.server.stopping.is_set():
+                frames = subscriber.take(timeout=5.)
+                self.wfile.write(b"".join(frames) or b"\n")
+                self.wfile.flush()
+        except OSError:
+            pass
+        finally:
+            store.unsubscribe(subscriber)
+            logger.info(f"[RingStoreServer] Stream closed for {peer} ({subscriber.dropped} chunks dropped)")
+
+
+class _ThreadingTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class RingStoreServer(threading.Thread):
+    """Layani RingBufferStore lewat socket TCP lokal untuk services API."""
+
+    def __init__(self, store, host="127.0.0.1", port=8765, name="RingStoreServer", stream_buffer=256):
+        super().__init__(name=name, daemon=True)
+        self.server = _ThreadingTCPServer((host, port), _RingRequestHandler)
+        self.server.store = store
+        self.server.stream_buffer = stream_buffer
+        self.server.stopping = threading.Event()
+
+    def run(self):
+        host, port = self.server.server_address[:2]
+        logger.info(f"[{self.name}] Serving recent waveforms on {host}:{port}")
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.stopping.set()
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,175 @@
+import logging
+import queue
+import struct
+from multiprocessing import shared_memory
+
+import numpy as np
+from obspy import Trace, UTCDateTime
+
+from threads import shard_index
+
+logger = logging.getLogger("threads")
+
+# Header slot: net, sta, loc, cha, kode dtype, npts, delta, start (ns)
+_HEADER = struct.Struct("<8s8s8s8sBIdq")
+_DATA_OFFSET = 64  # header dipad supaya data ter-align 8 byte
+_DTYPES = [np.dtype("<i4"), np.dtype("<f4"), np.dtype("<f8"), np.dtype("<i2"), np.dtype("<i8")]
+_DTYPE_CODES = {dt: i for i, dt in enumerate(_DTYPES)}
+_SENTINEL = 0xFFFFFFFF
+
+
+class SampleRing:
+    """Ring single-producer/single-consumer blok sampel di shared memory.
+
+    Ring terdiri dari `slots` slot berukuran `slot_bytes`; setiap slot
+    berisi header kecil (NSLC, dtype, npts, delta, start) diikuti data
+    mentah. Sinkronisasi memakai dua semaphore (slot kosong / slot terisi),
+    jadi index head/tail cukup disimpan lokal di masing-masing sisi.
+    Dibuat di proses utama; proses lain memakai `RingWriter`/`RingReader`
+    dengan `spec()`.
+    """
+
+    def __init__(self, ctx, slots=4096, slot_bytes=16384):
+        if slot_bytes <= _DATA_OFFSET + 8:
+            raise ValueError("slot_bytes too small")
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        self.free = ctx.Semaphore(slots)
+        self.filled = ctx.Semaphore(0)
+
+    def spec(self):
+        return (self.shm.name, self.slots, self.slot_bytes, self.free, self.filled)
+
+    def unlink(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+class _RingEnd:
+    def __init__(self, spec):
+        name, self.slots, self.slot_bytes, self.free, self.filled = spec
+        # Proses anak (spawn) berbagi resource tracker dengan proses utama,
+        # yang memegang segment dan melakukan unlink
+        self.shm = shared_memory.SharedMemory(name=name)
+        self.index = 0
+
+    def _base(self):
+        return self.index * self.slot_bytes
+
+    def _advance(self):
+        self.index = (self.index + 1) % self.slots
+
+
+class RingWriter(_RingEnd):
+    """Sisi producer: salin trace.data ke slot (sekali, tanpa pickle)."""
+
+    def put(self, trace, block=True, timeout=None):
+        stats = trace.stats
+        data = trace.data
+        if data.dtype not in _DTYPE_CODES:
+            data = data.astype(np.float64)
+        data = np.ascontiguousarray(data)
+        ids = [s.encode()[:8] for s in (stats.network, stats.station, stats.location, stats.channel)]
+        per_slot = (self.slot_bytes - _DATA_OFFSET) // data.itemsize
+        start_ns = stats.starttime.ns
+        delta = stats.delta
+
+        # Trace yang lebih besar dari satu slot dipecah menjadi beberapa blok
+        for first in range(0, len(data), per_slot):
+            chunk = data[first:first + per_slot]
+            chunk_start = start_ns + int(round(first * delta * 1e9))
+            self._write(ids, _DTYPE_CODES[data.dtype], chunk, delta, chunk_start, block, timeout)
+
+    def close_stream(self, timeout=None):
+        """Kirim sentinel ke consumer (akhir stream)."""
+        self._write([b""] * 4, 0, None, 0., 0, True, timeout)
+
+    def _write(self, ids, code, chunk, delta, start_ns, block, timeout):
+        if not self.free.acquire(block, timeout):
+            raise queue.Full
+        base = self._base()
+        npts = _SENTINEL if chunk is None else len(chunk)
+        _HEADER.pack_into(self.shm.buf, base, *ids, code, npts, delta, start_ns)
+        if chunk is not None:
+            view = np.ndarray(len(chunk), dtype=chunk.dtype, buffer=self.shm.buf,
+                              offset=base + _DATA_OFFSET)
+            view[:] = chunk
+            del view
+        self._advance()
+        self.filled.release()
+
+    def close(self):
+        self.shm.close()
+
+
+class RingReader(_RingEnd):
+    """Sisi consumer dengan API get() seperti queue.
+
+    Trace yang dikembalikan memakai buffer slot secara langsung (zero-copy).
+    Slot dipinjam sampai get() berikutnya, jadi trace harus selesai diproses
+    (di-encode) sebelum get() dipanggil lagi.
+    """
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        self._leased = False
+
+    def get(self, block=True, timeout=None):
+        self._release()
+        if not self.filled.acquire(block, timeout):
+            raise queue.Empty
+        self._leased = True
+        base = self._base()
+        net, sta, loc, cha, code, npts, delta, start_ns = _HEADER.unpack_from(self.shm.buf, base)
+        if npts == _SENTINEL:
+            return None
+        data = np.ndarray(npts, dtype=_DTYPES[code], buffer=self.shm.buf,
+                          offset=base + _DATA_OFFSET)
+        header = {
+            "network": net.rstrip(b"\0").decode(),
+            "station": sta.rstrip(b"\0").decode(),
+            "location": loc.rstrip(b"\0").decode(),
+            "channel": cha.rstrip(b"\0").decode(),
+            "delta": delta,
+            "starttime": UTCDateTime(ns=start_ns),
+        }
+        return Trace(data=data, header=header)
+
+    def _release(self):
+        if self._leased:
+            self._leased = False
+            self._advance()
+            self.free.release()
+
+    def close(self):
+        self._release()
+        try:
+            self.shm.close()
+        except BufferError:
+            # Masih ada view trace yang dipegang; segment ditutup saat proses selesai
+            pass
+
+
+class ShardedRingWriter:
+    """Route trace ke salah satu RingWriter berdasarkan hash net.sta.loc.cha."""
+
+    def __init__(self, specs):
+        self.writers = [RingWriter(spec) for spec in specs]
+        self._shards = {}
+
+    def put(self, trace, block=True, timeout=None):
+        stats = trace.stats
+        key = (stats.network, stats.station, stats.location, stats.channel)
+        shard = self._shards.get(key)
+        if shard is None:
+            shard = self._shards[key] = shard_index(key, len(self.writers))
+        self.writers[shard].put(trace, block, timeout)
+
+    def close(self, timeout=30):
+        for writer in self.writers:
+            try:
+                writer.close_stream(timeout)
+            except queue.Full:
+                logger.error("[ShardedRingWriter] Consumer not draining, sentinel not sent")
+            writer.close()
@@ -0,0 +1,286 @@
+import glob
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+logger = logging.getLogger("influx_consumer")
+
+# Header record: panjang payload, crc32 payload, jumlah point
+_RECORD = struct.Struct("<III")
+# Index: magic, read_seg, read_off, write_seg, write_off, spilled, replayed, dropped
+_INDEX = struct.Struct("<4sQQQQQQQ")
+_MAGIC = b"SPL1"
+
+
+class WriteAheadSpool:
+    """Spool append-only di disk untuk batch line protocol yang gagal ditulis.
+
+    Data disimpan dalam segment `segment-XXXXXXXX.log` yang dirotasi setiap
+    `segment_bytes`. Posisi baca/tulis disimpan di `spool.idx` yang
+    di-memory-map, jadi update cursor hanya berupa tulis ke memori dan
+    tetap ada setelah restart. Setiap record punya crc32; record terpotong
+    di ujung segment (crash saat menulis) dibuang saat spool dibuka.
+    """
+
+    def __init__(self, directory, max_bytes=1024 * 1024 * 1024,
+                 segment_bytes=64 * 1024 * 1024, fsync=False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        index_path = os.path.join(directory, "spool.idx")
+        new_index = not os.path.exists(index_path)
+        fd = os.open(index_path, os.O_RDWR | os.O_CREAT)
+        try:
+            if os.fstat(fd).st_size < _INDEX.size:
+                os.ftruncate(fd, _INDEX.size)
+            self._index = mmap.mmap(fd, _INDEX.size)
+        finally:
+            os.close(fd)
+
+        magic, *cursor = _INDEX.unpack_from(self._index)
+        if new_index or magic != _MAGIC:
+            segments = self._segments() or [1]
+            cursor = [segments[0], 0, segments[-1], 0, 0, 0, 0]
+        (self.read_seg, self.read_off, self.write_seg, self.write_off,
+         self.spilled, self.replayed, self.dropped) = cursor
+
+        self._recover()
+        self._writer = open(self._segment_path(self.write_seg), "ab")
+        self._save_index()
+
+    # --- Tulis ---
+    def append(self, payload, points):
+        """Tulis satu batch ke spool. Return False jika spool penuh."""
+        with self._lock:
+            if self.pending_bytes() + len(payload) + _RECORD.size > self.max_bytes:
+                self.dropped += points
+                self._save_index()
+                logger.error(f"[Spool] Full ({self.max_bytes} bytes), dropping {points} points")
+                return False
+            if self.write_off >= self.segment_bytes:
+                self._rotate()
+
+            record = _RECORD.pack(len(payload), zlib.crc32(payload), points)
+            self._writer.write(record + payload)
+            self._writer.flush()
+            if self.fsync:
+                os.fsync(self._writer.fileno())
+            self.write_off += _RECORD.size + len(payload)
+            self.spilled += points
+            self._save_index()
+            return True
+
+    # --- Baca (untuk replay) ---
+    def read_batch(self, max_bytes):
+        """Ambil record dari cursor baca sampai kira-kira max_bytes.
+
+        Return (payload, points, cursor) atau None jika kosong. Cursor baru
+        hanya disimpan lewat commit() setelah batch berhasil ditulis.
+        """
+        with self._lock:
+            seg, off = self.read_seg, self.read_off
+            write_seg, write_off = self.write_seg, self.write_off
+        chunks, points, size = [], 0, 0
+
+        while size < max_bytes and (seg, off) < (write_seg, write_off):
+            end = write_off if seg == write_seg else None
+            eof = False
+            with open(self._segment_path(seg), "rb") as f:
+                # Batas data valid: write cursor di segment aktif, ukuran file di segment lama
+                limit = end if end is not None else os.fstat(f.fileno()).st_size
+                f.seek(off)
+                while size < max_bytes and off < limit:
+                    header = f.read(_RECORD.size)
+                    if len(header) < _RECORD.size:
+                        eof = True
+                        break
+                    length, crc, n = _RECORD.unpack(header)
+                    if off + _RECORD.size + length > limit:
+                        # Header rusak: panjang tidak bisa dipercaya, sisa segment dilewati
+                        logger.error(f"[Spool] Corrupt record header in segment {seg} at {off} "
+                                     f"(length {length}), skipping {limit - off} bytes to end of segment")
+                        off = limit
+                        eof = True
+                        break
+                    payload = f.read(length)
+                    off += _RECORD.size + length
+                    if len(payload) < length or zlib.crc32(payload) != crc:
+                        logger.error(f"[Spool] Corrupt record in segment {seg} before {off}, skipped")
+                        continue
+                    chunks.append(payload)
+                    points += n
+                    size += length
+            if not eof and off < limit:
+                break
+            if seg < write_seg:
+                seg, off = seg + 1, 0
+            else:
+                break
+
+        if not chunks:
+            if (seg, off) != (self.read_seg, self.read_off):
+                self.commit((seg, off), 0)
+            return None
+        return b"".join(chunks), points, (seg, off)
+
+    def commit(self, cursor, points):
+        """Majukan cursor baca dan hapus segment yang sudah habis."""
+        with self._lock:
+            old_seg = self.read_seg
+            self.read_seg, self.read_off = cursor
+            self.replayed += points
+            self._save_index()
+        for seg in range(old_seg, self.read_seg):
+            try:
+                os.remove(self._segment_path(seg))
+            except FileNotFoundError:
+                pass
+
+    # --- Observasi ---
+    def pending_bytes(self):
+        total = 0
+        for seg in range(self.read_seg, self.write_seg + 1):
+            if seg == self.write_seg:
+                total += self.write_off
+            else:
+                try:
+                    total += os.path.getsize(self._segment_path(seg))
+                except FileNotFoundError:
+                    pass
+        return total - self.read_off
+
+    def empty(self):
+        return (self.read_seg, self.read_off) >= (self.write_seg, self.write_off)
+
+    def stats(self):
+        return {
+            "pending_bytes": self.pending_bytes(),
+            "segments": self.write_seg - self.read_seg + 1,
+            "spilled_points": self.spilled,
+            "replayed_points": self.replayed,
+            "dropped_points": self.dropped,
+        }
+
+    def close(self):
+        with self._lock:
+            self._writer.close()
+            self._save_index()
+            self._index.flush()
+            self._index.close()
+
+    # --- Internal ---
+    def _segment_path(self, seg):
+        return os.path.join(self.directory, f"segment-{seg:08d}.log")
+
+    def _segments(self):
+        names = glob.glob(os.path.join(self.directory, "segment-*.log"))
+        return sorted(int(os.path.basename(n)[8:16]) for n in names)
+
+    def _rotate(self):
+        self._writer.close()
+        self.write_seg += 1
+        self.write_off = 0
+        self._writer = open(self._segment_path(self.write_seg), "ab")
+        logger.info(f"[Spool] Rotated to segment {self.write_seg}")
+
+    def _recover(self):
+        """Sesuaikan write cursor dengan isi segment terakhir di disk."""
+        path = self._segment_path(self.write_seg)
+        if not os.path.exists(path):
+            self.write_off = 0
+            return
+        off = self.write_off
+        with open(path, "rb") as f:
+            f.seek(off)
+            # Record yang sudah tertulis tapi belum tercatat di index
+            while True:
+                header = f.read(_RECORD.size)
+                if len(header) < _RECORD.size:
+                    break
+                length, crc, _ = _RECORD.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    break
+                off += _RECORD.size + length
+        if off != os.path.getsize(path):
+            logger.warning(f"[Spool] Truncating partial record in segment {self.write_seg} at {off}")
+            with open(path, "r+b") as f:
+                f.truncate(off)
+        self.write_off = off
+
+    def _save_index(self):
+        _INDEX.pack_into(self._index, 0, _MAGIC, self.read_seg, self.read_off,
+                         self.write_seg, self.write_off, self.spilled, self.replayed,
+                         self.dropped)
+
+
+class SpoolReplayer(threading.Thread):
+    """Kirim ulang isi spool ke InfluxDB dalam bulk write saat sink pulih."""
+
+    def __init__(self, spool, write_func, batch_bytes=8 * 1024 * 1024,
+                 max_bytes_per_sec=None, interval=5.0, on_success=None, name="SpoolReplayer"):
+        super().__init__(name=name, daemon=True)
+        self.spool = spool
+        self.write_func = write_func
+        self.batch_bytes = batch_bytes
+        self.max_bytes_per_sec = max_bytes_per_sec
+        self.interval = interval
+        self.on_success = on_success
+        self.stop_event = threading.Event()
+
+        self.replayed_bytes = 0
+        self.failures = 0
+        self.last_throughput = 0.
+
+    def run(self):
+        backoff = self.interval
+        while not self.stop_event.is_set():
+            batch = self.spool.read_batch(self.batch_bytes)
+            if batch is None:
+                self.stop_event.wait(self.interval)
+                continue
+
+            payload, points, cursor = batch
+            t0 = time.monotonic()
+            try:
+                self.write_func(payload)
+            except Exception as e:
+                self.failures += 1
+                logger.warning(f"[SpoolReplayer] Sink still unavailable ({e}), retry in {backoff:.1f}s")
+                self.stop_event.wait(backoff)
+                backoff = min(backoff * 2, 60.)
+                continue
+
+            elapsed = time.monotonic() - t0
+            backoff = self.interval
+            self.spool.commit(cursor, points)
+            self.replayed_bytes += len(payload)
+            self.last_throughput = len(payload) / elapsed if elapsed > 0 else 0.
+            if self.on_success:
+                self.on_success()
+            logger.info(f"[SpoolReplayer] Replayed {points} points ({len(payload)} bytes) "
+                        f"in {elapsed:.2f}s, pending {self.spool.pending_bytes()} bytes")
+
+            # Batasi throughput replay supaya tidak membanjiri sink yang baru pulih
+            if self.max_bytes_per_sec:
+                wait = len(payload) / self.max_bytes_per_sec - elapsed
+                if wait > 0:
+                    self.stop_event.wait(wait)
+
+    def stop(self):
+        self.stop_event.set()
+
+    def stats(self):
+        return {
+            "replayed_bytes": self.replayed_bytes,
+            "failures": self.failures,
+            "last_throughput": self.last_throughput,
+        }
@@ -1,16 +1,31 @@
 import logging
+import multiprocessing
+import os
+import queue
 from queue import Queue
+import signal
 import sys
 import threading
+import time
+import zlib
 from obspy.clients.seedlink.seedlinkexception import SeedLinkException
+from ingest_queue import IngestQueue
+from ringstore import RingBufferStore
 
 # Logger default
 logger = logging.getLogger('threads')
 
 # Variabel global bersama antar-thread
-BUF_SIZE = 1000000
-q = Queue(BUF_SIZE)
+# Antrian dibatasi total byte/sampel (bukan jumlah trace), lihat IngestQueue
+INGEST_MAX_BYTES = int(os.getenv("INGEST_MAX_BYTES", 256 * 1024 * 1024))
+INGEST_MAX_SAMPLES = int(os.getenv("INGEST_MAX_SAMPLES", 0)) or None
+INGEST_POLICY = os.getenv("INGEST_POLICY", "drop_oldest")  # drop_oldest | coalesce | block
+q = IngestQueue(max_bytes=INGEST_MAX_BYTES, max_samples=INGEST_MAX_SAMPLES, policy=INGEST_POLICY)
 shutdown_event = threading.Event()
+# Waveform N menit terakhir per channel untuk services API (0 = nonaktif)
+RING_SECONDS = float(os.getenv("RING_SECONDS", 600))
+ring_store = RingBufferStore(RING_SECONDS) if RING_SECONDS > 0 else None
+STATS_INTERVAL = 60  # seconds
 last_packet_time = {}
 lock = threading.Lock()
 
@@ -74,3 +89,174 @@ class ConsumerThread(threading.Thread):
         logger.error(f"[{self.name}] Thread has called force_shutdown()")
         shutdown_event.set()
         sys.exit(1)
+
+
+def shard_index(key, n):
+    """Index shard untuk (net, sta, loc, cha); crc32 stabil antar proses,
+    berbeda dengan hash() bawaan."""
+    return zlib.crc32(".".join(key).encode()) % n
+
+
+def _consumer_process(dbclient, args, kwargs, inbox, stop_event, failed_event):
+    """Entry point worker ConsumerPool dalam mode proses."""
+    # Shutdown selalu lewat shutdown_event di proses utama
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s [%(levelname)s] %(processName)s %(name)s: %(message)s'
+    )
+
+    def force_shutdown(msg):
+        logger.error(msg)
+        logger.error(f"[{multiprocessing.current_process().name}] Process has called force_shutdown()")
+        failed_event.set()
+        sys.exit(1)
+
+    try:
+        client = dbclient(*args, inbox=inbox, stop_event=stop_event, **kwargs)
+    except Exception as e:
+        force_shutdown(f"DB client init error: {e}")
+    client.force_shutdown = force_shutdown
+    try:
+        client.run()
+    except Exception as e:
+        force_shutdown(f"Consumer runtime error: {e}")
+
+
+class ConsumerPool(threading.Thread):
+    """Dispatcher `q` ke N consumer, di-shard berdasarkan hash net.sta.loc.cha.
+
+    Satu channel selalu masuk ke worker yang sama sehingga urutannya
+    terjaga, sementara channel berbeda diproses paralel. Worker berupa
+    thread (ConsumerThread) atau proses (`use_processes=True`) agar encoding
+    tidak dibatasi GIL. Saat shutdown_event di-set, sisa `q` diteruskan ke
+    worker, lalu setiap worker menerima sentinel None dan menutup client
+    setelah inbox-nya kosong.
+    """
+
+    def __init__(self, name=None, dbclient=None, args=(), kwargs=None,
+                 workers=1, use_processes=False, inbox_size=1000, drain_timeout=60):
+        super().__init__(name=name)
+        if dbclient is None:
+            raise ValueError("dbclient must be provided.")
+        if workers < 1:
+            raise ValueError("workers must be >= 1.")
+
+        self.name = name
+        self.dbclient = dbclient
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.n_workers = workers
+        self.use_processes = use_processes
+        self.inbox_size = inbox_size
+        self.drain_timeout = drain_timeout
+        self.routed = [0] * workers
+        self._shards = {}
+
+        if use_processes:
+            ctx = multiprocessing.get_context("spawn")
+            self._workers_stop = ctx.Event()
+            self._failed = ctx.Event()
+            self.inboxes = [ctx.Queue(inbox_size) for _ in range(workers)]
+            self.workers = [
+                ctx.Process(
+                    name=f"{name}-{i}",
+                    target=_consumer_process,
+                    args=(dbclient, args, self._worker_kwargs(i), self.inboxes[i],
+                          self._workers_stop, self._failed),
+                    daemon=True
+                )
+                for i in range(workers)
+            ]
+        else:
+            self._workers_stop = threading.Event()
+            self._failed = None
+            self.inboxes = [Queue(inbox_size) for _ in range(workers)]
+            self.workers = [
+                ConsumerThread(
+                    name=f"{name}-{i}",
+                    dbclient=dbclient,
+                    args=args,
+                    kwargs=dict(self._worker_kwargs(i), inbox=self.inboxes[i],
+                                stop_event=self._workers_stop)
+                )
+                for i in range(workers)
+            ]
+
+    def _worker_kwargs(self, i):
+        kwargs = dict(self.kwargs)
+        # Setiap worker memakai spool sendiri
+        if kwargs.get("spool_dir"):
+            kwargs["spool_dir"] = os.path.join(kwargs["spool_dir"], f"worker-{i}")
+        return kwargs
+
+    def shard_of(self, trace):
+        stats = trace.stats
+        key = (stats.network, stats.station, stats.location, stats.channel)
+        shard = self._shards.get(key)
+        if shard is None:
+            shard = self._shards[key] = shard_index(key, self.n_workers)
+        return shard
+
+    def run(self):
+        mode = "process" if self.use_processes else "thread"
+        logger.info(f"[{self.name}] Starting consumer pool: {self.n_workers} {mode} workers.")
+        for w in self.workers:
+            w.start()
+
+        next_stats = time.monotonic() + STATS_INTERVAL
+        while not shutdown_event.is_set():
+            self._check_workers()
+            if time.monotonic() >= next_stats:
+                logger.info(f"[{self.name}] queue stats: {q.stats(per_channel=False)}, routed={self.routed}")
+                next_stats += STATS_INTERVAL
+            try:
+                trace = q.get(timeout=1)
+            except queue.Empty:
+                continue
+            self._route(trace)
+
+        # Drain: teruskan sisa antrian sebelum worker dihentikan
+        drained = 0
+        while True:
+            try:
+                trace = q.get_nowait()
+            except queue.Empty:
+                break
+            self._route(trace)
+            drained += 1
+        logger.info(f"[{self.name}] Shutdown: forwarded {drained} queued traces, routed={self.routed}")
+
+        for inbox in self.inboxes:
+            self._put(inbox, None)
+        for w in self.workers:
+            w.join(self.drain_timeout)
+            if w.is_alive():
+                logger.error(f"[{self.name}] Worker {w.name} did not drain in {self.drain_timeout}s")
+        self._workers_stop.set()
+
+    def _route(self, trace):
+        shard = self.shard_of(trace)
+        self.routed[shard] += 1
+        self._put(self.inboxes[shard], trace)
+
+    def _put(self, inbox, item):
+        # Blok selama worker penuh (backpressure ke `q`), tapi tetap
+        # memeriksa worker supaya dispatcher tidak menggantung selamanya.
+        while True:
+            try:
+                inbox.put(item, timeout=1)
+                return
+            except queue.Full:
+                if not self._check_workers():
+                    return
+
+    def _check_workers(self):
+        if self._failed is not None and self._failed.is_set():
+            logger.error(f"[{self.name}] Consumer process failed, shutting down.")
+            shutdown_event.set()
+        alive = all(w.is_alive() for w in self.workers)
+        if not alive and not shutdown_event.is_set():
+            logger.error(f"[{self.name}] Consumer worker died, shutting down.")
+            shutdown_event.set()
+        return alive
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""Benchmark API services terhadap InfluxDB palsu lokal.
+
+Contoh:
+    python benchmark.py query --requests 200 --concurrency 50 --delay 0.05
+    python benchmark.py query --delay 2 --timeout 0.5
+    python benchmark.py events --events 500000
+    python benchmark.py bulletin --arrivals 5000
+    python benchmark.py inventory --stations 500 --channels 12
+"""
+import argparse
+import asyncio
+import http.server
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from influxdb_client import InfluxDBClient
+from lxml import etree
+
+import bulletin_parser
+from event_store import EventStore
+from influx_query import InfluxQuery, QueryError, QueryTimeout
+from station_inventory import StationInventory
+
+CSV_HEADER = (
+    "#datatype,string,long,dateTime:RFC3339,dateTime:RFC3339,dateTime:RFC3339,double,"
+    "string,string,string,string,string\r\n"
+    "#group,false,false,true,true,false,false,true,true,true,true,true\r\n"
+    "#default,_result,,,,,,,,,,\r\n"
+    ",result,table,_start,_stop,_time,_value,_field,_measurement,channel,network,station\r\n"
+)
+
+
+def flux_csv(channels, points, rate=10.):
+    """Respons annotated CSV /api/v2/query: satu tabel per channel."""
+    stop = datetime.now(timezone.utc).replace(microsecond=0)
+    start = stop - timedelta(seconds=points / rate)
+    start_s, stop_s = start.isoformat().replace("+00:00", "Z"), stop.isoformat().replace("+00:00", "Z")
+    rows = [CSV_HEADER]
+    for table, cha in enumerate(channels):
+        for i in range(points):
+            t = (start + timedelta(seconds=i / rate)).isoformat().replace("+00:00", "Z")
+            rows.append(f",,{table},{start_s},{stop_s},{t},{np.sin(i / 10.):.6f},"
+                        f"value,waveform,{cha},AM,R0000\r\n")
+    rows.append("\r\n")
+    return "".join(rows).encode()
+
+
+class _QueryHandler(http.server.BaseHTTPRequestHandler):
+    """Pengganti endpoint /api/v2/query: delay lalu balas CSV tetap."""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv; charset=utf-8")
+        self.send_header("Content-Length", str(len(self.server.body)))
+        self.end_headers()
+        try:
+            self.wfile.write(self.server.body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client sudah timeout
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _server_main(conn, delay, channels, points):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _QueryHandler)
+    server.daemon_threads = True
+    server.delay = delay
+    server.body = flux_csv(channels, points)
+    conn.send(server.server_address[1])
+    server.serve_forever()
+
+
+class FakeInfluxServer:
+    """InfluxDB palsu (POST /api/v2/query) di proses terpisah."""
+
+    def __init__(self, delay=0., channels=("SHZ", "SHN", "SHE"), points=300):
+        ctx = multiprocessing.get_context("spawn")
+        parent, child = ctx.Pipe()
+        self.process = ctx.Process(target=_server_main, args=(child, delay, channels, points),
+                                   daemon=True)
+        self.process.start()
+        self.url = f"http://127.0.0.1:{parent.recv()}"
+
+    def close(self):
+        self.process.terminate()
+        self.process.join()
+
+
+async def _watch_loop(lags, stop, interval=0.01):
+    """Ukur keterlambatan event loop (loop yang terblokir -> lag besar)."""
+    while not stop.is_set():
+        t0 = time.monotonic()
+        await asyncio.sleep(interval)
+        lags.append(time.monotonic() - t0 - interval)
+
+
+def _percentiles(values):
+    if not values:
+        return "-"
+    p50, p95, p99 = np.percentile(values, [50, 95, 99]) * 1000
+    return f"p50 {p50:8.1f} ms  p95 {p95:8.1f} ms  p99 {p99:8.1f} ms  max {max(values) * 1000:8.1f} ms"
+
+
+async def _run_queries(query, requests, concurrency):
+    """`requests` query dengan maksimal `concurrency` request aktif;
+    return (latency, jumlah error, jumlah timeout, lag event loop, durasi)."""
+    latencies, lags = [], []
+    errors = timeouts = 0
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(_watch_loop(lags, stop))
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors, timeouts
+        async with gate:
+            t0 = time.monotonic()
+            try:
+                tables = await query()
+                assert sum(len(t.records) for t in tables)
+                latencies.append(time.monotonic() - t0)
+            except QueryTimeout:
+                timeouts += 1
+            except QueryError:
+                errors += 1
+
+    t0 = time.monotonic()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.monotonic() - t0
+    stop.set()
+    await watcher
+    return latencies, errors, timeouts, lags, elapsed
+
+
+def _report(name, latencies, errors, timeouts, lags, elapsed):
+    print(f"  {name}")
+    print(f"    {len(latencies)} ok, {errors} error, {timeouts} timeout in {elapsed:.2f}s "
+          f"({len(latencies) / elapsed:,.1f} queries/s)")
+    print(f"    latency    {_percentiles(latencies)}")
+    print(f"    loop lag   {_percentiles(lags)}")
+
+
+def bench_query(args):
+    channels = args.channels.split(",")
+    server = FakeInfluxServer(args.delay, channels, args.points)
+    flux = 'from(bucket: "seedlinksmart") |> range(start: -30s)'
+    print(f"query: {args.requests} requests, concurrency {args.concurrency}, "
+          f"{len(channels)} x {args.points} rows/response, server delay {args.delay * 1000:.0f} ms")
+    try:
+        async def blocking():
+            # Cara lama: client sinkron dipanggil langsung di handler async
+            client = InfluxDBClient(url=server.url, token="bench", org="bench",
+                                    timeout=int(args.timeout * 1000))
+
+            async def query():
+                try:
+                    return client.query_api().query(flux)
+                except Exception as e:
+                    raise QueryError(str(e)) from e
+            try:
+                return await _run_queries(query, args.requests, args.concurrency)
+            finally:
+                client.close()
+
+        async def layered():
+            influx = InfluxQuery(server.url, "bench", "bench", timeout=args.timeout,
+                                 max_concurrency=args.max_queries, pool_size=args.pool_size)
+            await influx.start()
+            try:
+                result = await _run_queries(lambda: influx.query(flux), args.requests, args.concurrency)
+                print(f"  influx stats: {influx.stats()}")
+                return result
+            finally:
+                await influx.close()
+
+        if not args.skip_blocking:
+            _report("blocking InfluxDBClient in event loop", *asyncio.run(blocking()))
+        _report(f"InfluxQuery (max {args.max_queries} queries, pool {args.pool_size})",
+                *asyncio.run(layered()))
+    finally:
+        server.close()
+
+
+def synthetic_events(n, years=10, seed=0):
+    """Baris event format file FDSN tersebar acak di wilayah Indonesia."""
+    rng = np.random.default_rng(seed)
+    t0 = time.time() - years * 365.25 * 86400
+    times = np.sort(rng.uniform(t0, time.time(), n))
+    for i in range(n):
+        yield {
+            "EventID": f"bmkg{i:09d}",
+            "Time": datetime.fromtimestamp(times[i], tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f"),
+            "Latitude": f"{rng.uniform(-11, 6):.3f}",
+            "Longitude": f"{rng.uniform(95, 141):.3f}",
+            "Depth/km": f"{rng.uniform(0, 600):.1f}",
+            "Author": "scautoloc",
+            "MagType": "M",
+            "Magnitude": f"{rng.exponential(0.8) + 1.5:.2f}",
+            "EventLocationName": "Indonesia Region",
+            "EventType": "earthquake",
+        }
+
+
+def bench_events(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = EventStore(os.path.join(tmp, "events.db"))
+        t0 = time.perf_counter()
+        batch = []
+        for record in synthetic_events(args.events, args.years):
+            batch.append(record)
+            if len(batch) == 10000:
+                store.upsert(batch)
+                batch = []
+        store.upsert(batch)
+        print(f"events: {store.count():,} rows inserted in {time.perf_counter() - t0:.1f}s")
+
+        now = time.time()
+        cases = {
+            "latest page": {},
+            "last 30 days": {"start": now - 30 * 86400},
+            "M >= 5": {"minmag": 5},
+            "bbox Sulawesi": {"minlat": -6, "maxlat": 2, "minlon": 118, "maxlon": 126},
+            "1 year, M >= 4, bbox": {"start": now - 365 * 86400, "minmag": 4,
+                                     "minlat": -11, "maxlat": 0, "minlon": 100, "maxlon": 120},
+            "fields EventID,Magnitude": {"fields": ["EventID", "Magnitude"]},
+        }
+        for name, params in cases.items():
+            if "start" in params:
+                params["start"] = datetime.fromtimestamp(params["start"], tz=timezone.utc).isoformat()
+            timings = []
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                events, cursor = store.query(limit=args.limit, **params)
+                timings.append(time.perf_counter() - t0)
+            # Halaman berikutnya lewat cursor
+            t0 = time.perf_counter()
+            for _ in range(args.pages):
+                if cursor is None:
+                    break
+                _, cursor = store.query(limit=args.limit, cursor=cursor, **params)
+            page = (time.perf_counter() - t0) / args.pages
+            print(f"  {name:28s} {np.median(timings) * 1000:8.2f} ms/query  "
+                  f"{page * 1000:8.2f} ms/next page  ({len(events)} rows)")
+
+
+def synthetic_bulletin(arrivals, station_magnitudes, seed=0):
+    """Teks format `scbulletin -3` dengan jumlah arrival/magnitudo stasiun tertentu."""
+    rng = np.random.default_rng(seed)
+    lines = [
+        "Event:",
+        f"    Public ID              bmg{seed:012d}",
+        "    Preferred Origin ID    Origin/20240101000000.000000.1",
+        "    Preferred Magnitude ID Magnitude/20240101000000.000000.2",
+        "    Type                   earthquake",
+        "    Description",
+        "      region name: Java, Indonesia",
+        "    Creation time          2024-01-01 00:00:30.0",
+        "",
+        "Origin:",
+        "    Public ID              Origin/20240101000000.000000.1",
+        "    Date                   2024-01-01",
+        "    Time                   00:00:00.12  +/-   0.4 s",
+        "    Latitude              -7.12 deg  +/-    3 km",
+        "    Longitude            107.45 deg  +/-    4 km",
+        "    Depth                    10 km   (fixed)",
+        "    Agency                 BMKG",
+        "    Author                 scautoloc@localhost",
+        "    Mode                   automatic",
+        "    Status                 confirmed",
+        "    Residual RMS            0.55 s",
+        "    Azimuthal gap             87 deg",
+        "",
+        "2 Network magnitudes:",
+        f"    MLv      4.21 +/- 0.20 {station_magnitudes:5d}   BMKG",
+        f"    M        4.21         {station_magnitudes:5d}   BMKG  preferred",
+        "",
+        f"{arrivals} Phase arrivals:",
+        "    sta  net   dist azi  phase   time         res     wt  sta",
+    ]
+    for i in range(arrivals):
+        lines.append(f"    S{i:04d} IA {rng.uniform(0, 30):6.2f} {rng.integers(0, 360):3d}  P       "
+                     f"00:{i // 600 % 60:02d}:{i / 10 % 60:04.1f}  {rng.normal(0, 1):5.1f} A  1.0  S{i:04d}")
+    lines += ["", f"{station_magnitudes} Station magnitudes:",
+              "    sta  net   dist azi  type   value   res        amp per"]
+    for i in range(station_magnitudes):
+        lines.append(f"    S{i:04d} IA {rng.uniform(0, 30):6.2f} {rng.integers(0, 360):3d}  MLv     "
+                     f"{rng.uniform(3, 5):4.2f} {rng.normal(0, 0.2):5.2f}  {rng.uniform(1, 900):7.2f} 0.50")
+    return "\n".join(lines) + "\n"
+
+
+def bench_bulletin(args):
+    texts = [synthetic_bulletin(args.arrivals, args.station_magnitudes, seed)
+             for seed in range(args.repeat)]
+    n_lines = texts[0].count("\n")
+    print(f"bulletin: {args.arrivals} arrivals, {args.station_magnitudes} station magnitudes, "
+          f"{n_lines} lines, {len(texts[0]) / 1e6:.2f} MB")
+
+    # Teks berbeda setiap iterasi: parse penuh
+    timings = []
+    for text in texts:
+        t0 = time.perf_counter()
+        data = bulletin_parser.parse_bulletin(text)
+        timings.append(time.perf_counter() - t0)
+    assert len(data["phase_arrivals"]) == args.arrivals
+    assert len(data["station_magnitudes"]) == args.station_magnitudes
+    cold = np.median(timings)
+    print(f"  parse          {cold * 1000:8.2f} ms  ({n_lines / cold / 1e6:.2f} M lines/s)")
+
+    # Teks sama (API + watcher membaca file yang sama): hash isi saja
+    timings = []
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        bulletin_parser.parse_bulletin(texts[-1])
+        timings.append(time.perf_counter() - t0)
+    print(f"  cached         {np.median(timings) * 1000:8.2f} ms  ({bulletin_parser.cache_stats()})")
+
+
+def write_station_xml(path, stations, channels, stages=2):
+    """StationXML sintetis tingkat response (stage FIR berisi koefisien)."""
+    rng = np.random.default_rng(0)
+    coefficients = "".join(f"<NumeratorCoefficient>{c:.8e}</NumeratorCoefficient>"
+                           for c in rng.normal(size=64))
+    stage = (f"<Stage number=\"1\"><FIR><InputUnits><Name>COUNTS</Name></InputUnits>"
+             f"<OutputUnits><Name>COUNTS</Name></OutputUnits><Symmetry>NONE</Symmetry>"
+             f"{coefficients}</FIR></Stage>")
+    response = f"<Response>{stage * stages}</Response>"
+    with open(path, "w") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<FDSNStationXML xmlns="http://www.fdsn.org/xml/station/1" schemaVersion="1.1">'
+                "<Source>benchmark</Source><Created>2024-01-01T00:00:00</Created>"
+                '<Network code="IA">')
+        for i in range(stations):
+            lat, lon = rng.uniform(-11, 6), rng.uniform(95, 141)
+            f.write(f'<Station code="S{i:04d}" startDate="2010-01-01T00:00:00">'
+                    f"<Latitude>{lat:.4f}</Latitude><Longitude>{lon:.4f}</Longitude>"
+                    f"<Elevation>100</Elevation><Site><Name>S{i:04d}</Name></Site>")
+            for c in range(channels):
+                cha = ("BH", "SH", "HH", "EH")[c // 3 % 4] + "ZNE"[c % 3]
+                f.write(f'<Channel code="{cha}" locationCode="{c // 12:02d}" startDate="2010-01-01T00:00:00">'
+                        f"<Latitude>{lat:.4f}</Latitude><Longitude>{lon:.4f}</Longitude>"
+                        f"<Elevation>100</Elevation><Depth>0</Depth>"
+                        f"<SampleRate>100</SampleRate>{response}</Channel>")
+            f.write("</Station>")
+        f.write("</Network></FDSNStationXML>")
+
+
+def station_coords_etree(xml_path):
+    """Cara lama /station_coords: etree.parse penuh + findall per request."""
+    ns = {"ns": "http://www.fdsn.org/xml/station/1"}
+    stations = {}
+    for net in etree.parse(xml_path).getroot().findall(".//ns:Network", namespaces=ns):
+        for sta in net.findall("ns:Station", namespaces=ns):
+            stations[f"{net.get('code')}.{sta.get('code')}"] = {
+                "lat": float(sta.find("ns:Latitude", namespaces=ns).text),
+                "lon": float(sta.find("ns:Longitude", namespaces=ns).text),
+            }
+    return json.dumps(stations).encode()
+
+
+def bench_inventory(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "stations.xml")
+        write_station_xml(path, args.stations, args.channels)
+        print(f"inventory: {args.stations} stations x {args.channels} channels, "
+              f"{os.path.getsize(path) / 1e6:.1f} MB")
+
+        t0 = time.perf_counter()
+        station_coords_etree(path)
+        print(f"  etree.parse per request  {(time.perf_counter() - t0) * 1000:9.2f} ms")
+
+        inventory = StationInventory(path)
+        t0 = time.perf_counter()
+        inventory.current()
+        print(f"  iterparse (first load)   {(time.perf_counter() - t0) * 1000:9.2f} ms")
+
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            inventory.current().coords_body
+        print(f"  cached /station_coords   {(time.perf_counter() - t0) / args.repeat * 1000:9.3f} ms")
+
+        t0 = time.perf_counter()
+        for i in range(args.repeat):
+            inventory.channels("IA", f"S{i % args.stations:04d}", "2024-01-01", ("BHZ", "SHZ", "EHZ"))
+        print(f"  channel lookup           {(time.perf_counter() - t0) / args.repeat * 1000:9.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("query", help="client sinkron vs InfluxQuery async terhadap Influx palsu")
+    p.add_argument("--requests", type=int, default=200)
+    p.add_argument("--concurrency", type=int, default=50, help="request aktif bersamaan")
+    p.add_argument("--delay", type=float, default=0.05, help="delay per query di server (detik)")
+    p.add_argument("--channels", default="SHZ,SHN,SHE", help="channel per respons, pisah koma")
+    p.add_argument("--points", type=int, default=300, help="baris per channel")
+    p.add_argument("--timeout", type=float, default=10., help="timeout per query (detik)")
+    p.add_argument("--max-queries", type=int, default=8)
+    p.add_argument("--pool-size", type=int, default=16)
+    p.add_argument("--skip-blocking", action="store_true", help="lewati pengukuran client sinkron")
+    p.set_defaults(func=bench_query)
+
+    p = sub.add_parser("events", help="query EventStore SQLite dengan katalog sintetis")
+    p.add_argument("--events", type=int, default=500000)
+    p.add_argument("--years", type=float, default=10.)
+    p.add_argument("--limit", type=int, default=100)
+    p.add_argument("--repeat", type=int, default=20)
+    p.add_argument("--pages", type=int, default=10, help="halaman lanjutan per kasus")
+    p.set_defaults(func=bench_events)
+
+    p = sub.add_parser("bulletin", help="parser bulletin scbulletin -3 sintetis")
+    p.add_argument("--arrivals", type=int, default=5000)
+    p.add_argument("--station-magnitudes", type=int, default=2000)
+    p.add_argument("--repeat", type=int, default=10)
+    p.set_defaults(func=bench_bulletin)
+
+    p = sub.add_parser("inventory", help="parse stations.xml: etree.parse vs StationInventory")
+    p.add_argument("--stations", type=int, default=500)
+    p.add_argument("--channels", type=int, default=12, help="channel per stasiun")
+    p.add_argument("--repeat", type=int, default=100)
+    p.set_defaults(func=bench_inventory)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
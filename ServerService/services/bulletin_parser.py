@@ -0,0 +1,209 @@
+"""Parser bulletin SeisComP (`scbulletin -3`) bersama untuk API dan watcher.
+
+Parser berjalan sebagai state machine per section (Event, Origin, Network
+magnitudes, Phase arrivals, Station magnitudes): setiap baris di-split
+sekali lalu diproses sesuai section aktif, tanpa melihat baris lain.
+
+Hasil parse disimpan per hash isi teks, jadi bulletin yang sama (mis.
+event_detail.txt yang dibaca API dan waveform watcher) hanya diparse
+sekali. Hasil dari cache dipakai bersama dan tidak boleh diubah pemanggil.
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENTRIES = 32
+
+# Judul section ("28 Phase arrivals:" -> "Phase arrivals")
+SECTIONS = {
+    "Event": "event",
+    "Origin": "origin",
+    "Network magnitudes": "network_magnitudes",
+    "Phase arrivals": "phase_arrivals",
+    "Station magnitudes": "station_magnitudes",
+}
+
+
+def _is_number(text):
+    return text.replace(".", "", 1).isdigit()
+
+
+def _error(parts):
+    """Nilai setelah "+/-" pada baris origin, atau None."""
+    try:
+        return float(parts[parts.index("+/-") + 1])
+    except (ValueError, IndexError):
+        return None
+
+
+def _event_line(event, parts, line):
+    key = parts[0]
+    if key == "Public":
+        event["public_id"] = parts[-1]
+    elif key == "Preferred" and len(parts) > 2:
+        if parts[1] == "Origin":
+            event["preferred_origin_id"] = parts[-1]
+        elif parts[1] == "Magnitude":
+            event["preferred_magnitude_id"] = parts[-1]
+    elif key == "region" and len(parts) > 1 and parts[1] == "name:":
+        event["region"] = line.split("region name:", 1)[1].strip()
+    elif key == "Creation":
+        event["creation_time"] = parts[-1]
+
+
+def _origin_line(origin, parts, line):
+    key = parts[0]
+    if key == "Public":
+        origin["public_id"] = parts[-1]
+    elif key == "Date":
+        origin["date"] = parts[1]
+    elif key == "Time":
+        origin["time"] = parts[1]
+        if "+/-" in parts:
+            origin["time_error"] = "±" + parts[-2] + parts[-1]
+    elif key == "Latitude":
+        origin["latitude"] = float(parts[1])
+        origin["latitude_error_km"] = _error(parts)
+    elif key == "Longitude":
+        origin["longitude"] = float(parts[1])
+        origin["longitude_error_km"] = _error(parts)
+    elif key == "Depth":
+        origin["depth_km"] = float(parts[1])
+        origin["depth_fixed"] = "fixed" in line
+    elif key in ("Agency", "Author", "Mode", "Status"):
+        origin[key.lower()] = parts[-1]
+    elif key == "Residual" and len(parts) > 2:
+        origin["residual_rms"] = float(parts[-2])
+    elif key == "Azimuthal" and len(parts) > 2:
+        origin["azimuthal_gap"] = float(parts[-2])
+
+
+def _network_magnitude(parts):
+    if len(parts) < 5:
+        return None
+    # "MLv 3.45 +/- 0.20 10 BMKG" atau tanpa error "M 3.45 10 BMKG ..."
+    has_error = parts[2] == "+/-"
+    return {
+        "type": parts[0],
+        "value": float(parts[1]),
+        "error": float(parts[3]) if has_error else None,
+        "station_count": int(parts[4] if has_error else parts[2]),
+        "agency": parts[-1],
+    }
+
+
+def _phase_arrival(parts):
+    if len(parts) < 9 or not _is_number(parts[2]):
+        return None
+    return {
+        "station": parts[0],
+        "network": parts[1],
+        "distance_deg": float(parts[2]),
+        "azimuth": float(parts[3]),
+        "phase": parts[4],
+        "time": parts[5],
+        "residual": float(parts[6]),
+        "weight": float(parts[8]),
+    }
+
+
+def _station_magnitude(parts):
+    if len(parts) < 9 or not _is_number(parts[2]):
+        return None
+    return {
+        "station": parts[0],
+        "network": parts[1],
+        "distance_deg": float(parts[2]),
+        "azimuth": float(parts[3]),
+        "type": parts[4],
+        "value": float(parts[5]),
+        "residual": float(parts[6]),
+        "amplitude": float(parts[7]),
+    }
+
+
+ROWS = {
+    "network_magnitudes": _network_magnitude,
+    "phase_arrivals": _phase_arrival,
+    "station_magnitudes": _station_magnitude,
+}
+
+
+def _section(parts):
+    """Nama section jika baris adalah judul section, selain itu None."""
+    if not parts[-1].endswith(":"):
+        return None
+    words = parts[1:] if parts[0].isdigit() else parts
+    return SECTIONS.get(" ".join(words)[:-1])
+
+
+def _parse(text):
+    data = {
+        "event": {},
+        "origin": {},
+        "network_magnitudes": [],
+        "phase_arrivals": [],
+        "station_magnitudes": [],
+    }
+    section = None
+    skipped = 0
+    for line in text.splitlines():
+        parts = line.split()
+        if not parts:
+            # Baris kosong menutup tabel
+            if section in ROWS:
+                section = None
+            continue
+        header = _section(parts)
+        if header is not None:
+            section = header
+            continue
+        try:
+            if section == "event":
+                _event_line(data["event"], parts, line)
+            elif section == "origin":
+                _origin_line(data["origin"], parts, line)
+            elif section is not None:
+                row = ROWS[section](parts)
+                if row is not None:
+                    data[section].append(row)
+        except (ValueError, IndexError):
+            skipped += 1
+    if skipped:
+        logger.warning(f"[BULLETIN] Skipped {skipped} malformed lines")
+    return data
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+stats = {"parses": 0, "hits": 0}
+
+
+def parse_bulletin(text):
+    """Parse teks bulletin ke dict event/origin/magnitudes/arrivals."""
+    key = hashlib.sha1(text.encode("utf-8", "surrogatepass")).digest()
+    with _cache_lock:
+        data = _cache.get(key)
+        if data is not None:
+            _cache.move_to_end(key)
+            stats["hits"] += 1
+            return data
+    data = _parse(text)
+    with _cache_lock:
+        _cache[key] = data
+        stats["parses"] += 1
+        while len(_cache) > CACHE_ENTRIES:
+            _cache.popitem(last=False)
+    return data
+
+
+def parse_bulletin_file(path):
+    with open(path, "r") as f:
+        return parse_bulletin(f.read())
+
+
+def cache_stats():
+    return dict(stats, entries=len(_cache))
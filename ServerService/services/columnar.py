@@ -0,0 +1,118 @@
+import math
+from datetime import datetime, timezone
+
+import numpy as np
+
+from envelope import minmax
+
+REDUCERS = ("mean", "minmax")
+
+
+def window_ms(seconds, max_points):
+    """Lebar window agregasi (ms) supaya `seconds` detik <= max_points titik."""
+    return max(1, math.ceil(seconds * 1000 / max_points))
+
+
+def flux_columnar_query(bucket, seconds, max_points=None, reduce="mean", end=None):
+    """Query Flux /realtime_waveform; reduksi dilakukan di InfluxDB.
+
+    Tanpa `end` window relatif (-seconds s); dengan `end` (epoch detik)
+    window absolut [end - seconds, end]. Dengan max_points, aggregateWindow(createEmpty: true, timeSrc: "_start")
+    menghasilkan grid teratur satu baris per window (null untuk window
+    kosong). "minmax" menghasilkan kolom min dan max per window.
+    """
+    if end is None:
+        window = f'range(start: -{seconds}s)'
+    else:
+        window = f'range(start: {isoformat(end - seconds)}, stop: {isoformat(end)})'
+    data = (
+        f'from(bucket: "{bucket}") '
+        f'|> {window} '
+        f'|> filter(fn: (r) => r._measurement == "waveform") '
+        f'|> filter(fn: (r) => r["_field"] == "value") '
+        f'|> group(columns: ["network", "station", "channel"]) '
+    )
+    if not max_points:
+        return data + '|> sort(columns: ["_time"]) '
+
+    every = window_ms(seconds, max_points)
+    if reduce == "mean":
+        return data + (
+            f'|> aggregateWindow(every: {every}ms, fn: mean, createEmpty: true, timeSrc: "_start") '
+        )
+    return (
+        f'data = {data}\n'
+        f'lo = data |> aggregateWindow(every: {every}ms, fn: min, createEmpty: true, timeSrc: "_start") '
+        f'|> set(key: "_field", value: "min")\n'
+        f'hi = data |> aggregateWindow(every: {every}ms, fn: max, createEmpty: true, timeSrc: "_start") '
+        f'|> set(key: "_field", value: "max")\n'
+        f'union(tables: [lo, hi]) '
+        f'|> group(columns: ["network", "station", "channel"]) '
+        f'|> pivot(rowKey: ["_time"], columnKey: ["_field"], valueColumn: "_value") '
+        f'|> sort(columns: ["_time"])'
+    )
+
+
+def isoformat(timestamp):
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat()
+
+
+def json_values(data):
+    """Array float -> list JSON; NaN (gap) menjadi null."""
+    data = np.asarray(data, dtype=np.float64)
+    values = data.tolist()
+    for i in np.flatnonzero(~np.isfinite(data)).tolist():
+        values[i] = None
+    return values
+
+
+def to_grid(times, values):
+    """Sampel mentah (epoch detik, nilai) -> (start, sample_rate, array)
+    dengan gap diisi NaN."""
+    times = np.asarray(times, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    if len(times) < 2:
+        return times[0], None, values
+    # Timestamp duplikat (diff 0) tidak ikut menentukan sample rate
+    steps = np.diff(times)
+    steps = steps[steps > 0]
+    step = np.median(steps) if len(steps) else 0.
+    if not np.isfinite(step) or step <= 0:
+        return times[0], None, values
+    index = np.rint((times - times[0]) / step).astype(np.int64)
+    if index.min() < 0:
+        return times[0], None, values
+    grid = np.full(index[-1] + 1, np.nan)
+    grid[index] = values
+    return times[0], 1. / step, grid
+
+
+def reduce_window(start, sample_rate, data, seconds, max_points, reduce="mean"):
+    """Reduksi array per window, sama dengan aggregateWindow di Flux:
+    window selebar window_ms() yang ter-align ke epoch, timestamp = awal
+    window. Return (start, window_rate, {nama: array})."""
+    every = window_ms(seconds, max_points) / 1000.
+    first = math.floor(start / every) * every
+    per_window = every * sample_rate
+    # Index window untuk setiap sampel, lalu reduksi per kelompok
+    window = np.floor((start - first) / every + np.arange(len(data)) / per_window).astype(np.int64)
+    n = int(window[-1]) + 1 if len(window) else 0
+    valid = np.isfinite(data)
+    window, data = window[valid], data[valid]
+
+    columns = {}
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if reduce == "mean":
+            sums = np.bincount(window, weights=data, minlength=n)
+            counts = np.bincount(window, minlength=n)
+            columns["values"] = sums / counts
+        else:
+            lo = np.full(n, np.nan)
+            hi = np.full(n, np.nan)
+            if len(window):
+                # Index window naik: reduceat per kelompok window yang berisi data
+                starts = np.flatnonzero(np.r_[True, window[1:] != window[:-1]])
+                present = window[starts]
+                lo[present], hi[present] = minmax(data, starts)
+            columns["min"], columns["max"] = lo, hi
+    return first, 1. / every, columns
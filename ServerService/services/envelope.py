@@ -0,0 +1,115 @@
+"""Reduksi waveform min/max per bucket untuk tampilan selebar N piksel.
+
+Setiap bucket diwakili dua titik (min lalu max) sehingga puncak tetap
+terlihat seperti pada plot data penuh. EnvelopePyramid menyimpan min/max
+bertingkat (blok 4, 16, 64, ... sampel) supaya window dan zoom apa pun
+dijawab dari level yang sesuai dengan biaya O(jumlah bucket).
+"""
+import math
+
+import numpy as np
+from obspy import Stream, Trace
+
+
+def bucket_edges(n_samples, n_buckets):
+    """Index awal setiap bucket (naik, unik) untuk np.ufunc.reduceat."""
+    n_buckets = max(1, min(n_buckets, n_samples))
+    return np.unique(np.arange(n_buckets) * n_samples // n_buckets)
+
+
+def minmax(data, edges):
+    """Min/max per bucket; NaN (gap) diabaikan, bucket tanpa data = NaN."""
+    return np.fmin.reduceat(data, edges), np.fmax.reduceat(data, edges)
+
+
+def interleave(mins, maxs):
+    out = np.empty(2 * len(mins), dtype=np.result_type(mins, maxs))
+    out[0::2] = mins
+    out[1::2] = maxs
+    return out
+
+
+class EnvelopePyramid:
+    """Min/max bertingkat untuk satu array sampel.
+
+    Level 0 adalah data asli; level k menyimpan min/max blok berukuran
+    factor**k sampel. Total memori tambahan sekitar 2/(factor-1) kali data.
+    """
+
+    def __init__(self, data, factor=4, min_blocks=256):
+        self.data = data
+        self.factor = factor
+        self.levels = []  # (block, mins, maxs)
+        mins = maxs = data
+        block = 1
+        while len(mins) // factor >= min_blocks:
+            edges = np.arange(0, len(mins), factor)
+            mins, maxs = np.fmin.reduceat(mins, edges), np.fmax.reduceat(maxs, edges)
+            block *= factor
+            self.levels.append((block, mins, maxs))
+
+    @property
+    def nbytes(self):
+        return sum(lo.nbytes + hi.nbytes for _, lo, hi in self.levels)
+
+    def envelope(self, i0, i1, n_buckets):
+        """Min/max sampel [i0, i1) dalam <= n_buckets bucket.
+
+        Return (first, step, mins, maxs): bucket ke-j dimulai pada sampel
+        first + j * step. Jika window cukup kecil, sampel asli dikembalikan
+        (mins is maxs, step 1).
+        """
+        span = i1 - i0
+        if span <= 2 * n_buckets:
+            raw = self.data[i0:i1]
+            return i0, 1., raw, raw
+
+        # Level paling kasar yang bloknya masih <= lebar satu bucket
+        block, lo, hi = 1, self.data, self.data
+        for level in self.levels:
+            if level[0] > span / n_buckets:
+                break
+            block, lo, hi = level
+        j0, j1 = i0 // block, -(-i1 // block)
+        edges = bucket_edges(j1 - j0, n_buckets)
+        mins = np.fmin.reduceat(lo[j0:j1], edges)
+        maxs = np.fmax.reduceat(hi[j0:j1], edges)
+        return j0 * block, (j1 - j0) * block / len(edges), mins, maxs
+
+
+def build_pyramids(stream):
+    return [EnvelopePyramid(tr.data) for tr in stream]
+
+
+def pyramids_nbytes(pyramids):
+    return sum(p.nbytes + 1024 for p in pyramids)
+
+
+def reduce_stream(stream, pyramids, n_buckets, starttime=None, endtime=None):
+    """Stream baru berisi envelope (min, max bergantian) setiap trace.
+
+    Trace hasil tetap punya starttime/delta biasa (delta = setengah bucket),
+    jadi semua encoder waveform_codec bisa dipakai tanpa perubahan.
+    """
+    out = Stream()
+    for tr, pyramid in zip(stream, pyramids):
+        stats = tr.stats
+        i0, i1 = 0, stats.npts
+        if starttime is not None:
+            i0 = max(0, math.floor((starttime - stats.starttime) * stats.sampling_rate))
+        if endtime is not None:
+            i1 = min(stats.npts, math.ceil((endtime - stats.starttime) * stats.sampling_rate) + 1)
+        if i1 <= i0:
+            continue
+
+        first, step, mins, maxs = pyramid.envelope(i0, i1, n_buckets)
+        header = stats.copy()
+        header.starttime = stats.starttime + first * stats.delta
+        if mins is maxs:
+            data = np.array(mins)
+        else:
+            data = interleave(mins, maxs)
+            header.delta = step * stats.delta / 2
+        header.npts = len(data)
+        out.append(Trace(data=data, header=header))
+    return out
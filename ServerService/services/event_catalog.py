@@ -0,0 +1,148 @@
+"""Cache in-memory untuk file event (last_event, last_300, event_detail).
+
+Setiap file diparse sekali menjadi body JSON siap kirim (bytes) plus
+ETag dari hash isinya. Watchdog menandai dokumen kotor saat file berubah
+dan parse ulang terjadi pada request berikutnya, jadi polling biasa
+tidak membuka file maupun parse sama sekali. Dokumen dengan `on_change`
+langsung diparse ulang di thread watchdog dan callback dipanggil dengan
+hasil parse setiap kali isinya berubah (mis. untuk mengisi EventStore).
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+logger = logging.getLogger(__name__)
+
+
+def dump_json(data):
+    # Sama dengan serialisasi JSONResponse
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+
+class EventDocument:
+    """Satu file event: hasil parse, body JSON dan ETag terakhir.
+
+    Jika parse gagal, exception disimpan dan di-raise ulang pada setiap
+    get() sampai file berubah lagi.
+    """
+
+    def __init__(self, path, parse, on_change=None):
+        self.path = os.path.abspath(path)
+        self.parse = parse
+        self.on_change = on_change
+        self._notified = None
+        self.data = None
+        self.body = None
+        self.etag = None
+        self.error = None
+        self.loads = 0
+        self._dirty = True
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        self._dirty = True
+        if self.on_change is not None:
+            self.notify()
+
+    def notify(self):
+        """Panggil on_change jika isi (ETag) berubah sejak panggilan terakhir."""
+        try:
+            self.get()
+        except Exception as e:
+            logger.warning(f"[CATALOG] Can't load {self.path}: {e}")
+            return
+        if self.etag == self._notified:
+            return
+        self._notified = self.etag
+        try:
+            self.on_change(self.data)
+        except Exception as e:
+            logger.error(f"[CATALOG] on_change failed for {self.path}: {e}")
+
+    def get(self):
+        if self._dirty:
+            with self._lock:
+                if self._dirty:
+                    self._load()
+        if self.error is not None:
+            # Traceback lama dibuang supaya tidak bertambah setiap kali di-raise ulang
+            raise self.error.with_traceback(None)
+        return self
+
+    def _load(self):
+        # Flag dibersihkan sebelum parse: perubahan selama parse memicu load ulang
+        self._dirty = False
+        self.loads += 1
+        try:
+            data = self.parse(self.path)
+            body = dump_json(data)
+        except Exception as e:
+            self.error = e
+            return
+        self.data, self.body, self.error = data, body, None
+        self.etag = '"%s"' % hashlib.sha1(body).hexdigest()[:20]
+
+
+class _CatalogHandler(FileSystemEventHandler):
+    def __init__(self, catalog):
+        self.catalog = catalog
+
+    # Hanya event tulis; event open/close-tanpa-tulis muncul setiap kali
+    # file dibaca oleh _load() dan tidak boleh memicu parse ulang
+    def on_created(self, event):
+        self.catalog.invalidate(event.src_path)
+
+    on_modified = on_deleted = on_closed = on_created
+
+    def on_moved(self, event):
+        self.catalog.invalidate(event.src_path)
+        self.catalog.invalidate(event.dest_path)
+
+
+class EventCatalog:
+    """Kumpulan EventDocument per nama, di-invalidate oleh watchdog."""
+
+    def __init__(self):
+        self.documents = {}
+        self._by_path = {}
+        self._observer = None
+
+    def add(self, name, path, parse, on_change=None):
+        document = EventDocument(path, parse, on_change)
+        self.documents[name] = document
+        self._by_path[document.path] = document
+        return document
+
+    def get(self, name):
+        return self.documents[name].get()
+
+    def invalidate(self, path):
+        document = self._by_path.get(os.path.abspath(path))
+        if document is not None:
+            document.invalidate()
+
+    def start(self):
+        self._observer = Observer()
+        handler = _CatalogHandler(self)
+        for directory in {os.path.dirname(path) for path in self._by_path}:
+            os.makedirs(directory, exist_ok=True)
+            self._observer.schedule(handler, directory, recursive=False)
+        self._observer.start()
+        logger.info(f"[CATALOG] Watching {len(self._by_path)} event files")
+        for document in self.documents.values():
+            if document.on_change is not None:
+                document.notify()
+
+    def stop(self):
+        if self._observer is not None:
+            self._observer.stop()
+
+    def stats(self):
+        return {name: {"loads": d.loads, "bytes": len(d.body or b""), "etag": d.etag}
+                for name, d in self.documents.items()}
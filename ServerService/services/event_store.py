@@ -0,0 +1,252 @@
+"""Katalog event persisten (SQLite) untuk query /events.
+
+Baris event berasal dari file teks FDSN (event_parameter.txt dan
+event_300.txt, kolom EventID|Time|Latitude|...). Event disimpan per
+EventID (upsert), dengan index waktu, magnitudo dan lat/lon, sehingga
+query rentang waktu, magnitudo dan bbox cepat walaupun katalog sudah
+bertahun-tahun. Paginasi memakai cursor (time, EventID), bukan OFFSET.
+
+Index waktu juga memuat magnitudo dan lat/lon, jadi query "terbaru dulu"
+dijawab dengan scan index itu dari belakang tanpa membaca tabel. Jika
+filter sangat selektif (scan melewati SCAN_BUDGET), query diulang dan
+SQLite memilih index magnitudo atau lat/lon.
+"""
+import base64
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from obspy import UTCDateTime
+
+logger = logging.getLogger(__name__)
+
+# Nama field API (= header file FDSN) -> (kolom, tipe)
+FIELDS = {
+    "EventID": ("event_id", str),
+    "Time": ("time", str),
+    "Latitude": ("latitude", float),
+    "Longitude": ("longitude", float),
+    "Depth/km": ("depth", float),
+    "Author": ("author", str),
+    "Catalog": ("catalog", str),
+    "Contributor": ("contributor", str),
+    "ContributorID": ("contributor_id", str),
+    "MagType": ("mag_type", str),
+    "Magnitude": ("magnitude", float),
+    "MagAuthor": ("mag_author", str),
+    "EventLocationName": ("location_name", str),
+    "EventType": ("event_type", str),
+}
+MAX_LIMIT = 1000
+# Batas scan index waktu, dalam satuan 1000 instruksi VM SQLite (~5 ms)
+SCAN_BUDGET = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    event_id TEXT PRIMARY KEY,
+    time TEXT,
+    time_epoch REAL NOT NULL,
+    latitude REAL,
+    longitude REAL,
+    depth REAL,
+    author TEXT,
+    catalog TEXT,
+    contributor TEXT,
+    contributor_id TEXT,
+    mag_type TEXT,
+    magnitude REAL,
+    mag_author TEXT,
+    location_name TEXT,
+    event_type TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS events_time ON events (time_epoch, event_id, magnitude, latitude, longitude);
+CREATE INDEX IF NOT EXISTS events_magnitude ON events (magnitude, time_epoch);
+CREATE INDEX IF NOT EXISTS events_latlon ON events (latitude, longitude);
+"""
+
+
+class InvalidQuery(ValueError):
+    """Parameter /events tidak valid (400)."""
+
+
+def _value(kind, text):
+    text = (text or "").strip()
+    if kind is float:
+        try:
+            return float(text)
+        except ValueError:
+            return None
+    return text
+
+
+def event_row(record):
+    """Dict baris file FDSN -> nilai kolom tabel; None jika tidak lengkap."""
+    event_id = (record.get("EventID") or "").strip()
+    if not event_id:
+        return None
+    try:
+        epoch = UTCDateTime(record["Time"].strip()).timestamp
+    except Exception:
+        return None
+    values = [_value(kind, record.get(name)) for name, (_, kind) in FIELDS.items()]
+    return values[:2] + [epoch] + values[2:] + [time.time()]
+
+
+def encode_cursor(time_epoch, event_id):
+    raw = json.dumps([time_epoch, event_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        time_epoch, event_id = json.loads(raw)
+        return float(time_epoch), str(event_id)
+    except Exception:
+        raise InvalidQuery("invalid cursor") from None
+
+
+def parse_time(value):
+    try:
+        return UTCDateTime(value).timestamp
+    except Exception:
+        raise InvalidQuery(f"invalid time {value!r}") from None
+
+
+class EventStore:
+    """Tabel events SQLite; satu koneksi per thread, tulis diserialkan."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    def _connect(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            db = self._local.db = sqlite3.connect(self.path, timeout=10)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def upsert(self, records):
+        """Simpan baris event (list dict dari parse_event_300/parse_event_file)."""
+        rows = [row for row in map(event_row, records) if row is not None]
+        if not rows:
+            return 0
+        columns = ["event_id", "time", "time_epoch"] + [c for c, _ in list(FIELDS.values())[2:]] + ["updated_at"]
+        updates = ", ".join(f"{c} = excluded.{c}" for c in columns[1:])
+        sql = (f"INSERT INTO events ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+               f"ON CONFLICT(event_id) DO UPDATE SET {updates}")
+        with self._write_lock:
+            db = self._connect()
+            with db:
+                db.executemany(sql, rows)
+        return len(rows)
+
+    def query(self, start=None, end=None, minmag=None, maxmag=None, minlat=None, maxlat=None,
+              minlon=None, maxlon=None, limit=100, cursor=None, fields=None):
+        """Event terbaru dulu. Return (list dict, next_cursor atau None)."""
+        names = list(FIELDS) if not fields else fields
+        unknown = [f for f in names if f not in FIELDS]
+        if unknown:
+            raise InvalidQuery(f"unknown fields {unknown}, available: {list(FIELDS)}")
+        limit = max(1, min(int(limit), MAX_LIMIT))
+
+        where, params = [], []
+        if start is not None:
+            where.append("time_epoch >= ?")
+            params.append(parse_time(start))
+        if end is not None:
+            where.append("time_epoch <= ?")
+            params.append(parse_time(end))
+        for column, op, value in (("magnitude", ">=", minmag), ("magnitude", "<=", maxmag),
+                                  ("latitude", ">=", minlat), ("latitude", "<=", maxlat)):
+            if value is not None:
+                where.append(f"{column} {op} ?")
+                params.append(value)
+        if minlon is not None and maxlon is not None and minlon > maxlon:
+            # Bbox melewati antimeridian
+            where.append("(longitude >= ? OR longitude <= ?)")
+            params += [minlon, maxlon]
+        else:
+            if minlon is not None:
+                where.append("longitude >= ?")
+                params.append(minlon)
+            if maxlon is not None:
+                where.append("longitude <= ?")
+                params.append(maxlon)
+        if cursor:
+            where.append("(time_epoch, event_id) < (?, ?)")
+            params += list(decode_cursor(cursor))
+
+        columns = [FIELDS[name][0] for name in names]
+        sql = (f"SELECT time_epoch, event_id, {', '.join(columns)} FROM events {{index}}"
+               f"{' WHERE ' + ' AND '.join(where) if where else ''}"
+               f" ORDER BY time_epoch DESC, event_id DESC LIMIT ?")
+        rows = self._select(sql, params + [limit + 1])
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][0], rows[-1][1])
+        events = [dict(zip(names, row[2:])) for row in rows]
+        return events, next_cursor
+
+    def _select(self, sql, params):
+        db = self._connect()
+        steps = 0
+
+        def budget():
+            nonlocal steps
+            steps += 1
+            return steps > SCAN_BUDGET
+
+        db.set_progress_handler(budget, 1000)
+        try:
+            return db.execute(sql.format(index="INDEXED BY events_time"), params).fetchall()
+        except sqlite3.OperationalError as e:
+            if "interrupted" not in str(e):
+                raise
+        finally:
+            db.set_progress_handler(None, 0)
+        # Filter selektif: biarkan planner memakai index magnitudo/lat-lon
+        return db.execute(sql.format(index=""), params).fetchall()
+
+    def points(self):
+        """(event_ids, lats, lons, mags) semua event berkoordinat, untuk EventIndex."""
+        rows = self._connect().execute(
+            "SELECT event_id, latitude, longitude, magnitude FROM events "
+            "WHERE latitude IS NOT NULL AND longitude IS NOT NULL").fetchall()
+        if not rows:
+            return [], [], [], []
+        ids, lats, lons, mags = zip(*rows)
+        return list(ids), lats, lons, [float("nan") if m is None else m for m in mags]
+
+    def fetch(self, event_ids, fields=None):
+        """Dict event per EventID untuk daftar id (urutan tidak dijamin)."""
+        names = list(FIELDS) if not fields else fields
+        unknown = [f for f in names if f not in FIELDS]
+        if unknown:
+            raise InvalidQuery(f"unknown fields {unknown}, available: {list(FIELDS)}")
+        columns = [FIELDS[name][0] for name in names]
+        db = self._connect()
+        events = {}
+        event_ids = list(event_ids)
+        # Batas jumlah parameter SQLite
+        for i in range(0, len(event_ids), 500):
+            chunk = event_ids[i:i + 500]
+            rows = db.execute(f"SELECT event_id, {', '.join(columns)} FROM events "
+                              f"WHERE event_id IN ({', '.join('?' * len(chunk))})", chunk)
+            events.update((row[0], dict(zip(names, row[1:]))) for row in rows)
+        return events
+
+    def count(self):
+        return self._connect().execute("SELECT COUNT(*) FROM events").fetchone()[0]
@@ -0,0 +1,207 @@
+"""Layer query InfluxDB async yang dipakai bersama endpoint services.
+
+Satu InfluxDBClientAsync (pool koneksi aiohttp) untuk seluruh aplikasi.
+Jumlah query bersamaan dibatasi semaphore dan setiap query punya timeout
+sendiri (termasuk waktu menunggu slot), jadi query lambat tidak lagi
+membekukan event loop atau menumpuk koneksi ke InfluxDB.
+
+Query dengan cache=True melewati QueryCache: hasil disimpan dengan TTL
+pendek per teks Flux yang dinormalisasi, dan request identik yang datang
+bersamaan menunggu satu query yang sama. Pemanggil membulatkan window
+waktu dengan quantize_window() supaya teks query dari request yang
+berdekatan identik.
+"""
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict
+
+from influxdb_client.client.influxdb_client_async import InfluxDBClientAsync
+
+logger = logging.getLogger(__name__)
+
+
+class QueryError(Exception):
+    """Query InfluxDB gagal."""
+
+
+class QueryTimeout(QueryError):
+    """Query melewati batas waktu."""
+
+
+def quantize_window(start, end, granularity):
+    """Bulatkan window (epoch detik) ke kelipatan `granularity`: start ke
+    bawah, end ke atas, sehingga window yang diminta selalu tercakup."""
+    if granularity <= 0:
+        return start, end
+    return (math.floor(start / granularity) * granularity,
+            math.ceil(end / granularity) * granularity)
+
+
+def normalize_flux(flux):
+    return " ".join(flux.split())
+
+
+class QueryCache:
+    """Cache hasil query (TTL pendek, maksimal `max_entries`) dengan
+    single-flight: satu task query per key, request lain menunggunya."""
+
+    def __init__(self, ttl=1., max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires, result)
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get(self, key, loader):
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._entries[key]
+
+        flight = self._inflight.get(key)
+        if flight is None:
+            self.misses += 1
+            flight = self._inflight[key] = asyncio.ensure_future(loader())
+            flight.add_done_callback(lambda f: self._done(key, f))
+        else:
+            self.coalesced += 1
+        # shield: request yang batal tidak membatalkan query milik request lain
+        return await asyncio.shield(flight)
+
+    def _done(self, key, flight):
+        del self._inflight[key]
+        if flight.cancelled() or flight.exception() is not None:
+            return
+        now = time.monotonic()
+        self._entries[key] = (now + self.ttl, flight.result())
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        for old in [k for k, (expires, _) in self._entries.items() if expires <= now]:
+            del self._entries[old]
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "ttl": self.ttl,
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "saved_queries": self.hits + self.coalesced,
+            "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.,
+        }
+
+
+class InfluxQuery:
+    """Client query async dengan timeout, limiter dan pool koneksi.
+
+    start() harus dipanggil dari event loop aplikasi (startup FastAPI).
+    Kode sinkron di thread lain (mis. loader png_cache) memakai run()
+    untuk menjalankan coroutine di loop tersebut.
+    """
+
+    def __init__(self, url, token, org, timeout=10., max_concurrency=8, pool_size=16,
+                 cache_ttl=0., cache_entries=256):
+        self.url = url
+        self.token = token
+        self.org = org
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.pool_size = pool_size
+        self._client = None
+        self._query_api = None
+        self._loop = None
+        self._slots = None
+        self.cache = QueryCache(cache_ttl, cache_entries) if cache_ttl > 0 else None
+        self.queries = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.active = 0
+        self.waiting = 0
+        self.seconds = 0.
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        # Timeout aiohttp = batas atas; timeout per query hanya bisa lebih kecil
+        self._client = InfluxDBClientAsync(url=self.url, token=self.token, org=self.org,
+                                           timeout=int(self.timeout * 1000),
+                                           connection_pool_maxsize=self.pool_size)
+        self._query_api = self._client.query_api()
+        logger.info(f"[INFLUX] Async query client ready ({self.url}, "
+                    f"max {self.max_concurrency} queries, pool {self.pool_size})")
+
+    async def close(self):
+        client, self._client = self._client, None
+        if client is not None:
+            await client.close()
+
+    async def query(self, flux, org=None, timeout=None, cache=False):
+        """Jalankan query Flux; return list FluxTable seperti query() sinkron.
+
+        Dengan cache=True hasil bisa berasal dari QueryCache; hasil itu
+        dipakai bersama dan tidak boleh diubah pemanggil.
+        """
+        if cache and self.cache is not None:
+            key = (org or self.org, normalize_flux(flux))
+            return await self.cache.get(key, lambda: self._timed_query(flux, org, timeout))
+        return await self._timed_query(flux, org, timeout)
+
+    async def _timed_query(self, flux, org, timeout):
+        if self._client is None:
+            raise QueryError("InfluxDB query client is not started")
+        timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+        t0 = time.monotonic()
+        try:
+            return await asyncio.wait_for(self._query(flux, org), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise QueryTimeout(f"Query exceeded {timeout}s") from None
+        except Exception as e:
+            self.errors += 1
+            raise QueryError(f"Query failed: {e}") from e
+        finally:
+            self.queries += 1
+            self.seconds += time.monotonic() - t0
+
+    async def _query(self, flux, org):
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            return await self._query_api.query(flux, org=org or self.org)
+        finally:
+            self.active -= 1
+            self._slots.release()
+
+    def run(self, coro):
+        """Jalankan coroutine di event loop aplikasi dari thread lain (blocking)."""
+        if self._loop is None:
+            coro.close()
+            raise QueryError("InfluxDB query client is not started")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def stats(self):
+        return {
+            "max_concurrency": self.max_concurrency,
+            "pool_size": self.pool_size,
+            "timeout": self.timeout,
+            "queries": self.queries,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "active": self.active,
+            "waiting": self.waiting,
+            "mean_seconds": self.seconds / self.queries if self.queries else 0.,
+            "cache": self.cache.stats() if self.cache is not None else None,
+        }
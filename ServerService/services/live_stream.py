@@ -0,0 +1,171 @@
+"""Streaming waveform live lewat WebSocket.
+
+LiveHub membuka satu koneksi op "stream" ke RingStoreServer milik feed
+selama ada subscriber. Setiap chunk baru di-encode sekali sebagai frame
+biner waveform_codec (satu trace) lalu dibagikan ke semua subscriber yang
+pattern NSLC-nya cocok. Setiap subscriber punya buffer frame terbatas;
+jika client lambat, frame tertua dibuang.
+"""
+import asyncio
+import fnmatch
+import json
+import logging
+from collections import deque
+
+import numpy as np
+
+from waveform_codec import encode_chunk
+
+logger = logging.getLogger(__name__)
+
+MAX_PATTERNS = 100
+
+
+def parse_patterns(patterns):
+    """Validasi list pattern NSLC (NET.STA.LOC.CHA, wildcard fnmatch)."""
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    if not isinstance(patterns, list) or not all(isinstance(p, str) for p in patterns):
+        raise ValueError("patterns must be a list of NET.STA.LOC.CHA strings")
+    patterns = [p.strip() for p in patterns if p.strip()]
+    for p in patterns:
+        if p.count(".") != 3:
+            raise ValueError(f"invalid pattern {p!r}, expected NET.STA.LOC.CHA")
+    return patterns
+
+
+class LiveSubscriber:
+    """Satu client WebSocket: pattern, buffer frame biner, pesan kontrol."""
+
+    def __init__(self, maxlen=64):
+        self.patterns = set()
+        self.frames = deque(maxlen=maxlen)
+        self.messages = deque()
+        self.ready = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+        self._matches = {}
+
+    def subscribe(self, patterns):
+        if len(self.patterns | set(patterns)) > MAX_PATTERNS:
+            raise ValueError(f"at most {MAX_PATTERNS} patterns per connection")
+        self.patterns.update(patterns)
+        self._matches.clear()
+
+    def unsubscribe(self, patterns):
+        self.patterns.difference_update(patterns)
+        self._matches.clear()
+
+    def matches(self, channel):
+        match = self._matches.get(channel)
+        if match is None:
+            match = self._matches[channel] = any(fnmatch.fnmatchcase(channel, p) for p in self.patterns)
+        return match
+
+    def put(self, frame):
+        if len(self.frames) == self.frames.maxlen:
+            self.dropped += 1
+        self.frames.append(frame)
+        self.ready.set()
+
+    def notify(self, message):
+        self.messages.append(message)
+        self.ready.set()
+
+    async def send_forever(self, websocket):
+        """Kirim pesan kontrol (teks JSON) dan frame (biner) sampai koneksi putus."""
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            while self.messages:
+                await websocket.send_json(self.messages.popleft())
+            while self.frames:
+                await websocket.send_bytes(self.frames.popleft())
+                self.sent += 1
+
+
+class LiveHub:
+    """Fan-out chunk dari ring feed ke subscriber WebSocket."""
+
+    def __init__(self, host="127.0.0.1", port=8765, buffer=64, retry_after=5.):
+        self.host = host
+        self.port = port
+        self.buffer = buffer
+        self.retry_after = retry_after
+        self.subscribers = set()
+        self.connected = False
+        self.chunks = 0
+        self.frames = 0
+        self.sent = 0  # akumulasi subscriber yang sudah lepas
+        self.dropped = 0
+        self._task = None
+
+    def add(self):
+        subscriber = LiveSubscriber(self.buffer)
+        self.subscribers.add(subscriber)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return subscriber
+
+    def remove(self, subscriber):
+        if subscriber in self.subscribers:
+            self.subscribers.discard(subscriber)
+            self.sent += subscriber.sent
+            self.dropped += subscriber.dropped
+        if not self.subscribers and self._task is not None:
+            # Tidak ada yang mendengarkan: tutup koneksi stream ke feed
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while self.subscribers:
+            writer = None
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+                writer.write(json.dumps({"op": "stream", "ids": None}).encode() + b"\n")
+                await writer.drain()
+                header = json.loads(await reader.readline())
+                if "error" in header:
+                    raise ValueError(header["error"])
+                self.connected = True
+                logger.info(f"[LIVE] Streaming from feed {self.host}:{self.port}")
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        raise ConnectionError("feed closed the stream")
+                    if line == b"\n":
+                        continue  # keepalive
+                    chunk = json.loads(line)
+                    body = await reader.readexactly(chunk["npts"] * 4)
+                    self.publish(chunk, body)
+            except (OSError, ValueError, asyncio.IncompleteReadError) as e:
+                logger.warning(f"[LIVE] Feed stream unavailable: {e}")
+            finally:
+                self.connected = False
+                if writer is not None:
+                    writer.close()
+            await asyncio.sleep(self.retry_after)
+
+    def publish(self, chunk, body):
+        self.chunks += 1
+        frame = None
+        for subscriber in self.subscribers:
+            if not subscriber.matches(chunk["id"]):
+                continue
+            if frame is None:
+                net, sta, loc, cha = chunk["id"].split(".")
+                data = np.frombuffer(body, dtype="<f4")
+                frame = encode_chunk(net, sta, loc, cha, int(round(chunk["start"] * 1e9)),
+                                     1. / chunk["sample_rate"], data)
+                self.frames += 1
+            subscriber.put(frame)
+
+    def stats(self):
+        return {
+            "connected": self.connected,
+            "subscribers": len(self.subscribers),
+            "chunks": self.chunks,
+            "frames": self.frames,
+            "sent": self.sent + sum(s.sent for s in self.subscribers),
+            "dropped": self.dropped + sum(s.dropped for s in self.subscribers),
+        }
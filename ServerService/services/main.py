@@ -1,21 +1,37 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Query
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Query, Request
+from fastapi.responses import JSONResponse, FileResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from event_parser import parse_event_file, parse_event_300, parse_seiscomp_log
+from fastapi.middleware.gzip import GZipMiddleware
+from event_parser import parse_event_file, parse_event_300
+import bulletin_parser
 from waveform_watcher import start_watcher
+from event_catalog import EventCatalog
+from event_store import EventStore, InvalidQuery
+from spatial_index import EventIndex, StationIndex
+from station_inventory import StationInventory
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
-from matplotlib import pyplot as plt
-from obspy import read
+from obspy import read, UTCDateTime
 import os
 import threading
 import asyncio
 import logging
-from typing import List
-from lxml import etree
-from influxdb_client import InfluxDBClient
-from datetime import datetime as dt, timedelta
-import io
+from typing import List, Optional
+from datetime import datetime as dt
+from recent_store import RecentWaveformClient, covers, live_channels, sample_times
+from waveform_codec import MEDIA_BINARY, MEDIA_JSON, negotiate, encode_binary, encode_json, encode_msgpack
+from waveform_cache import WaveformCache, file_key, stream_nbytes
+from envelope import build_pyramids, pyramids_nbytes, reduce_stream, interleave
+from live_stream import LiveHub, parse_patterns
+from thumbnails import StationList, ThumbnailScheduler
+from renderer import Renderer, RenderError, RenderFailed, RendererBusy, RenderTimeout, envelope_panel
+from influx_query import InfluxQuery, QueryError, QueryTimeout, quantize_window
+from columnar import REDUCERS, flux_columnar_query, isoformat, json_values, reduce_window, to_grid, window_ms
+import numpy as np
+import time
+import gzip
+import json
+import math
 
 
 
@@ -28,6 +44,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Respons JSON/biner besar dikompres jika client mengirim Accept-Encoding: gzip
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 event_file = os.path.join(BASE_DIR, "event_parameter.txt")
@@ -65,31 +83,72 @@ class ConnectionManager:
 
 manager = ConnectionManager()
 
+
+# Semua event yang pernah muncul di file event disimpan di SQLite (/events)
+EVENT_DB = os.getenv("EVENT_DB", os.path.join(BASE_DIR, "event_store.db"))
+event_store = EventStore(EVENT_DB)
+# Epicenter untuk query radius / k-terdekat (/events/nearby)
+event_index = EventIndex(event_store)
+
+
+def store_events(records):
+    event_store.upsert(records)
+    event_index.add(records)
+
+
+# File event diparse sekali per perubahan; polling dilayani dari memori
+event_catalog = EventCatalog()
+event_catalog.add("last_event", event_file, parse_event_file,
+                  on_change=lambda event: store_events([event]))
+event_catalog.add("last_300", event_300, parse_event_300, on_change=store_events)
+event_catalog.add("event_detail", event_detail_file, bulletin_parser.parse_bulletin_file)
+
+
+def etag_matches(request, etag):
+    """True jika If-None-Match memuat `etag` (daftar tag, "*" atau W/,
+    dibandingkan secara lemah)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def etag_response(request, etag, body, media_type, cache_control="no-cache"):
+    """Respons body dengan ETag, atau 304 jika client sudah punya versi ini."""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def catalog_response(name, request):
+    document = event_catalog.get(name)
+    return etag_response(request, document.etag, document.body, "application/json")
+
+
 @app.get("/last_event")
-async def get_last_event_data():
+async def get_last_event_data(request: Request):
     try:
-        data = parse_event_file(event_file)
-        return JSONResponse(content=data)
+        return catalog_response("last_event", request)
     except Exception as e:
         logger.error(f"[API] Error reading last_event: {e}")
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 @app.get("/last_300")
-async def get_300_event_data():
+async def get_300_event_data(request: Request):
     try:
-        datas = parse_event_300(event_300)
-        return JSONResponse(content=datas)
+        return catalog_response("last_300", request)
     except Exception as e:
         logger.error(f"[API] Error reading last_300: {e}")
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 @app.get("/event_detail")
-async def get_event_detail_data():
+async def get_event_detail_data(request: Request):
     try:
-        with open(event_detail_file, "r") as f:
-            content = f.read()
-        datas = parse_seiscomp_log(content)
-        return JSONResponse(content=datas)
+        return catalog_response("event_detail", request)
     except FileNotFoundError:
         logger.error(f"[API] Event detail file not found: {event_detail_file}")
         return JSONResponse(status_code=404, content={"error": f"File not found: {event_detail_file}"})
@@ -97,199 +156,553 @@ async def get_event_detail_data():
         logger.error(f"[API] Error reading event_detail: {e}")
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+@app.get("/events")
+def get_events(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    minmag: Optional[float] = None,
+    maxmag: Optional[float] = None,
+    minlat: Optional[float] = Query(None, ge=-90, le=90),
+    maxlat: Optional[float] = Query(None, ge=-90, le=90),
+    minlon: Optional[float] = Query(None, ge=-180, le=180),
+    maxlon: Optional[float] = Query(None, ge=-180, le=180),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """Katalog event, terbaru dulu. `fields` = nama kolom dipisah koma
+    (EventID,Time,Magnitude,...); halaman berikutnya lewat `next_cursor`."""
+    try:
+        events, next_cursor = event_store.query(
+            start=start, end=end, minmag=minmag, maxmag=maxmag,
+            minlat=minlat, maxlat=maxlat, minlon=minlon, maxlon=maxlon,
+            limit=limit, cursor=cursor,
+            fields=[f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        )
+    except InvalidQuery as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return {"events": events, "next_cursor": next_cursor}
+
+
+def nearby_error(radius_km, k):
+    if radius_km is None and k is None:
+        return JSONResponse(status_code=400, content={"error": "radius_km or k is required"})
+    return None
+
+
+@app.get("/events/nearby")
+def get_events_nearby(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_km: Optional[float] = Query(None, gt=0),
+    k: Optional[int] = Query(None, ge=1, le=1000),
+    minmag: Optional[float] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    fields: Optional[str] = None
+):
+    """Event dalam `radius_km` dari titik (lat, lon) atau `k` event terdekat
+    (keduanya: k terdekat di dalam radius), terdekat dulu."""
+    error = nearby_error(radius_km, k)
+    if error is not None:
+        return error
+    if k is not None:
+        found = event_index.nearest(lat, lon, k, max_km=radius_km, minmag=minmag)
+    else:
+        found = event_index.radius(lat, lon, radius_km, minmag=minmag, limit=limit)
+    try:
+        rows = event_store.fetch([event_id for event_id, _ in found],
+                                 [f.strip() for f in fields.split(",") if f.strip()] if fields else None)
+    except InvalidQuery as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    events = []
+    for event_id, distance in found:
+        if event_id in rows:
+            events.append(dict(rows[event_id], distance_km=round(distance, 3)))
+    return {"events": events}
+
+
+# Stream hasil decode dan body respons (per format/encoding) event waveform
+WAVEFORM_CACHE_BYTES = int(os.getenv("WAVEFORM_CACHE_BYTES", 256 * 1024 * 1024))
+waveform_cache = WaveformCache(WAVEFORM_CACHE_BYTES)
+
+
+def encode_stream(st, media):
+    if media == MEDIA_JSON:
+        # Sama dengan JSONResponse.render
+        return json.dumps(encode_json(st), ensure_ascii=False, allow_nan=False,
+                          indent=None, separators=(",", ":")).encode()
+    return encode_binary(st) if media == MEDIA_BINARY else encode_msgpack(st)
+
+
+def cached_stream(key):
+    return waveform_cache.get(key + ("stream",), lambda: read(key[0]), sizeof=stream_nbytes)
+
+
+def waveform_body(key, media, use_gzip):
+    """Body respons /waveform_data dari cache; decode MiniSEED sekali per versi file."""
+    body = waveform_cache.get(key + (media, None), lambda: encode_stream(cached_stream(key), media))
+    if not use_gzip or len(body) < 1024:
+        return body, None
+    return waveform_cache.get(key + (media, "gzip"), lambda: gzip.compress(body, 6)), "gzip"
+
+
+def envelope_body(key, media, n_buckets, start=None, end=None):
+    """Envelope min/max selebar n_buckets dari pyramid yang di-cache per file."""
+    st = cached_stream(key)
+    pyramids = waveform_cache.get(key + ("pyramid",), lambda: build_pyramids(st),
+                                  sizeof=pyramids_nbytes)
+    return encode_stream(reduce_stream(st, pyramids, n_buckets, start, end), media)
+
+
 @app.get("/waveform_data/{public_id}/{filename}")
-def get_waveform_data(public_id: str, filename: str):
+def get_waveform_data(
+    public_id: str,
+    filename: str,
+    request: Request,
+    format: Optional[str] = None,
+    width: Optional[int] = Query(None, ge=1, le=20000),
+    max_points: Optional[int] = Query(None, ge=2, le=40000),
+    start: Optional[str] = None,
+    end: Optional[str] = None
+):
+    """JSON (default) atau biner via Accept / ?format=binary|msgpack,
+    lihat waveform_codec.
+
+    Dengan width (piksel) atau max_points, setiap trace dikirim sebagai
+    envelope min/max (dua titik per bucket) untuk window start..end (UTC).
+    """
+    media = negotiate(request.headers.get("accept"), format)
+    if media is None:
+        return JSONResponse(status_code=406, content={"error": f"Unsupported format: {format}"})
+
     path = os.path.join(BASE_DIR, "events", public_id.replace("/", "_"), filename)
-    if not os.path.exists(path):
+    try:
+        key = file_key(path)
+    except FileNotFoundError:
         return JSONResponse(status_code=404, content={"error": "File not found"})
 
     try:
-        st = read(path)
-        traces = []
-        for tr in st:
-            times = tr.times().tolist()
-            data = tr.data.tolist()
-            start_seconds = tr.stats.starttime.timestamp % 86400
-            traces.append({
-                "station": tr.stats.station,
-                "channel": tr.stats.channel,
-                "network": tr.stats.network,
-                "times": times,
-                "amplitudes": data,
-                "start_seconds": start_seconds
-            })
-        return JSONResponse(content={"traces": traces})
+        headers = {"Vary": "Accept, Accept-Encoding"}
+        if width or max_points or start or end:
+            try:
+                start = UTCDateTime(start) if start else None
+                end = UTCDateTime(end) if end else None
+            except Exception:
+                return JSONResponse(status_code=400, content={"error": "Invalid start/end time"})
+            n_buckets = width or (max_points // 2 if max_points else 20000)
+            body = envelope_body(key, media, n_buckets, start, end)
+            return Response(content=body, media_type=media, headers=headers)
+
+        use_gzip = "gzip" in request.headers.get("accept-encoding", "")
+        body, encoding = waveform_body(key, media, use_gzip)
+        if encoding:
+            # Sudah terkompres: GZipMiddleware melewati respons ini
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type=media, headers=headers)
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 
-@app.get("/station_coords")
-def get_station_coords():
-    try:
-        xml_path = os.path.join(BASE_DIR, "stations.xml")  # Ubah sesuai lokasi file
-        with open(xml_path, "rb") as f:
-            tree = etree.parse(f)
+@app.get("/cache_stats")
+def get_cache_stats():
+    return {"waveform": waveform_cache.stats(), "events": event_catalog.stats(), "query": influx.cache.stats() if influx.cache else None,
+            "spatial": event_index.stats(), "bulletin": bulletin_parser.cache_stats()}
 
-        ns = {"ns": "http://www.fdsn.org/xml/station/1"}
-        root = tree.getroot()
-        stations = {}
 
-        for net in root.findall(".//ns:Network", namespaces=ns):
-            network_code = net.get("code")
-            for sta in net.findall("ns:Station", namespaces=ns):
-                station_code = sta.get("code")
-                latitude = float(sta.find("ns:Latitude", namespaces=ns).text)
-                longitude = float(sta.find("ns:Longitude", namespaces=ns).text)
-                key = f"{network_code}.{station_code}"
-                stations[key] = {"lat": latitude, "lon": longitude}
+# stations.xml diparse sekali (dan ulang hanya jika mtime berubah) untuk
+# /station_coords, /stations/nearby, thumbnail dan waveform watcher
+STATIONS_XML = os.getenv("STATIONS_XML", os.path.join(BASE_DIR, "stations.xml"))
+inventory = StationInventory(STATIONS_XML)
+station_index = StationIndex(inventory)
 
-        return JSONResponse(content=stations)
 
+@app.get("/station_coords")
+def get_station_coords(request: Request):
+    try:
+        snapshot = inventory.current()
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
+    return etag_response(request, snapshot.etag, snapshot.coords_body, "application/json")
+
+
+@app.get("/stations/nearby")
+def get_stations_nearby(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_km: Optional[float] = Query(None, gt=0),
+    k: Optional[int] = Query(None, ge=1, le=1000),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Stasiun dalam `radius_km` dari titik (lat, lon) atau `k` stasiun terdekat."""
+    error = nearby_error(radius_km, k)
+    if error is not None:
+        return error
+    try:
+        if k is not None:
+            stations = station_index.nearest(lat, lon, k, max_km=radius_km)
+        else:
+            stations = station_index.radius(lat, lon, radius_km, limit=limit)
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+    return {"stations": stations}
 
 INFLUX_URL = "http://localhost:8086"
 INFLUX_TOKEN = "XXXTOKEN"
 INFLUX_ORG = "XXXORG"
 INFLUX_BUCKET = "seedlinksmart"
 
-client = InfluxDBClient(
+# Window query dibulatkan ke QUERY_QUANTUM detik supaya request yang
+# berdekatan menghasilkan teks Flux yang sama dan bisa dilayani cache
+QUERY_QUANTUM = float(os.getenv("QUERY_QUANTUM", 1))
+
+# Semua query Flux lewat client async bersama: timeout per query,
+# maksimal INFLUX_MAX_QUERIES query bersamaan, pool koneksi aiohttp,
+# cache hasil QUERY_CACHE_TTL detik (0 = nonaktif)
+influx = InfluxQuery(
     url=INFLUX_URL,
     token=INFLUX_TOKEN,
-    org=INFLUX_ORG
+    org=INFLUX_ORG,
+    timeout=float(os.getenv("INFLUX_TIMEOUT", 10)),
+    max_concurrency=int(os.getenv("INFLUX_MAX_QUERIES", 8)),
+    pool_size=int(os.getenv("INFLUX_POOL_SIZE", 16)),
+    cache_ttl=float(os.getenv("QUERY_CACHE_TTL", QUERY_QUANTUM)),
+    cache_entries=int(os.getenv("QUERY_CACHE_ENTRIES", 256))
+)
+
+
+def realtime_end():
+    """Akhir window /realtime_waveform, dibulatkan ke atas ke QUERY_QUANTUM."""
+    return quantize_window(0, time.time(), QUERY_QUANTUM)[1]
+
+# Ring buffer feed: window terbaru dilayani tanpa query Flux
+recent_store = RecentWaveformClient(
+    host=os.getenv("RING_HOST", "127.0.0.1"),
+    port=int(os.getenv("RING_PORT", 8765))
 )
 
+# Chunk baru dari ring feed di-push ke client WebSocket /ws/waveform
+live_hub = LiveHub(
+    host=os.getenv("RING_HOST", "127.0.0.1"),
+    port=int(os.getenv("RING_PORT", 8765)),
+    buffer=int(os.getenv("LIVE_BUFFER", 64))
+)
+
+# Render PNG di pool proses; hasil di-cache per window yang dibulatkan
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", 2))
+RENDER_QUEUE = int(os.getenv("RENDER_QUEUE", 16))
+RENDER_TIMEOUT = float(os.getenv("RENDER_TIMEOUT", 10))
+RENDER_QUANTUM = int(os.getenv("RENDER_QUANTUM", 5))  # seconds
+PNG_CACHE_BYTES = int(os.getenv("PNG_CACHE_BYTES", 64 * 1024 * 1024))
+RENDER_DPI = 100  # dpi default matplotlib
+renderer = Renderer(RENDER_WORKERS, RENDER_QUEUE, RENDER_TIMEOUT)
+png_cache = WaveformCache(PNG_CACHE_BYTES)
+
+
+FETCH_FANOUT = int(os.getenv("FETCH_FANOUT", 4))
+# Batas panel (stasiun x channel) /waveform_image_multi; 0 = tanpa batas
+MAX_IMAGE_PANELS = int(os.getenv("MAX_IMAGE_PANELS", 0))
+
+
+async def station_series(net, sta, channels, start, end):
+    """{channel: (times epoch detik, data)} untuk satu stasiun, window [start, end].
+
+    Semua channel diambil dengan satu request ring buffer; channel yang
+    tidak tercakup ring diambil dengan satu query Flux (filter set channel,
+    hasil dikelompokkan per channel).
+    """
+    series = {}
+    recent = await asyncio.to_thread(recent_store.window,
+                                     [f"{net}.{sta}.*.{cha}" for cha in channels],
+                                     math.ceil(time.time() - start))
+    for c in recent or ():
+        # Ring harus mencakup awal dan akhir window; jika tidak, ekor yang
+        # hilang diambil dari InfluxDB bersama channel lain
+        if c["channel"] in series or not covers(c, start, end):
+            continue
+        times = c["start"] + np.arange(len(c["data"])) / c["sample_rate"]
+        inside = (times >= start) & (times <= end)
+        series[c["channel"]] = times[inside], c["data"][inside]
+
+    missing = [cha for cha in channels if cha not in series]
+    if missing:
+        q_start, q_end = quantize_window(start, end, QUERY_QUANTUM)
+        channel_set = ", ".join(json.dumps(cha) for cha in missing)
+        flux = f'''
+        from(bucket: "{INFLUX_BUCKET}")
+          |> range(start: {isoformat(q_start)}, stop: {isoformat(q_end)})
+          |> filter(fn: (r) => r["_measurement"] == "waveform" and r["_field"] == "value")
+          |> filter(fn: (r) => r["network"] == {json.dumps(net)} and r["station"] == {json.dumps(sta)})
+          |> filter(fn: (r) => contains(value: r["channel"], set: [{channel_set}]))
+          |> group(columns: ["channel"])
+          |> sort(columns: ["_time"])
+        '''
+        for table in await influx.query(flux, cache=True):
+            if not table.records:
+                continue
+            cha = table.records[0].values["channel"]
+            series[cha] = (
+                np.array([row.get_time().timestamp() for row in table.records], dtype=np.float64),
+                np.array([row.get_value() for row in table.records], dtype=np.float64),
+            )
+    return series
+
+
+async def fetch_stations(net, stations, channels, start, end):
+    """station_series untuk beberapa stasiun secara paralel (maks FETCH_FANOUT)."""
+    fanout = asyncio.Semaphore(FETCH_FANOUT)
+
+    async def fetch(sta):
+        async with fanout:
+            return await station_series(net, sta, channels, start, end)
+
+    results = await asyncio.gather(*(fetch(sta) for sta in stations))
+    return dict(zip(stations, results))
+
+
+def render_window(net, stations, channels, start, end, width, height, multi):
+    """Ambil data lalu render PNG satu panel per stasiun x channel."""
+    max_points = int(width * RENDER_DPI) * 2
+    empty = (np.empty(0), np.empty(0))
+    series = influx.run(fetch_stations(net, stations, channels, start, end))
+    panels = [envelope_panel(f"{net}.{sta}.{cha}", *series[sta].get(cha, empty), max_points)
+              for sta in stations for cha in channels]
+    return renderer.render({"width": width, "height": height, "multi": multi, "panels": panels})
+
+
+def render_png(net, stations, channels, seconds, width, height, multi):
+    """PNG untuk window [end - seconds, end], end dibulatkan ke RENDER_QUANTUM
+    sehingga client yang melihat stasiun yang sama berbagi satu render."""
+    end = math.floor(time.time() / RENDER_QUANTUM) * RENDER_QUANTUM
+
+    def render():
+        return render_window(net, stations, channels, end - seconds, end, width, height, multi)
+
+    image_id = ("png", net, tuple(stations), tuple(channels), seconds, width, height)
+    return png_cache.get((image_id, end, RENDER_QUANTUM), render)
+
+
+# Thumbnail dashboard (parameter default /waveform_image) di-render ulang
+# di background; THUMBNAIL_STATIONS = "all" (stations.xml), "NET.STA,..."
+# atau kosong untuk menonaktifkan
+THUMBNAIL_STATIONS = os.getenv("THUMBNAIL_STATIONS", "all")
+THUMBNAIL_INTERVAL = float(os.getenv("THUMBNAIL_INTERVAL", 30))
+THUMBNAIL_PARAMS = ("SHZ", 360, 10., 2.)  # cha, seconds, width, height
+
+
+def render_thumbnail(net, sta):
+    cha, seconds, width, height = THUMBNAIL_PARAMS
+    end = time.time()
+    return render_window(net, [sta], [cha], end - seconds, end, width, height, multi=False)
+
+
+thumbnails = ThumbnailScheduler(render_thumbnail,
+                                StationList(THUMBNAIL_STATIONS, inventory),
+                                THUMBNAIL_INTERVAL, RENDER_WORKERS)
+
+
+def thumbnail_response(thumb, request):
+    return etag_response(request, thumb.etag, thumb.png, "image/png",
+                         f"max-age={thumbnails.max_age(thumb)}")
+
+
+def png_response(render):
+    try:
+        png = render()
+    except RendererBusy as e:
+        return JSONResponse(status_code=503, content={"error": str(e)}, headers={"Retry-After": "1"})
+    except RenderTimeout as e:
+        return JSONResponse(status_code=504, content={"error": str(e)})
+    except RenderFailed as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+    except RenderError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
+    except QueryTimeout as e:
+        return JSONResponse(status_code=504, content={"error": str(e)})
+    except QueryError as e:
+        return JSONResponse(status_code=502, content={"error": str(e)})
+    return Response(content=png, media_type="image/png",
+                    headers={"Cache-Control": f"max-age={RENDER_QUANTUM}"})
+
+
 @app.get("/waveform_image")
 def waveform_image(
+    request: Request,
     net: str,
     sta: str,
     cha: str = "SHZ",
-    seconds: int = 360,
-    width: float = 10,
-    height: float = 2
+    seconds: int = Query(360, ge=1, le=86400),
+    width: float = Query(10, gt=0, le=40),
+    height: float = Query(2, gt=0, le=20)
 ):
-    from fastapi.responses import Response
-    from matplotlib import pyplot as plt
-    import matplotlib.dates as mdates
-
-    query_api = client.query_api()
-    now = dt.utcnow()
-    start = now - timedelta(seconds=seconds)
-
-    flux = f'''
-    from(bucket: "{INFLUX_BUCKET}")
-      |> range(start: {start.isoformat()}Z, stop: {now.isoformat()}Z)
-      |> filter(fn: (r) => r["_measurement"] == "waveform")
-      |> filter(fn: (r) => r["network"] == "{net}")
-      |> filter(fn: (r) => r["station"] == "{sta}")
-      |> filter(fn: (r) => r["channel"] == "{cha}")
-      |> sort(columns: ["_time"])
-    '''
-
-    result = query_api.query(flux)
-
-    times, values = [], []
-    for table in result:
-        for row in table.records:
-            times.append(row.get_time())
-            values.append(row.get_value())
+    if (cha, seconds, width, height) == THUMBNAIL_PARAMS:
+        thumb = thumbnails.get(net, sta)
+        if thumb is not None:
+            return thumbnail_response(thumb, request)
+    return png_response(lambda: render_png(net, [sta], [cha], seconds, width, height, multi=False))
 
-    plt.figure(figsize=(width, height))
-
-    if not values:
-        plt.text(0.5, 0.5, f"{net}.{sta}.{cha}\nNo Data", ha='center', va='center', fontsize=12)
-        plt.axis('off')
-    else:
-        plt.plot(times, values, linewidth=0.8, color='black')
-        plt.title(f"{net}.{sta}.{cha}", fontsize=10)
-        plt.xlabel("Time (UTC)")
-        plt.ylabel("Amplitude")
-        plt.grid(True, linestyle='--', alpha=0.4)
-        plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
-
-    plt.tight_layout()
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    plt.close()
-    buf.seek(0)
-    return Response(content=buf.getvalue(), media_type="image/png")
-
-
-from fastapi import Query
 
 @app.get("/waveform_image_multi")
 def waveform_image_multi(
     net: str,
-    sta: str,
+    sta: List[str] = Query(...),
     channels: List[str] = Query(["SHZ", "SHN", "SHE"]),
-    seconds: int = 30
+    seconds: int = Query(30, ge=1, le=86400)
 ):
-    from fastapi.responses import Response
-    from matplotlib import pyplot as plt
-    import matplotlib.dates as mdates
-
-    query_api = client.query_api()
-    now = dt.utcnow()
-    start = now - timedelta(seconds=seconds)
-
-    fig, axs = plt.subplots(len(channels), 1, figsize=(6, 2.5 * len(channels)), sharex=True)
-
-    # handle jika hanya satu channel
-    if len(channels) == 1:
-        axs = [axs]
-
-    for i, cha in enumerate(channels):
-        flux = f'''
-        from(bucket: "{INFLUX_BUCKET}")
-          |> range(start: {start.isoformat()}Z, stop: {now.isoformat()}Z)
-          |> filter(fn: (r) => r["_measurement"] == "waveform")
-          |> filter(fn: (r) => r["network"] == "{net}")
-          |> filter(fn: (r) => r["station"] == "{sta}")
-          |> filter(fn: (r) => r["channel"] == "{cha}")
-          |> sort(columns: ["_time"])
-        '''
+    """Satu panel per stasiun x channel; `sta` boleh diulang untuk
+    beberapa stasiun (diambil paralel, satu query per stasiun)."""
+    panels = len(sta) * len(channels)
+    if not panels:
+        return JSONResponse(status_code=400, content={"error": "at least one station and channel required"})
+    if MAX_IMAGE_PANELS and panels > MAX_IMAGE_PANELS:
+        return JSONResponse(status_code=400,
+                            content={"error": f"at most {MAX_IMAGE_PANELS} panels (sta x channels) allowed"})
+    return png_response(lambda: render_png(net, sta, channels, seconds,
+                                           6, 2.5 * panels, multi=True))
+
+
+@app.get("/render_stats")
+def get_render_stats():
+    return {"renderer": renderer.stats(), "png_cache": png_cache.stats(),
+            "thumbnails": thumbnails.stats(), "influx": influx.stats(),
+            "inventory": inventory.stats()}
+
+
+def recent_stream_data(seconds):
+    """Data /realtime_waveform dari ring buffer feed; None jika tidak tersedia."""
+    channels = live_channels(recent_store.window(None, seconds), seconds)
+    if channels is None:
+        return None
+    output = []
+    for c in channels:
+        data = c["data"]
+        times = sample_times(c["start"], c["sample_rate"], len(data))
+        valid = np.isfinite(data)
+        output.append({
+            "network": c["network"],
+            "station": c["station"],
+            "channel": c["channel"],
+            "times": [t + "+00:00" for t in times[valid].astype(str).tolist()],
+            "values": data[valid].tolist()
+        })
+    return output
+
+
+async def columnar_stream_data(seconds, max_points=None, reduce="mean"):
+    """/realtime_waveform kolumnar: start, sample_rate, values per channel.
+
+    Dari ring buffer feed jika tersedia (reduksi dengan numpy), jika tidak
+    dari InfluxDB dengan reduksi aggregateWindow di dalam query.
+    """
+    channels = live_channels(await asyncio.to_thread(recent_store.window, None, seconds), seconds)
+    if channels is not None:
+        output = []
+        for c in channels:
+            data = c["data"]
+            if max_points:
+                start, rate, columns = reduce_window(c["start"], c["sample_rate"], data,
+                                                     seconds, max_points, reduce)
+            else:
+                start, rate, columns = c["start"], c["sample_rate"], {"values": data}
+            output.append({
+                "network": c["network"],
+                "station": c["station"],
+                "channel": c["channel"],
+                "start": isoformat(start),
+                "sample_rate": rate,
+                **{k: json_values(v) for k, v in columns.items()}
+            })
+        return output
 
-        result = query_api.query(flux)
-        times, values = [], []
+    query = flux_columnar_query("seedlinksmart", seconds, max_points, reduce, end=realtime_end())
+    result = await influx.query(query, org="smart_psi", cache=True)
 
-        for table in result:
-            for row in table.records:
-                times.append(row.get_time())
-                values.append(row.get_value())
-
-        ax = axs[i]
-        if values:
-            ax.plot(times, values, color='black', linewidth=0.8)
-            ax.set_title(f"{net}.{sta}.{cha}", fontsize=10)
-            ax.set_ylabel("Amplitude", fontsize=9)
-            ax.grid(True, linestyle='--', alpha=0.4)
-            # Format waktu lebih rapi
-            ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
+    output = []
+    for table in result:
+        records = table.records
+        if not records:
+            continue
+        meta = records[0].values
+        item = {
+            "network": meta["network"],
+            "station": meta["station"],
+            "channel": meta["channel"],
+        }
+        if max_points:
+            # Grid teratur dari aggregateWindow (window kosong = null)
+            item["start"] = records[0].get_time().isoformat()
+            item["sample_rate"] = 1000. / window_ms(seconds, max_points)
+            if reduce == "mean":
+                item["values"] = [r.get_value() for r in records]
+            else:
+                item["min"] = [r.values.get("min") for r in records]
+                item["max"] = [r.values.get("max") for r in records]
         else:
-            ax.text(0.5, 0.5, f"{net}.{sta}.{cha}\nNo Data", ha='center', va='center')
-            ax.axis('off')
-
-    axs[-1].set_xlabel("Time (UTC)", fontsize=9)
-    plt.tight_layout()
+            start, rate, data = to_grid([r.get_time().timestamp() for r in records],
+                                        [r.get_value() for r in records])
+            item["start"] = isoformat(start)
+            item["sample_rate"] = rate
+            item["values"] = json_values(data)
+        output.append(item)
+    return output
+
+
+async def envelope_stream_data(seconds, n_buckets):
+    """/realtime_waveform format lama (times/values) berisi envelope min/max:
+    dua titik per bucket, waktu awal dan tengah bucket."""
+    output = []
+    for c in await columnar_stream_data(seconds, n_buckets, "minmax"):
+        lo = np.array(c["min"], dtype=np.float64)
+        hi = np.array(c["max"], dtype=np.float64)
+        valid = np.repeat(np.isfinite(lo), 2)
+        start = dt.fromisoformat(c["start"]).timestamp()
+        times = start + np.arange(2 * len(lo)) / (2 * c["sample_rate"])
+        output.append({
+            "network": c["network"],
+            "station": c["station"],
+            "channel": c["channel"],
+            "times": [isoformat(t) for t in times[valid].tolist()],
+            "values": interleave(lo, hi)[valid].tolist()
+        })
+    return output
 
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    plt.close()
-    buf.seek(0)
-    return Response(content=buf.getvalue(), media_type="image/png")
 
 @app.get("/realtime_waveform")
-async def get_all_stream_data():
+async def get_all_stream_data(
+    columnar: bool = False,
+    max_points: Optional[int] = Query(None, ge=2),
+    width: Optional[int] = Query(None, ge=1),
+    reduce: str = "mean",
+    seconds: int = Query(30, ge=1, le=3600)
+):
+    """Default: list times/values per channel (format lama).
+
+    columnar=true: {start, sample_rate, values} per channel; dengan
+    max_points data direduksi (reduce=mean atau minmax -> min/max).
+    Format lama dengan width/max_points: envelope min/max bergantian.
+    width (piksel) = jumlah window/bucket di semua format, satu per piksel.
+    """
+    if reduce not in REDUCERS:
+        return JSONResponse(status_code=400, content={"error": f"reduce must be one of {REDUCERS}"})
     try:
+        if columnar:
+            return await columnar_stream_data(seconds, max_points or width, reduce)
+        if width or max_points:
+            return await envelope_stream_data(seconds, width or max_points // 2)
+
+        recent = await asyncio.to_thread(recent_stream_data, seconds)
+        if recent is not None:
+            return recent
+
+        end = realtime_end()
         query = (
             f'from(bucket: "seedlinksmart") '
-            f'|> range(start: -30s) '
+            f'|> range(start: {isoformat(end - seconds)}, stop: {isoformat(end)}) '
             f'|> filter(fn: (r) => r._measurement == "waveform") '
             f'|> filter(fn: (r) => r["_field"] == "value") '
             f'|> group(columns: ["network", "station", "channel"]) '
             f'|> sort(columns: ["_time"]) '
         )
-        result = client.query_api().query(org="smart_psi", query=query)
+        result = await influx.query(query, org="smart_psi", cache=True)
 
         output = []
 
@@ -314,6 +727,8 @@ async def get_all_stream_data():
             })
 
         return output
+    except QueryTimeout as e:
+        return JSONResponse(status_code=504, content={"error": str(e)})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
@@ -331,10 +746,60 @@ async def websocket_endpoint(websocket: WebSocket):
         logger.error(f"[WS] WebSocket error: {e}")
         manager.disconnect(websocket)
 
+@app.websocket("/ws/waveform")
+async def live_waveform_endpoint(websocket: WebSocket, ids: Optional[str] = None):
+    """Streaming chunk waveform baru sebagai frame biner (format
+    application/vnd.smart.waveform, satu trace per frame).
+
+    Subscription lewat query `ids` (pattern NSLC dipisah koma) dan/atau
+    pesan teks {"subscribe": [...]} / {"unsubscribe": [...]}; setiap pesan
+    dibalas {"subscribed": [...]} atau {"error": ...}.
+    """
+    await websocket.accept()
+    subscriber = live_hub.add()
+    sender = asyncio.create_task(subscriber.send_forever(websocket))
+    try:
+        if ids:
+            subscriber.subscribe(parse_patterns(ids.split(",")))
+            subscriber.notify({"subscribed": sorted(subscriber.patterns)})
+        while True:
+            message = await websocket.receive_json()
+            try:
+                if not isinstance(message, dict):
+                    raise ValueError("expected a JSON object")
+                if "subscribe" in message:
+                    subscriber.subscribe(parse_patterns(message["subscribe"]))
+                if "unsubscribe" in message:
+                    subscriber.unsubscribe(parse_patterns(message["unsubscribe"]))
+                subscriber.notify({"subscribed": sorted(subscriber.patterns)})
+            except ValueError as e:
+                subscriber.notify({"error": str(e)})
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"[LIVE] WebSocket error: {e}")
+    finally:
+        sender.cancel()
+        live_hub.remove(subscriber)
+
+
+@app.get("/live_stats")
+def get_live_stats():
+    return live_hub.stats()
+
+
 @app.post("/broadcast")
 async def broadcast_last_event():
     try:
-        data = parse_event_file(event_file)
+        # Watchdog catalog bisa belum jalan saat callback ini dipanggil.
+        # Parse ulang, upsert SQLite dan EventIndex.add di thread, bukan di event loop
+        def load_last_event():
+            event_catalog.invalidate(event_file)
+            return event_catalog.get("last_event").data
+
+        data = await asyncio.to_thread(load_last_event)
         await manager.broadcast(data)
         return {"status": "ok", "message": "Notifikasi dikirim ke semua klien"}
     except Exception as e:
@@ -377,6 +842,14 @@ def start_file_watcher(loop, file_path, callback):
 @app.on_event("startup")
 async def on_startup():
     loop = asyncio.get_running_loop()
+    await influx.start()
+    try:
+        await asyncio.to_thread(inventory.current)
+    except Exception as e:
+        logger.warning(f"[INVENTORY] Can't load {STATIONS_XML}: {e}")
+    event_catalog.start()
+    if THUMBNAIL_STATIONS.strip():
+        thumbnails.start()
 
     threading.Thread(
         target=start_file_watcher,
@@ -386,8 +859,16 @@ async def on_startup():
 
     threading.Thread(
         target=start_watcher,
-        args=(event_detail_file, "./events", "LOC"),
+        args=(event_detail_file, "./events", "LOC", inventory),
         daemon=True
     ).start()
 
     logger.info("[STARTUP] FastAPI app started and watcher thread running.")
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    event_catalog.stop()
+    thumbnails.stop()
+    renderer.close()
+    await influx.close()
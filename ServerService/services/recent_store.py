@@ -0,0 +1,113 @@
+import json
+import logging
+import socket
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Toleransi cakupan window (detik), kira-kira satu paket SeedLink
+COVERAGE_TOLERANCE = 2.
+
+
+def channel_end(c):
+    return c["start"] + len(c["data"]) / c["sample_rate"]
+
+
+def covers(c, start, end, tolerance=COVERAGE_TOLERANCE):
+    """True jika data channel dari ring mencakup [start, end]."""
+    return c["start"] <= start + tolerance and channel_end(c) >= end - tolerance
+
+
+def live_channels(channels, seconds, now=None):
+    """Channel ring yang punya data di `seconds` detik terakhir.
+
+    Sama seperti range(start: -Ns) di Flux, channel tanpa data baru
+    dilewati. None jika tidak ada channel aktif atau ada channel aktif
+    yang belum mencakup awal window (ring baru terisi sebagian, mis.
+    setelah feed restart), supaya pemanggil memakai InfluxDB.
+    """
+    if not channels:
+        return None
+    now = time.time() if now is None else now
+    live = []
+    for c in channels:
+        if channel_end(c) < now - seconds or not np.isfinite(c["data"]).any():
+            continue
+        if c["start"] > now - seconds + COVERAGE_TOLERANCE:
+            return None
+        live.append(c)
+    return live or None
+
+
+class RecentWaveformClient:
+    """Baca waveform terbaru dari ring buffer milik feed (RingStoreServer).
+
+    Semua method mengembalikan None jika feed tidak bisa dihubungi atau
+    window yang diminta tidak tercakup, sehingga pemanggil bisa fallback
+    ke query InfluxDB.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8765, timeout=1.0, retry_after=10.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._down_until = 0.
+
+    def _request(self, request):
+        if time.monotonic() < self._down_until:
+            return None
+        try:
+            with socket.create_connection((self.host, self.port), timeout=self.timeout) as sock:
+                sock.sendall(json.dumps(request).encode() + b"\n")
+                f = sock.makefile("rb")
+                header = json.loads(f.readline())
+                if "error" in header:
+                    logger.warning(f"[RING] {header['error']}")
+                    return None
+                size = sum(c.get("npts", 0) for c in header["channels"]) * 4
+                body = f.read(size) if size else b""
+        except (OSError, ValueError) as e:
+            # Feed mati/tidak aktif: jangan coba lagi setiap request
+            logger.warning(f"[RING] Recent store unavailable: {e}")
+            self._down_until = time.monotonic() + self.retry_after
+            return None
+        if len(body) < size:
+            return None
+        return header, body
+
+    def window(self, patterns, seconds):
+        """Return list channel {id, network, station, location, channel,
+        start, sample_rate, data} untuk `seconds` detik terakhir."""
+        response = self._request({"op": "window", "ids": patterns, "seconds": seconds})
+        if response is None:
+            return None
+        header, body = response
+        if seconds > header["seconds"]:
+            return None
+
+        result = []
+        offset = 0
+        for c in header["channels"]:
+            data = np.frombuffer(body, dtype="<f4", count=c["npts"], offset=offset)
+            offset += c["npts"] * 4
+            net, sta, loc, cha = c["id"].split(".")
+            result.append({
+                "id": c["id"],
+                "network": net,
+                "station": sta,
+                "location": loc,
+                "channel": cha,
+                "start": c["start"],
+                "sample_rate": c["sample_rate"],
+                "data": data,
+            })
+        return result
+
+
+def sample_times(start, sample_rate, npts):
+    """Array datetime64[us] untuk setiap sampel."""
+    offsets = np.rint(np.arange(npts) * (1e6 / sample_rate)).astype("timedelta64[us]")
+    return np.datetime64(int(start * 1e6), "us") + offsets
@@ -0,0 +1,274 @@
+"""Render PNG waveform di pool proses worker (matplotlib Agg, API OO).
+
+Setiap worker menyimpan template figure per (jumlah panel, ukuran):
+Figure, Axes, Line2D dan layout dibuat sekali, lalu setiap render hanya
+mengganti data, judul dan batas sumbu. Tidak ada pyplot/state global,
+sehingga aman dipakai bersamaan dari banyak request.
+"""
+import io
+import logging
+import multiprocessing
+import queue
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAX_TEMPLATES = 16
+SECONDS_PER_DAY = 86400.
+
+
+class RenderError(Exception):
+    """Render gagal (worker crash)."""
+
+
+class RendererBusy(RenderError):
+    """Antrian render penuh."""
+
+
+class RenderTimeout(RenderError):
+    """Render melewati batas waktu."""
+
+
+class RenderFailed(RenderError):
+    """Exception di dalam job render (bukan crash); worker tetap dipakai."""
+
+
+def envelope_panel(label, times, data, max_points):
+    """Panel {label, times, data} dengan data direduksi ke envelope min/max
+    (dua titik per bucket pada waktu yang sama) jika lebih dari max_points."""
+    times = np.asarray(times, dtype=np.float64)
+    data = np.asarray(data, dtype=np.float32)
+    if len(data) > max_points:
+        edges = np.unique(np.arange(max_points // 2) * len(data) // (max_points // 2))
+        lo, hi = np.fmin.reduceat(data, edges), np.fmax.reduceat(data, edges)
+        data = np.column_stack([lo, hi]).ravel()
+        times = np.repeat(times[edges], 2)
+    return {"label": label, "times": times, "data": data}
+
+
+# --- Bagian worker ---
+_templates = OrderedDict()
+
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+class _Template:
+    def __init__(self, n_panels, width, height, multi):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.dates import DateFormatter
+        from matplotlib.figure import Figure
+
+        self.fig = Figure(figsize=(width, height))
+        FigureCanvasAgg(self.fig)
+        self.axes = list(self.fig.subplots(n_panels, 1, sharex=True, squeeze=False)[:, 0])
+        self.lines = []
+        self.empty_labels = []
+        for ax in self.axes:
+            line, = ax.plot([], [], color='black', linewidth=0.8)
+            self.lines.append(line)
+            self.empty_labels.append(ax.text(0.5, 0.5, "", ha='center', va='center',
+                                             fontsize=10 if multi else 12,
+                                             transform=ax.transAxes, visible=False))
+            ax.grid(True, linestyle='--', alpha=0.4)
+            ax.xaxis.set_major_formatter(DateFormatter('%H:%M:%S'))
+            ax.set_title("XX.XXXXX.XXX", fontsize=10)
+            if multi:
+                ax.set_ylabel("Amplitude", fontsize=9)
+            else:
+                ax.set_ylabel("Amplitude")
+        if multi:
+            self.axes[-1].set_xlabel("Time (UTC)", fontsize=9)
+        else:
+            self.axes[-1].set_xlabel("Time (UTC)")
+        # Layout dihitung sekali per template, bukan setiap render
+        self.axes[0].set_xlim(0, 1)
+        self.fig.tight_layout()
+
+    def render(self, panels):
+        xmin, xmax = np.inf, -np.inf
+        for ax, line, empty, panel in zip(self.axes, self.lines, self.empty_labels, panels):
+            valid = np.isfinite(panel["data"])
+            has_data = bool(valid.any())
+            if has_data:
+                ax.set_axis_on()
+            else:
+                ax.set_axis_off()
+            line.set_visible(has_data)
+            empty.set_visible(not has_data)
+            if not has_data:
+                ax.set_title("")
+                empty.set_text(f"{panel['label']}\nNo Data")
+                continue
+            x = panel["times"] / SECONDS_PER_DAY  # epoch detik -> date num matplotlib
+            line.set_data(x, panel["data"])
+            ax.set_title(panel["label"], fontsize=10)
+            y = panel["data"][valid]
+            pad = (y.max() - y.min()) * 0.05 or 1.
+            ax.set_ylim(y.min() - pad, y.max() + pad)
+            xmin, xmax = min(xmin, x[0]), max(xmax, x[-1])
+        if xmin < xmax:
+            self.axes[0].set_xlim(xmin, xmax)
+        buf = io.BytesIO()
+        self.fig.savefig(buf, format='png')
+        return buf.getvalue()
+
+
+def render_job(job):
+    """Entry point di worker: job = {width, height, multi, panels}."""
+    key = (len(job["panels"]), job["width"], job["height"], job["multi"])
+    template = _templates.get(key)
+    if template is None:
+        template = _templates[key] = _Template(*key)
+        if len(_templates) > MAX_TEMPLATES:
+            _templates.popitem(last=False)
+    else:
+        _templates.move_to_end(key)
+    return template.render(job["panels"])
+
+
+def _worker_main(conn):
+    """Loop proses worker: terima job lewat pipe, kirim ("ok", png) atau
+    ("error", pesan). Pesan "ready" dikirim setelah matplotlib dimuat."""
+    _init_worker()
+    conn.send("ready")
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        try:
+            conn.send(("ok", render_job(job)))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+# --- Bagian server ---
+class _Worker:
+    """Satu proses render dengan pipe miliknya sendiri."""
+
+    def __init__(self, ctx, start_timeout):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child,), daemon=True,
+                                   name="render-worker")
+        self.process.start()
+        child.close()
+        # Waktu start proses + import matplotlib tidak dihitung ke timeout render
+        if not self.conn.poll(start_timeout) or self.conn.recv() != "ready":
+            self.kill()
+            raise RenderError("Render worker failed to start")
+
+    def kill(self):
+        self.process.terminate()
+        self.process.join(1.)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(1.)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+
+
+class Renderer:
+    """Pool proses render dengan antrian terbatas dan timeout per render.
+
+    render() memblok thread pemanggil sampai PNG selesai. Jika sudah ada
+    `max_pending` job (antri + berjalan), RendererBusy langsung di-raise.
+    Timeout dihitung sejak job dikirim ke worker (bukan sejak antri); worker
+    yang melewati `timeout` atau crash dimatikan dan diganti sendiri tanpa
+    mengganggu render lain yang sedang berjalan.
+    """
+
+    def __init__(self, workers=2, max_pending=16, timeout=10., start_timeout=60.):
+        self.workers = workers
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        self._ctx = multiprocessing.get_context("spawn")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        # Worker idle; None = slot kosong, worker baru dibuat saat dibutuhkan
+        self._idle = queue.Queue()
+        for _ in range(workers):
+            self._idle.put(None)
+        self._closed = False
+        self.renders = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.restarts = 0
+
+    def render(self, job):
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise RendererBusy("Render queue is full")
+        try:
+            worker = self._idle.get()
+            try:
+                if worker is None:
+                    worker = _Worker(self._ctx, self.start_timeout)
+                png = self._run(worker, job)
+            except RenderFailed:
+                raise
+            except RenderError:
+                # Worker sudah dimatikan (timeout/crash) atau gagal start
+                worker = None
+                raise
+            finally:
+                self._idle.put(worker)
+            self.renders += 1
+            return png
+        finally:
+            self._slots.release()
+
+    def _run(self, worker, job):
+        try:
+            worker.conn.send(job)
+            if not worker.conn.poll(self.timeout):
+                self.timeouts += 1
+                self._replace(worker, "timed out")
+                raise RenderTimeout(f"Render exceeded {self.timeout}s")
+            status, result = worker.conn.recv()
+        except (EOFError, OSError) as e:
+            self._replace(worker, "crashed")
+            raise RenderError("Render worker crashed") from e
+        if status != "ok":
+            raise RenderFailed(result)
+        return result
+
+    def _replace(self, worker, reason):
+        self.restarts += 1
+        logger.warning(f"[RENDER] Worker {worker.process.pid} {reason}, replacing it")
+        worker.kill()
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "renders": self.renders,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "restarts": self.restarts,
+        }
+
+    def close(self):
+        # Worker yang sedang render dimatikan oleh daemon=True saat proses keluar
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            if worker is not None:
+                worker.stop()
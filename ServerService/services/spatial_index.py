@@ -0,0 +1,188 @@
+"""Index spasial stasiun dan epicenter event untuk query radius dan k-terdekat.
+
+Titik disimpan sebagai vektor satuan xyz di KD-tree (scipy cKDTree).
+Jarak lurus (chord) antar vektor satuan naik monoton terhadap jarak
+great-circle, jadi radius km diubah ke chord untuk pencarian di tree,
+lalu jarak akhir dihitung dengan haversine (numpy, tervektorisasi).
+"""
+import math
+import threading
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def unit_xyz(lats, lons):
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+
+def chord(km):
+    """Radius km -> jarak chord pada bola satuan."""
+    return 2. * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2.)
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Jarak great-circle (km) dari satu titik ke array titik."""
+    lat0, lon0 = math.radians(lat), math.radians(lon)
+    lats, lons = np.radians(lats), np.radians(lons)
+    a = (np.sin((lats - lat0) / 2.) ** 2
+         + math.cos(lat0) * np.cos(lats) * np.sin((lons - lon0) / 2.) ** 2)
+    return 2. * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0., 1.)))
+
+
+class SpatialIndex:
+    """KD-tree atas titik (lat, lon). Query mengembalikan (index, jarak km)
+    terurut dari yang terdekat; `mask` (array bool) menyaring titik."""
+
+    def __init__(self, lats, lons):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.tree = cKDTree(unit_xyz(self.lats, self.lons)) if len(self.lats) else None
+
+    def __len__(self):
+        return len(self.lats)
+
+    def _sorted(self, lat, lon, idx, limit):
+        idx = np.asarray(idx, dtype=np.int64)
+        dist = haversine_km(lat, lon, self.lats[idx], self.lons[idx])
+        order = np.argsort(dist, kind="stable")[:limit]
+        return idx[order], dist[order]
+
+    def radius(self, lat, lon, km, limit=None, mask=None):
+        if self.tree is None:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        idx = np.asarray(self.tree.query_ball_point(unit_xyz([lat], [lon])[0], chord(km)), dtype=np.int64)
+        if mask is not None:
+            idx = idx[mask[idx]]
+        idx, dist = self._sorted(lat, lon, idx, None)
+        # Chord dan haversine bisa berbeda di digit terakhir pada batas radius
+        keep = dist <= km
+        return idx[keep][:limit], dist[keep][:limit]
+
+    def nearest(self, lat, lon, k, max_km=None, mask=None):
+        n = len(self)
+        if self.tree is None or k < 1:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        point = unit_xyz([lat], [lon])[0]
+        bound = chord(max_km) * (1 + 1e-9) if max_km is not None else np.inf
+        want = k
+        while True:
+            want = min(n, want)
+            d, idx = self.tree.query(point, k=want, distance_upper_bound=bound)
+            d, idx = np.atleast_1d(d), np.atleast_1d(idx)
+            found = idx[np.isfinite(d)]
+            exhausted = want == n or len(found) < want
+            if mask is not None:
+                found = found[mask[found]]
+            if len(found) >= k or exhausted:
+                break
+            # Filter membuang terlalu banyak kandidat: ambil lebih banyak
+            want *= 4
+        idx, dist = self._sorted(lat, lon, found, k)
+        if max_km is not None:
+            keep = dist <= max_km
+            idx, dist = idx[keep], dist[keep]
+        return idx, dist
+
+
+class StationIndex:
+    """Query stasiun atas snapshot StationInventory terbaru."""
+
+    def __init__(self, inventory):
+        self.inventory = inventory
+
+    def _result(self, snapshot, idx, dist):
+        return [{"id": snapshot.ids[i], "lat": snapshot.lats[i], "lon": snapshot.lons[i],
+                 "distance_km": round(d, 3)}
+                for i, d in zip(idx.tolist(), dist.tolist())]
+
+    def radius(self, lat, lon, km, limit=None):
+        snapshot = self.inventory.current()
+        return self._result(snapshot, *snapshot.spatial.radius(lat, lon, km, limit))
+
+    def nearest(self, lat, lon, k, max_km=None):
+        snapshot = self.inventory.current()
+        return self._result(snapshot, *snapshot.spatial.nearest(lat, lon, k, max_km))
+
+
+class EventIndex:
+    """Index epicenter dari EventStore.
+
+    Snapshot tabel dimuat ke KD-tree saat query pertama. Event baru dari
+    add() disimpan terpisah dan dicari brute force (haversine numpy);
+    setelah `rebuild_after` event baru, snapshot dibangun ulang.
+    """
+
+    def __init__(self, store, rebuild_after=1024):
+        self.store = store
+        self.rebuild_after = rebuild_after
+        self._snapshot = None  # (ids, posisi per id, mags, SpatialIndex)
+        self._pending = {}  # event_id -> (lat, lon, mag)
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+
+    def add(self, records):
+        with self._lock:
+            for record in records:
+                event_id = (record.get("EventID") or "").strip()
+                try:
+                    point = (float(record["Latitude"]), float(record["Longitude"]))
+                except (KeyError, TypeError, ValueError):
+                    continue
+                try:
+                    mag = float(record.get("Magnitude"))
+                except (TypeError, ValueError):
+                    mag = np.nan
+                if event_id:
+                    self._pending[event_id] = point + (mag,)
+            if self._snapshot is not None and len(self._pending) > self.rebuild_after:
+                self._snapshot = None
+
+    def _current(self):
+        with self._lock:
+            if self._snapshot is None:
+                ids, lats, lons, mags = self.store.points()
+                positions = {event_id: i for i, event_id in enumerate(ids)}
+                self._snapshot = (ids, positions, np.asarray(mags, dtype=np.float64),
+                                  SpatialIndex(lats, lons))
+                self._pending = {}
+                self.rebuilds += 1
+            return self._snapshot, dict(self._pending)
+
+    def _query(self, search, minmag, limit, *args):
+        (ids, positions, mags, index), pending = self._current()
+        mask = None
+        if pending or minmag is not None:
+            mask = mags >= minmag if minmag is not None else np.ones(len(ids), dtype=bool)
+            # Versi terbaru event yang berubah ada di pending
+            stale = [positions[i] for i in pending if i in positions]
+            mask[stale] = False
+        idx, dist = getattr(index, search)(*args, mask=mask)
+        found = [(ids[i], d) for i, d in zip(idx.tolist(), dist.tolist())]
+
+        if pending:
+            p_ids = list(pending)
+            p = np.array([pending[i] for i in p_ids], dtype=np.float64).reshape(-1, 3)
+            extra = SpatialIndex(p[:, 0], p[:, 1])
+            p_mask = p[:, 2] >= minmag if minmag is not None else None
+            idx, dist = getattr(extra, search)(*args, mask=p_mask)
+            found += [(p_ids[i], d) for i, d in zip(idx.tolist(), dist.tolist())]
+            found.sort(key=lambda item: item[1])
+        return found[:limit]
+
+    def radius(self, lat, lon, km, minmag=None, limit=100):
+        """List (event_id, jarak km) dalam radius, terdekat dulu."""
+        return self._query("radius", minmag, limit, lat, lon, km, limit)
+
+    def nearest(self, lat, lon, k, max_km=None, minmag=None):
+        return self._query("nearest", minmag, k, lat, lon, k, max_km)
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {"events": len(snapshot[0]) if snapshot else None,
+                "pending": len(self._pending), "rebuilds": self.rebuilds}
@@ -0,0 +1,173 @@
+"""Index inventory stasiun dari stations.xml (FDSN StationXML).
+
+File diparse sekali dengan iterparse: hanya kode network/stasiun,
+koordinat dan epoch channel yang disimpan, dan setiap elemen Channel
+(termasuk Response) serta Station dibuang dari tree begitu selesai
+dibaca, jadi inventory tingkat response puluhan MB tidak pernah dimuat
+utuh ke memori. Index dibangun ulang hanya jika mtime file berubah.
+
+Satu snapshot dipakai /station_coords (body JSON siap kirim + ETag),
+/stations/nearby (SpatialIndex), daftar thumbnail dan lookup
+channel/location di waveform_watcher.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from lxml import etree
+from obspy import UTCDateTime
+
+from event_catalog import dump_json
+from spatial_index import SpatialIndex
+
+logger = logging.getLogger(__name__)
+
+FDSN_NS = "{http://www.fdsn.org/xml/station/1}"
+NETWORK, STATION, CHANNEL = (f"{FDSN_NS}{tag}" for tag in ("Network", "Station", "Channel"))
+
+
+def _float(elem, tag):
+    text = elem.findtext(f"{FDSN_NS}{tag}")
+    return float(text) if text else np.nan
+
+
+def _active(channel, when):
+    _, _, start, end = channel
+    if start and UTCDateTime(start) > when:
+        return False
+    return not end or UTCDateTime(end) >= when
+
+
+class InventorySnapshot:
+    """Isi stations.xml pada satu mtime.
+
+    `codes[i]` = (net, sta) sejajar dengan array `lats`, `lons`,
+    `elevations`; `channels[(net, sta)]` = tuple (location, channel,
+    startDate, endDate) dengan tanggal berupa teks asli dari XML.
+    """
+
+    def __init__(self, codes, lats, lons, elevations, channels, mtime):
+        self.codes = codes
+        self.ids = [f"{net}.{sta}" for net, sta in codes]
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.elevations = np.asarray(elevations, dtype=np.float64)
+        self.channels = channels
+        self.mtime = mtime
+        # Format lama /station_coords: {"NET.STA": {"lat": .., "lon": ..}}
+        self.coords_body = dump_json({
+            station_id: {"lat": lat, "lon": lon}
+            for station_id, lat, lon in zip(self.ids, self.lats.tolist(), self.lons.tolist())
+        })
+        self.etag = '"%s"' % hashlib.sha1(self.coords_body).hexdigest()[:20]
+        self._spatial = None
+
+    @property
+    def spatial(self):
+        if self._spatial is None:
+            self._spatial = SpatialIndex(self.lats, self.lons)
+        return self._spatial
+
+
+def parse_inventory(xml_path, mtime=None):
+    codes, lats, lons, elevations, channels = [], [], [], [], {}
+    net_code = None
+    station_channels = []
+    for event, elem in etree.iterparse(xml_path, events=("start", "end"), tag=(NETWORK, STATION, CHANNEL)):
+        if event == "start":
+            if elem.tag == NETWORK:
+                net_code = elem.get("code")
+            elif elem.tag == STATION:
+                station_channels = []
+            continue
+        if elem.tag == CHANNEL:
+            station_channels.append((elem.get("locationCode") or "", elem.get("code"),
+                                     elem.get("startDate"), elem.get("endDate")))
+        elif elem.tag == STATION:
+            code = (net_code, elem.get("code"))
+            # Stasiun bisa muncul lebih dari sekali (beberapa epoch)
+            if code in channels:
+                channels[code] += tuple(station_channels)
+            else:
+                codes.append(code)
+                lats.append(_float(elem, "Latitude"))
+                lons.append(_float(elem, "Longitude"))
+                elevations.append(_float(elem, "Elevation"))
+                channels[code] = tuple(station_channels)
+        # Buang elemen yang sudah diproses beserta sibling sebelumnya
+        elem.clear()
+        if elem.tag != CHANNEL:
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+    return InventorySnapshot(codes, lats, lons, elevations, channels, mtime)
+
+
+class StationInventory:
+    """Snapshot inventory terbaru; current() memeriksa mtime dan parse ulang
+    jika file berubah. Jika parse ulang gagal, snapshot lama tetap dipakai."""
+
+    def __init__(self, xml_path):
+        self.xml_path = xml_path
+        self._snapshot = None
+        self._failed_mtime = None
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.load_seconds = 0.
+
+    def current(self):
+        mtime = os.stat(self.xml_path).st_mtime_ns
+        snapshot = self._snapshot
+        # File yang gagal diparse tidak dicoba lagi sampai mtime berubah
+        if snapshot is not None and mtime in (snapshot.mtime, self._failed_mtime):
+            return snapshot
+        with self._lock:
+            if self._snapshot is not None and mtime in (self._snapshot.mtime, self._failed_mtime):
+                return self._snapshot
+            t0 = time.monotonic()
+            try:
+                snapshot = parse_inventory(self.xml_path, mtime)
+            except Exception as e:
+                if self._snapshot is None:
+                    raise
+                self._failed_mtime = mtime
+                logger.warning(f"[INVENTORY] Reload of {self.xml_path} failed, keeping previous: {e}")
+                return self._snapshot
+            self.loads += 1
+            self.load_seconds = time.monotonic() - t0
+            self._snapshot = snapshot
+            logger.info(f"[INVENTORY] Loaded {len(snapshot.codes)} stations, "
+                        f"{sum(map(len, snapshot.channels.values()))} channels "
+                        f"in {self.load_seconds:.2f}s")
+            return snapshot
+
+    def codes(self):
+        return self.current().codes
+
+    def channels(self, network, station, when=None, priorities=None):
+        """List (channel, location) stasiun, aktif pada `when` jika diberikan,
+        diurutkan sesuai prioritas prefix channel (mis. ("BHZ", "SHZ")).
+        None jika stasiun tidak ada di inventory."""
+        found = self.current().channels.get((network, station))
+        if found is None:
+            return None
+        if when is not None:
+            when = UTCDateTime(when)
+            found = [c for c in found if _active(c, when)]
+        result = []
+        for prefix in priorities or ("",):
+            for location, channel, _, _ in found:
+                if channel.startswith(prefix) and (channel, location) not in result:
+                    result.append((channel, location))
+        return result
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            "stations": len(snapshot.codes) if snapshot else None,
+            "channels": sum(map(len, snapshot.channels.values())) if snapshot else None,
+            "loads": self.loads,
+            "load_seconds": self.load_seconds,
+        }
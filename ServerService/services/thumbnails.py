@@ -0,0 +1,130 @@
+"""Pre-render thumbnail waveform stasiun di background.
+
+ThumbnailScheduler me-render ulang thumbnail setiap stasiun dalam daftar
+setiap `interval` detik dan menyimpan PNG terbaru (dengan ETag) di
+memori, sehingga tile dashboard dilayani tanpa query maupun render.
+"""
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+def parse_station_list(value):
+    """"NET.STA,NET.STA" -> list (network, station)."""
+    codes = []
+    for item in value.split(","):
+        net, _, sta = item.strip().partition(".")
+        if net and sta:
+            codes.append((net, sta))
+    return codes
+
+
+class StationList:
+    """Daftar stasiun dari env (NET.STA,...) atau semua stasiun di
+    StationInventory ("all")."""
+
+    def __init__(self, value, inventory):
+        self.value = value.strip()
+        self.inventory = inventory
+
+    def __call__(self):
+        if self.value.lower() != "all":
+            return parse_station_list(self.value)
+        return self.inventory.codes()
+
+
+class Thumbnail:
+    __slots__ = ("png", "etag", "rendered_at")
+
+    def __init__(self, png, rendered_at):
+        self.png = png
+        self.etag = '"%s"' % hashlib.sha1(png).hexdigest()[:20]
+        self.rendered_at = rendered_at
+
+
+class ThumbnailScheduler:
+    """Render ulang thumbnail untuk daftar stasiun setiap `interval` detik.
+
+    `render(net, sta)` mengembalikan bytes PNG; `stations()` mengembalikan
+    daftar (net, sta) dan dipanggil setiap siklus supaya perubahan
+    stations.xml ikut terbawa. Thumbnail yang lebih tua dari dua interval
+    (render gagal terus) tidak dilayani lagi.
+    """
+
+    def __init__(self, render, stations, interval=30., workers=2):
+        self.render = render
+        self.stations = stations
+        self.interval = interval
+        self.workers = workers
+        self.images = {}
+        self.cycles = 0
+        self.renders = 0
+        self.failures = 0
+        self.last_cycle_seconds = 0.
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="ThumbnailScheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval)
+
+    def get(self, net, sta):
+        thumb = self.images.get((net, sta))
+        if thumb is None or time.time() - thumb.rendered_at > 2 * self.interval:
+            return None
+        return thumb
+
+    def max_age(self, thumb):
+        """Sisa detik sampai thumbnail ini diganti (untuk Cache-Control)."""
+        return max(0, int(thumb.rendered_at + self.interval - time.time()))
+
+    def _refresh(self, code):
+        if self._stop.is_set():
+            return
+        rendered_at = time.time()
+        try:
+            png = self.render(*code)
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"[THUMBNAIL] {'.'.join(code)} render failed: {e}")
+            return
+        self.images[code] = Thumbnail(png, rendered_at)
+        self.renders += 1
+
+    def _run(self):
+        logger.info(f"[THUMBNAIL] Refreshing thumbnails every {self.interval}s")
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="thumbnail") as pool:
+            while not self._stop.is_set():
+                t0 = time.monotonic()
+                try:
+                    codes = self.stations()
+                except Exception as e:
+                    logger.warning(f"[THUMBNAIL] Can't load station list: {e}")
+                    codes = []
+                list(pool.map(self._refresh, codes))
+                # Stasiun yang keluar dari daftar tidak disimpan lagi
+                for code in set(self.images) - set(codes):
+                    self.images.pop(code, None)
+                self.cycles += 1
+                self.last_cycle_seconds = time.monotonic() - t0
+                self._stop.wait(max(0., self.interval - self.last_cycle_seconds))
+
+    def stats(self):
+        return {
+            "stations": len(self.images),
+            "interval": self.interval,
+            "cycles": self.cycles,
+            "renders": self.renders,
+            "failures": self.failures,
+            "last_cycle_seconds": self.last_cycle_seconds,
+            "bytes": sum(len(t.png) for t in self.images.values()),
+        }
@@ -0,0 +1,125 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def file_key(path):
+    """(path, mtime_ns, size) — berubah setiap kali file ditulis ulang."""
+    st = os.stat(path)
+    return path, st.st_mtime_ns, st.st_size
+
+
+def stream_nbytes(stream):
+    # Data sampel + perkiraan overhead objek Trace/Stats
+    return sum(tr.data.nbytes + 1024 for tr in stream)
+
+
+class _Flight:
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class WaveformCache:
+    """LRU cache dibatasi total byte dengan single-flight loading.
+
+    Key berupa tuple (id, versi, versi, format...), mis. file_key(path)
+    (path, mtime, size) diikuti ("stream",) untuk Stream hasil decode atau
+    (media_type, encoding) untuk body respons. Saat sebuah id dimuat
+    dengan versi (key[1:3]) baru, entry versi lama id itu langsung dibuang.
+    Request bersamaan untuk key yang sama menunggu satu loader saja.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._by_path = {}  # path -> set key
+        self._inflight = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get(self, key, loader, sizeof=len):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+            self._put(key, flight.value, sizeof(flight.value))
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.event.set()
+        return flight.value
+
+    def _put(self, key, value, size):
+        if size > self.max_bytes:
+            return
+        path = key[0]
+        with self._lock:
+            # Versi file lama (mtime/size berbeda) tidak akan diminta lagi
+            for old in [k for k in self._by_path.get(path, ()) if k[1:3] != key[1:3]]:
+                self._remove(old)
+            self._entries[key] = (value, size)
+            self._by_path.setdefault(path, set()).add(key)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, size = self._entries.pop(key)
+        self.bytes -= size
+        keys = self._by_path[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._by_path[key[0]]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_path.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.,
+            }
@@ -0,0 +1,169 @@
+"""Encoding respons waveform: JSON (default), frame biner, atau msgpack.
+
+Format biner (`application/vnd.smart.waveform`), semua little-endian:
+
+    header  : magic b"WAVF", versi (u8), pad (u8), jumlah trace (u16)
+    per trace: network, station, location, channel (masing-masing 8 byte,
+               dipad NUL), dtype (u8: 0 = float32, 1 = int32), pad (3 byte),
+               npts (u32), starttime (i64, ns sejak epoch), delta (f64),
+               lalu npts sampel.
+
+Waktu sampel ke-i = starttime + i * delta, jadi tidak ada array waktu.
+"""
+import struct
+
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:  # opsional
+    msgpack = None
+
+MEDIA_JSON = "application/json"
+MEDIA_BINARY = "application/vnd.smart.waveform"
+MEDIA_MSGPACK = "application/msgpack"
+
+FORMATS = {
+    "json": MEDIA_JSON,
+    "binary": MEDIA_BINARY,
+    "msgpack": MEDIA_MSGPACK,
+}
+_MEDIA_ALIASES = {
+    "application/octet-stream": MEDIA_BINARY,
+    "application/x-msgpack": MEDIA_MSGPACK,
+}
+
+MAGIC = b"WAVF"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sBxH")
+TRACE_HEADER = struct.Struct("<8s8s8s8sBxxxIqd")
+DTYPES = (np.dtype("<f4"), np.dtype("<i4"))
+
+
+def available_media():
+    media = [MEDIA_JSON, MEDIA_BINARY]
+    if msgpack is not None:
+        media.append(MEDIA_MSGPACK)
+    return media
+
+
+def negotiate(accept, fmt=None):
+    """Pilih media type dari parameter `format` atau header Accept.
+
+    Return None jika format yang diminta tidak didukung (406). Tanpa
+    preferensi yang cocok, JSON dipakai agar client lama tidak berubah.
+    """
+    available = available_media()
+    if fmt:
+        media = FORMATS.get(fmt)
+        return media if media in available else None
+
+    candidates = []
+    for i, part in enumerate((accept or "").split(",")):
+        fields = part.strip().split(";")
+        media = _MEDIA_ALIASES.get(fields[0].strip().lower(), fields[0].strip().lower())
+        q = 1.
+        for param in fields[1:]:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.
+        if media in available and q > 0:
+            candidates.append((-q, i, media))
+    return min(candidates)[2] if candidates else MEDIA_JSON
+
+
+def sample_dtype(data):
+    """int32 untuk data integer yang muat, selain itu float32."""
+    if data.dtype.kind in "iu":
+        info = np.iinfo(np.int32)
+        if not data.size or (data.min() >= info.min and data.max() <= info.max):
+            return DTYPES[1]
+    return DTYPES[0]
+
+
+def _pad(code):
+    return code.encode()[:8]
+
+
+def encode_binary(stream):
+    chunks = [FILE_HEADER.pack(MAGIC, VERSION, len(stream))]
+    for tr in stream:
+        stats = tr.stats
+        dtype = sample_dtype(tr.data)
+        chunks.append(TRACE_HEADER.pack(
+            _pad(stats.network), _pad(stats.station), _pad(stats.location), _pad(stats.channel),
+            DTYPES.index(dtype), stats.npts, stats.starttime.ns, stats.delta
+        ))
+        chunks.append(np.ascontiguousarray(tr.data, dtype=dtype).tobytes())
+    return b"".join(chunks)
+
+
+def encode_chunk(network, station, location, channel, start_ns, delta, data):
+    """Payload biner satu trace dari blok sampel (frame live WebSocket)."""
+    dtype = sample_dtype(data)
+    return b"".join([
+        FILE_HEADER.pack(MAGIC, VERSION, 1),
+        TRACE_HEADER.pack(_pad(network), _pad(station), _pad(location), _pad(channel),
+                          DTYPES.index(dtype), len(data), start_ns, delta),
+        np.ascontiguousarray(data, dtype=dtype).tobytes(),
+    ])
+
+
+def decode_binary(payload):
+    """Kebalikan encode_binary (untuk client Python dan pengujian)."""
+    magic, version, count = FILE_HEADER.unpack_from(payload, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a waveform payload")
+    offset = FILE_HEADER.size
+    traces = []
+    for _ in range(count):
+        net, sta, loc, cha, code, npts, start_ns, delta = TRACE_HEADER.unpack_from(payload, offset)
+        offset += TRACE_HEADER.size
+        data = np.frombuffer(payload, dtype=DTYPES[code], count=npts, offset=offset)
+        offset += data.nbytes
+        traces.append({
+            "network": net.rstrip(b"\0").decode(),
+            "station": sta.rstrip(b"\0").decode(),
+            "location": loc.rstrip(b"\0").decode(),
+            "channel": cha.rstrip(b"\0").decode(),
+            "start_ns": start_ns,
+            "delta": delta,
+            "data": data,
+        })
+    return traces
+
+
+def encode_msgpack(stream):
+    traces = []
+    for tr in stream:
+        stats = tr.stats
+        dtype = sample_dtype(tr.data)
+        traces.append({
+            "network": stats.network,
+            "station": stats.station,
+            "location": stats.location,
+            "channel": stats.channel,
+            "start_ns": stats.starttime.ns,
+            "delta": stats.delta,
+            "dtype": dtype.str,
+            "data": np.ascontiguousarray(tr.data, dtype=dtype).tobytes(),
+        })
+    return msgpack.packb({"traces": traces}, use_bin_type=True)
+
+
+def encode_json(stream):
+    """Format lama /waveform_data (array times dan amplitudes per sampel)."""
+    traces = []
+    for tr in stream:
+        traces.append({
+            "station": tr.stats.station,
+            "channel": tr.stats.channel,
+            "network": tr.stats.network,
+            "times": tr.times().tolist(),
+            "amplitudes": tr.data.tolist(),
+            "start_seconds": tr.stats.starttime.timestamp % 86400
+        })
+    return {"traces": traces}
@@ -11,6 +11,8 @@ from watchdog.events import FileSystemEventHandler
 from obspy.clients.fdsn import Client
 from obspy import UTCDateTime
 
+from bulletin_parser import parse_bulletin as parse_seiscomp_log
+
 # Logging setup
 logger = logging.getLogger("waveform_watcher")
 logger.setLevel(logging.INFO)
@@ -19,72 +21,6 @@ formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
 handler.setFormatter(formatter)
 logger.addHandler(handler)
 
-# --- Function to parse event_detail.txt (improved, removes +/- and extra) ---
-def parse_seiscomp_log(log_text: str):
-    lines = log_text.strip().splitlines()
-    event_data = {
-        "event": {},
-        "origin": {},
-        "network_magnitudes": [],
-        "phase_arrivals": [],
-        "station_magnitudes": []
-    }
-
-    phase_section = False
-    station_mag_section = False
-
-    for i, line in enumerate(lines):
-        line = line.strip()
-
-        if line.startswith("Public ID") and "Preferred Origin ID" not in lines[i+1]:
-            event_data["event"]["public_id"] = line.split()[-1]
-        elif "Preferred Origin ID" in line:
-            event_data["event"]["preferred_origin_id"] = line.split()[-1]
-        elif "Preferred Magnitude ID" in line:
-            event_data["event"]["preferred_magnitude_id"] = line.split()[-1]
-        elif "region name:" in line:
-            event_data["event"]["region"] = line.split("region name:")[-1].strip()
-        elif "Creation time" in line and "event" in lines[i-1].lower():
-            event_data["event"]["creation_time"] = line.split()[-1]
-
-        elif line.startswith("Public ID"):
-            event_data["origin"]["public_id"] = line.split()[-1]
-        elif line.startswith("Date"):
-            event_data["origin"]["date"] = line.split()[1]
-        elif line.startswith("Time"):
-            time_cleaned = line.split()[1]  # only time string, discard +/-
-            event_data["origin"]["time"] = time_cleaned
-        elif line.startswith("Latitude"):
-            event_data["origin"]["latitude"] = float(line.split()[1])
-        elif line.startswith("Longitude"):
-            event_data["origin"]["longitude"] = float(line.split()[1])
-        elif line.startswith("Depth"):
-            event_data["origin"]["depth_km"] = float(line.split()[1])
-
-        elif "Phase arrivals:" in line:
-            phase_section = True
-            continue
-        elif phase_section and line.strip():
-            parts = line.split()
-            if parts[0].lower() == "sta" or not parts[2].replace('.', '', 1).isdigit():
-                continue
-            if len(parts) >= 9:
-                arrival = {
-                    "station": parts[0],
-                    "network": parts[1],
-                    "distance_deg": float(parts[2]),
-                    "azimuth": float(parts[3]),
-                    "phase": parts[4],
-                    "time": parts[5],
-                    "residual": float(parts[6]),
-                    "weight": float(parts[8])
-                }
-                event_data["phase_arrivals"].append(arrival)
-        elif phase_section and not line.strip():
-            phase_section = False
-
-    return event_data
-
 # --- Folder creation ---
 def create_event_directory(base_dir: str, public_id: str) -> str:
     safe_id = public_id.replace("/", "_")
@@ -115,7 +51,7 @@ def get_available_channels_with_locations(client: Client, network: str, station:
     return results
 
 # --- Waveform download ---
-def download_waveforms(phase_arrivals: List[Dict], origin_time: str, event_dir: str, client_name="LOC"):
+def download_waveforms(phase_arrivals: List[Dict], origin_time: str, event_dir: str, client_name="LOC", inventory=None):
     client = Client(client_name, user="admin", password="admin")
     origin_utc = UTCDateTime(origin_time)
 
@@ -126,7 +62,15 @@ def download_waveforms(phase_arrivals: List[Dict], origin_time: str, event_dir:
             starttime = origin_utc - 30
             endtime = origin_utc + 600
 
-            channel_locs = get_available_channels_with_locations(client, network, station, origin_utc)
+            # Channel/location dari stations.xml lokal; FDSN hanya jika stasiun tidak ada
+            channel_locs = None
+            if inventory is not None:
+                try:
+                    channel_locs = inventory.channels(network, station, origin_utc, ("BHZ", "SHZ", "EHZ"))
+                except Exception as e:
+                    logger.warning(f"[WARN] Inventory lokal tidak tersedia: {e}")
+            if channel_locs is None:
+                channel_locs = get_available_channels_with_locations(client, network, station, origin_utc)
             downloaded = False
 
             for ch_code, loc in channel_locs:
@@ -154,10 +98,11 @@ def download_waveforms(phase_arrivals: List[Dict], origin_time: str, event_dir:
 
 # --- Watchdog Handler ---
 class EventFileHandler(FileSystemEventHandler):
-    def __init__(self, file_path: str, base_dir: str = "./events", client_name="LOC"):
+    def __init__(self, file_path: str, base_dir: str = "./events", client_name="LOC", inventory=None):
         self.file_path = os.path.abspath(file_path)
         self.base_dir = base_dir
         self.client_name = client_name
+        self.inventory = inventory
 
     def on_modified(self, event):
         if not event.is_directory and os.path.abspath(event.src_path) == self.file_path:
@@ -167,7 +112,7 @@ class EventFileHandler(FileSystemEventHandler):
                     content = f.read()
                 parsed = parse_seiscomp_log(content)
                 origin = parsed.get("origin", {})
-                public_id = origin.get("public_id", "unknown_event")
+                public_id = parsed.get("event", {}).get("public_id") or origin.get("public_id", "unknown_event")
                 date = origin.get("date")
                 time_str = origin.get("time")
                 if not date or not time_str:
@@ -177,16 +122,16 @@ class EventFileHandler(FileSystemEventHandler):
                 origin_time = f"{date}T{time_str}"
                 arrivals = parsed.get("phase_arrivals", [])
                 event_dir = create_event_directory(self.base_dir, public_id)
-                download_waveforms(arrivals, origin_time, event_dir, self.client_name)
+                download_waveforms(arrivals, origin_time, event_dir, self.client_name, self.inventory)
             except Exception as e:
                 logger.warning(f"[WAVEFORM] Failed processing {self.file_path}: {e}")
 
 # --- Start Watcher ---
-def start_watcher(file_path: str, base_dir="./events", client_name="LOC"):
+def start_watcher(file_path: str, base_dir="./events", client_name="LOC", inventory=None):
     abs_path = os.path.abspath(file_path)
     dir_path = os.path.dirname(abs_path)
 
-    event_handler = EventFileHandler(abs_path, base_dir, client_name)
+    event_handler = EventFileHandler(abs_path, base_dir, client_name, inventory)
     observer = Observer()
     observer.schedule(event_handler, path=dir_path, recursive=False)
     observer.start()